@@ -12,6 +12,8 @@ class UserAdmin(DjangoUserAdmin):
             {
                 "fields": (
                     "rating",
+                    "rating_deviation",
+                    "rating_volatility",
                     "wins",
                     "losses",
                     "draws",
@@ -17,6 +17,7 @@ class UserSerializer(serializers.ModelSerializer):
             "first_name",
             "last_name",
             "rating",
+            "rating_deviation",
             "wins",
             "losses",
             "draws",
@@ -27,6 +28,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = (
             "id",
             "rating",
+            "rating_deviation",
             "wins",
             "losses",
             "draws",
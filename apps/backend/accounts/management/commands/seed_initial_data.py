@@ -53,7 +53,7 @@ class Command(BaseCommand):
                     "status": Game.Status.LIVE,
                 },
             )
-            if created and game.moves.count() == 0:
+            if created and game.moves_count == 0:
                 apply_player_move(game, white, "e2e4")
                 apply_player_move(game, black, "e7e5")
                 self.stdout.write(self.style.SUCCESS(f"Created demo game #{game.id} with two opening moves."))
@@ -8,7 +8,9 @@ from django.utils.translation import gettext_lazy as _
 class User(AbstractUser):
     """Custom user model for ShamChess players."""
 
-    rating = models.PositiveIntegerField(default=1200, help_text=_("Current ELO rating"))
+    rating = models.PositiveIntegerField(default=1200, help_text=_("Current rating"))
+    rating_deviation = models.FloatField(default=350.0, help_text=_("Glicko-2 rating deviation"))
+    rating_volatility = models.FloatField(default=0.06, help_text=_("Glicko-2 rating volatility"))
     wins = models.PositiveIntegerField(default=0, help_text=_("Number of wins"))
     losses = models.PositiveIntegerField(default=0, help_text=_("Number of losses"))
     draws = models.PositiveIntegerField(default=0, help_text=_("Number of draws"))
@@ -19,6 +21,9 @@ class User(AbstractUser):
         verbose_name = _("User")
         verbose_name_plural = _("Users")
         ordering = ["-date_joined"]
+        indexes = [
+            models.Index(fields=["-rating", "id"], name="accounts_user_rating_idx"),
+        ]
 
     @property
     def games_played(self) -> int:
@@ -1,6 +1,19 @@
 from django.contrib import admin
 
-from .models import ChatMessage, Game, MatchmakingTicket, Move
+from .models import (
+    ChatMessage,
+    Game,
+    GameAnalysis,
+    GameEvent,
+    MatchmakingTicket,
+    Move,
+    PgnImport,
+    PositionEvaluation,
+    PositionMove,
+    PositionStat,
+    RatingHistory,
+    RatingPeriod,
+)
 
 
 @admin.register(Game)
@@ -25,6 +38,13 @@ class MoveAdmin(admin.ModelAdmin):
     search_fields = ("game__id", "san", "uci")
 
 
+@admin.register(GameEvent)
+class GameEventAdmin(admin.ModelAdmin):
+    list_display = ("game", "seq", "event_type", "created_at", "published_at")
+    list_filter = ("event_type",)
+    search_fields = ("game__id",)
+
+
 @admin.register(MatchmakingTicket)
 class MatchmakingTicketAdmin(admin.ModelAdmin):
     list_display = ("user", "created_at", "expires_at", "rating_min", "rating_max")
@@ -32,6 +52,59 @@ class MatchmakingTicketAdmin(admin.ModelAdmin):
     search_fields = ("user__username",)
 
 
+@admin.register(RatingHistory)
+class RatingHistoryAdmin(admin.ModelAdmin):
+    list_display = ("user", "engine", "previous_rating", "rating", "games", "created_at")
+    list_filter = ("engine",)
+    search_fields = ("user__username",)
+
+
+@admin.register(RatingPeriod)
+class RatingPeriodAdmin(admin.ModelAdmin):
+    list_display = ("end", "games", "closed_at")
+
+
+@admin.register(PositionStat)
+class PositionStatAdmin(admin.ModelAdmin):
+    list_display = ("key", "games", "white_wins", "draws", "black_wins")
+
+
+@admin.register(PositionMove)
+class PositionMoveAdmin(admin.ModelAdmin):
+    list_display = ("position_key", "uci", "games", "white_wins", "draws", "black_wins")
+    search_fields = ("=position_key",)
+
+
+@admin.register(PositionEvaluation)
+class PositionEvaluationAdmin(admin.ModelAdmin):
+    list_display = ("key", "depth", "cp", "mate", "best_move")
+    search_fields = ("=key",)
+
+
+@admin.register(GameAnalysis)
+class GameAnalysisAdmin(admin.ModelAdmin):
+    list_display = (
+        "game",
+        "status",
+        "depth",
+        "white_accuracy",
+        "black_accuracy",
+        "white_blunders",
+        "black_blunders",
+        "cached_positions",
+        "positions",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    raw_id_fields = ("game",)
+
+
+@admin.register(PgnImport)
+class PgnImportAdmin(admin.ModelAdmin):
+    list_display = ("id", "uploaded_by", "status", "imported", "failed", "seconds", "created_at", "finished_at")
+    list_filter = ("status",)
+
+
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
     list_display = ("game", "sender", "created_at")
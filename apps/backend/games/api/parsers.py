@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from ..utils import fastjson
+from .renderers import FastJSONRenderer
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        data = stream.read() if stream is not None else b""
+        if encoding.lower().replace("-", "") != "utf8":
+            data = data.decode(encoding)
+        try:
+            return fastjson.loads(data)
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}") from exc
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from rest_framework.renderers import JSONRenderer
+
+from ..utils import fastjson
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that encodes through ``games.utils.fastjson``.
+
+    Types JSON cannot represent natively (datetimes, decimals, lazy strings)
+    still go through DRF's encoder, so the output matches ``JSONRenderer``.
+    Indented output for the browsable API is left to the parent class.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = fastjson.dumps_bytes(data, default=self.encoder_class().default)
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
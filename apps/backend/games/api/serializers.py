@@ -6,10 +6,23 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from rest_framework import serializers
 
-from ..models import ChatMessage, Game, MatchmakingTicket, Move, default_time_control
+from ..models import (
+    ChatMessage,
+    Game,
+    GameAnalysis,
+    MatchmakingTicket,
+    Move,
+    PgnImport,
+    RatingHistory,
+    default_time_control,
+)
+from ..services.gameplay import pgn_deferred
 
 User = get_user_model()
 
+# Points either side of the player's rating searched when a ticket gives no bounds.
+DEFAULT_RATING_WINDOW = 200
+
 
 class PlayerSummarySerializer(serializers.ModelSerializer):
     class Meta:
@@ -63,6 +76,13 @@ class GameSerializer(serializers.ModelSerializer):
             "updated_at",
         )
 
+    def to_representation(self, instance: Game) -> dict:
+        data = super().to_representation(instance)
+        if pgn_deferred() and instance.status != Game.Status.FINISHED:
+            # Not written until the game ends; clients build it from the moves.
+            data["pgn"] = None
+        return data
+
 
 class GameCreateSerializer(serializers.Serializer):
     opponent_id = serializers.PrimaryKeyRelatedField(
@@ -106,11 +126,14 @@ class GameCreateSerializer(serializers.Serializer):
 
 class MoveSerializer(serializers.ModelSerializer):
     player = PlayerSummarySerializer(read_only=True)
+    # ``id`` is null for packed games; the ply identifies a move either way.
+    ply = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Move
         fields = (
             "id",
+            "ply",
             "move_number",
             "san",
             "uci",
@@ -158,8 +181,17 @@ class MatchmakingTicketCreateSerializer(serializers.Serializer):
     expires_in = serializers.IntegerField(default=300, min_value=60, max_value=900)
 
     def validate(self, attrs: dict) -> dict:
-        rating_min = attrs.get("rating_min", 0)
-        rating_max = attrs.get("rating_max", rating_min + 400)
+        # A bound left out defaults to DEFAULT_RATING_WINDOW points around the
+        # player's own rating, without crossing the bound that was given.
+        rating = self.context["request"].user.rating
+        rating_min = attrs.get("rating_min")
+        rating_max = attrs.get("rating_max")
+        if rating_min is None:
+            rating_min = max(0, rating - DEFAULT_RATING_WINDOW)
+            if rating_max is not None:
+                rating_min = min(rating_min, rating_max)
+        if rating_max is None:
+            rating_max = max(rating + DEFAULT_RATING_WINDOW, rating_min)
         if rating_max < rating_min:
             raise serializers.ValidationError("rating_max must be greater than rating_min")
         attrs["rating_min"] = rating_min
@@ -192,8 +224,84 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class LobbyGameSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    white_player = serializers.CharField(allow_null=True)
+    black_player = serializers.CharField(allow_null=True)
+    status = serializers.CharField()
+    created_at = serializers.CharField(allow_null=True)
+
+
 class LobbySerializer(serializers.Serializer):
     active_games = serializers.IntegerField()
     waiting_games = serializers.IntegerField()
     queue_count = serializers.IntegerField()
-    recent_games = GameSerializer(many=True)
+    recent_games = LobbyGameSerializer(many=True)
+
+
+class LeaderboardEntrySerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+    username = serializers.CharField()
+    rating = serializers.IntegerField()
+
+
+class RatingHistorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RatingHistory
+        fields = ("rating", "previous_rating", "rating_deviation", "engine", "games", "last_game", "created_at")
+        read_only_fields = fields
+
+
+class PgnImportSerializer(serializers.ModelSerializer):
+    games_per_second = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PgnImport
+        fields = (
+            "id",
+            "status",
+            "player_prefix",
+            "imported",
+            "failed",
+            "seconds",
+            "games_per_second",
+            "errors",
+            "created_at",
+            "finished_at",
+        )
+        read_only_fields = fields
+
+    def get_games_per_second(self, obj: PgnImport) -> float:
+        return round(obj.imported / obj.seconds, 1) if obj.seconds else 0.0
+
+
+class PgnImportCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PgnImport
+        fields = ("file", "player_prefix")
+
+
+class GameAnalysisSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GameAnalysis
+        fields = (
+            "game",
+            "status",
+            "depth",
+            "white_accuracy",
+            "black_accuracy",
+            "white_inaccuracies",
+            "white_mistakes",
+            "white_blunders",
+            "black_inaccuracies",
+            "black_mistakes",
+            "black_blunders",
+            "moves",
+            "positions",
+            "cached_positions",
+            "error",
+            "created_at",
+            "finished_at",
+        )
+        read_only_fields = fields
@@ -1,16 +1,29 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import ChatMessageViewSet, GameViewSet, LobbyView, MatchmakingTicketView
+from .views import (
+    ChatMessageViewSet,
+    GameViewSet,
+    LeaderboardMeView,
+    LeaderboardView,
+    LobbyView,
+    MatchmakingTicketView,
+    PgnImportViewSet,
+    RatingHistoryView,
+)
 
 router = DefaultRouter()
 router.register(r"games", GameViewSet, basename="game")
+router.register(r"imports/pgn", PgnImportViewSet, basename="pgn-import")
 
 chat_message_list = ChatMessageViewSet.as_view({"get": "list", "post": "create"})
 
 urlpatterns = [
     path("", include(router.urls)),
     path("lobby/", LobbyView.as_view(), name="lobby"),
+    path("leaderboard/", LeaderboardView.as_view(), name="leaderboard"),
+    path("leaderboard/me/", LeaderboardMeView.as_view(), name="leaderboard-me"),
+    path("users/<int:user_id>/rating-history/", RatingHistoryView.as_view(), name="rating-history"),
     path("matchmaking/ticket/", MatchmakingTicketView.as_view(), name="matchmaking-ticket"),
     path("games/<int:game_pk>/chat/", chat_message_list, name="game-chat"),
 ]
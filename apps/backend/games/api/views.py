@@ -1,31 +1,67 @@
 from __future__ import annotations
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
+from django.utils.text import compress_sequence
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..models import ChatMessage, Game, MatchmakingTicket
+from ..models import ChatMessage, Game, GameAnalysis, MatchmakingTicket, PgnImport, RatingHistory
+from ..services import leaderboard
+from ..services.analysis import request_analysis
+from ..services.engine_pool import analysis_enabled
+from ..services.explorer import DEFAULT_MOVE_LIMIT, MAX_MOVE_LIMIT, explore, resolve_board
 from ..services.gameplay import (
     GameStateError,
     NotParticipantError,
     NotYourTurnError,
-    apply_player_move,
+    TimeExpiredError,
+    submit_move,
+)
+from ..services.game_state import get_game_state
+from ..services.history import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, move_history
+from ..services.lobby import lobby_snapshot
+from ..services.matchmaking import match_ticket
+from ..services.move_codec import is_packed, move_objects
+from ..services.pgn_export import finished_games, iter_pgn
+from ..utils.broadcast import (
+    broadcast_lobby_state,
+    broadcast_match_found,
+    broadcast_matchmaking_queue,
 )
-from ..utils.broadcast import broadcast_game_update, broadcast_lobby_state, broadcast_matchmaking_queue
 from .serializers import (
     ChatMessageSerializer,
+    GameAnalysisSerializer,
     GameCreateSerializer,
     GameSerializer,
+    LeaderboardEntrySerializer,
     LobbySerializer,
     MatchmakingTicketCreateSerializer,
     MatchmakingTicketSerializer,
     MoveCreateSerializer,
     MoveSerializer,
+    PgnImportCreateSerializer,
+    PgnImportSerializer,
+    RatingHistorySerializer,
 )
 
+User = get_user_model()
+
+LEADERBOARD_PAGE_SIZE = 50
+MAX_LEADERBOARD_PAGE_SIZE = 100
+RATING_HISTORY_LIMIT = 200
+
 
 class GameViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     queryset = Game.objects.select_related("white_player", "black_player").all()
@@ -40,31 +76,126 @@ class GameViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.Creat
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         game = serializer.save()
-        broadcast_lobby_state()
+        transaction.on_commit(broadcast_lobby_state)
         output = GameSerializer(game, context=self.get_serializer_context())
         headers = self.get_success_headers(output.data)
         return Response(output.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    def retrieve(self, request: Request, *args, **kwargs):  # type: ignore[override]
+        try:
+            state = get_game_state(int(kwargs["pk"]))
+        except (ValueError, Game.DoesNotExist) as exc:
+            raise NotFound() from exc
+        if _etag_matches(request.headers.get("If-None-Match", ""), state.etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(state.rest, content_type="application/json")
+        response["ETag"] = state.etag
+        return response
+
     @action(detail=True, methods=["get"], serializer_class=MoveSerializer)
     def moves(self, request: Request, pk: str | None = None) -> Response:
         game = self.get_object()
-        moves = game.moves.select_related("player").order_by("move_number", "created_at")
+        if is_packed(game):
+            moves = move_objects(game)
+        else:
+            order = [F("move_number").asc(), F("created_at").asc()]
+            moves = (
+                game.moves.select_related("player")
+                .annotate(ply=Window(RowNumber(), order_by=order))
+                .order_by(*order)
+            )
         serializer = MoveSerializer(moves, many=True, context={"request": request})
         return Response(serializer.data)
 
+    @action(detail=True, methods=["get"])
+    def history(self, request: Request, pk: str | None = None) -> Response:
+        game = self.get_object()
+        after = _int_param(request, "after", 0)
+        limit = min(_int_param(request, "limit", DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+        return Response(move_history(game, after=after, limit=max(1, limit)))
+
+    @action(detail=True, methods=["get", "post"], serializer_class=GameAnalysisSerializer)
+    def analysis(self, request: Request, pk: str | None = None) -> Response:
+        """Engine analysis of a finished game; POST (players and staff) queues it."""
+        game = self.get_object()
+        if request.method == "POST":
+            return self._request_analysis(request, game)
+        try:
+            analysis = game.analysis
+        except GameAnalysis.DoesNotExist as exc:
+            raise NotFound("This game has not been analysed.") from exc
+        return Response(GameAnalysisSerializer(analysis).data)
+
+    def _request_analysis(self, request: Request, game: Game) -> Response:
+        from ..tasks import schedule_analysis_dispatch  # noqa: WPS433 - tasks import the services
+
+        if not request.user.is_staff and request.user.id not in (game.white_player_id, game.black_player_id):
+            raise PermissionDenied("Only the players can request an analysis of this game.")
+        if game.status != Game.Status.FINISHED:
+            raise ValidationError("Only finished games can be analysed.")
+        if not analysis_enabled():
+            return Response({"detail": "Game analysis is not available."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        force = request.user.is_staff and request.data.get("force") in (True, "true", "1")
+        if request_analysis([game.id], force=force):
+            transaction.on_commit(schedule_analysis_dispatch)
+        elif not GameAnalysis.objects.filter(game=game).exists():
+            response = Response(
+                {"detail": "The analysis queue is full; try again later."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            response["Retry-After"] = "60"
+            return response
+        return Response(GameAnalysisSerializer(GameAnalysis.objects.get(game=game)).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["get"], permission_classes=[permissions.AllowAny])
+    def explorer(self, request: Request) -> Response:
+        try:
+            board = resolve_board(request.query_params.get("fen"), request.query_params.get("moves"))
+        except ValueError as exc:
+            raise ValidationError(str(exc)) from exc
+        limit = min(max(1, _int_param(request, "limit", DEFAULT_MOVE_LIMIT)), MAX_MOVE_LIMIT)
+        return Response(explore(board, limit))
+
+    @action(detail=False, methods=["get"])
+    def export(self, request: Request) -> StreamingHttpResponse:
+        """Stream finished games as PGN, for ``?user=<username>`` or (staff only) all players."""
+        username = request.query_params.get("user")
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise NotFound("User not found.")
+        elif request.user.is_staff:
+            user = None
+        else:
+            raise PermissionDenied("Exporting every player's games requires staff access.")
+        games = finished_games(user, since=_date_param(request, "since"), until=_date_param(request, "until"))
+        chunks = (text.encode() for text in iter_pgn(games))
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            response = StreamingHttpResponse(compress_sequence(chunks), content_type="application/x-chess-pgn")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = StreamingHttpResponse(chunks, content_type="application/x-chess-pgn")
+        response["Vary"] = "Accept-Encoding"
+        response["Content-Disposition"] = f'attachment; filename="{username or "games"}.pgn"'
+        return response
+
     @action(detail=True, methods=["post"], serializer_class=MoveCreateSerializer)
     def move(self, request: Request, pk: str | None = None) -> Response:
-        game = self.get_object()
-        if game.status == Game.Status.FINISHED or game.status == Game.Status.ABORTED:
-            raise ValidationError("Game is not accepting moves.")
         serializer = MoveCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        player = request.user
-        if player not in (game.white_player, game.black_player):
-            raise PermissionDenied("You are not part of this game.")
-        expected_turn = "white" if game.white_player == player else "black"
         try:
-            applied = apply_player_move(game, player, serializer.validated_data["uci"])
+            game_id = int(pk)
+        except (TypeError, ValueError) as exc:
+            raise NotFound("Game not found.") from exc
+        try:
+            applied = submit_move(game_id, request.user.id, serializer.validated_data["uci"])
+        except Game.DoesNotExist as exc:
+            raise NotFound("Game not found.") from exc
+        except TimeExpiredError as exc:
+            # Not raised: DRF's exception handler would roll back the request
+            # transaction (ATOMIC_REQUESTS) and with it the committed loss on time.
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         except GameStateError as exc:
             raise ValidationError(str(exc)) from exc
         except NotParticipantError as exc:
@@ -74,31 +205,41 @@ class GameViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.Creat
         except ValueError as exc:
             raise ValidationError(str(exc)) from exc
 
-        payload = {
-            "move": {
-                "id": applied.move.id,
-                "san": applied.move.san,
-                "uci": applied.move.uci,
-                "move_number": applied.move.move_number,
-                "is_check": applied.move.is_check,
-                "is_mate": applied.move.is_mate,
-                "player": applied.move.player.username,
-            },
-            "game": {
-                "fen": applied.result.fen,
-                "pgn": applied.result.pgn,
-                "status": applied.current_status,
-                "winner": game.winner,
-                "moves_count": game.moves_count,
-            },
-        }
-        broadcast_game_update(game.id, {"type": "move_applied", **payload})
+        # move_applied reaches the game group through the event outbox.
         if applied.result.is_checkmate or applied.previous_status != applied.current_status:
-            broadcast_lobby_state()
+            transaction.on_commit(broadcast_lobby_state)
 
         return Response(MoveSerializer(applied.move, context={"request": request}).data, status=status.HTTP_201_CREATED)
 
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of ``etag`` with each tag of an ``If-None-Match`` list."""
+    tags = parse_etags(if_none_match)
+    if tags == ["*"]:
+        return True
+    return etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in tags}
+
+
+def _int_param(request: Request, name: str, default: int) -> int:
+    try:
+        return int(request.query_params.get(name, default))
+    except (TypeError, ValueError) as exc:
+        raise ValidationError({name: "Must be an integer."}) from exc
+
+
+def _date_param(request: Request, name: str):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Must be a date (YYYY-MM-DD)."})
+    return parsed
+
+
 class MatchmakingTicketView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -113,14 +254,19 @@ class MatchmakingTicketView(APIView):
         serializer = MatchmakingTicketCreateSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
         ticket = serializer.save()
-        broadcast_matchmaking_queue()
-        broadcast_lobby_state()
-        return Response(MatchmakingTicketSerializer(ticket, context={"request": request}).data, status=status.HTTP_201_CREATED)
+        game = match_ticket(ticket.id) if settings.MATCHMAKING_MODE == "event" else None
+        if game is not None:
+            transaction.on_commit(lambda: broadcast_match_found(game.id))
+        transaction.on_commit(broadcast_matchmaking_queue)
+        transaction.on_commit(broadcast_lobby_state)
+        data = MatchmakingTicketSerializer(ticket, context={"request": request}).data
+        data["game_id"] = game.id if game is not None else None
+        return Response(data, status=status.HTTP_201_CREATED)
 
     def delete(self, request: Request) -> Response:
         MatchmakingTicket.objects.filter(user=request.user).delete()
-        broadcast_matchmaking_queue()
-        broadcast_lobby_state()
+        transaction.on_commit(broadcast_matchmaking_queue)
+        transaction.on_commit(broadcast_lobby_state)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -128,20 +274,76 @@ class LobbyView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request: Request) -> Response:
-        now = timezone.now()
-        active_games = Game.objects.filter(status=Game.Status.LIVE).count()
-        waiting_games = Game.objects.filter(status=Game.Status.WAITING).count()
-        queue_count = MatchmakingTicket.objects.filter(expires_at__gt=now).count()
-        recent_games = Game.objects.select_related("white_player", "black_player").order_by("-created_at")[:5]
-        serializer = LobbySerializer(
+        serializer = LobbySerializer(lobby_snapshot())
+        return Response(serializer.data)
+
+
+class LeaderboardView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request: Request) -> Response:
+        offset = _int_param(request, "offset", 0)
+        limit = _int_param(request, "limit", LEADERBOARD_PAGE_SIZE)
+        if offset < 0 or not 1 <= limit <= MAX_LEADERBOARD_PAGE_SIZE:
+            raise ValidationError(f"offset must be >= 0 and limit between 1 and {MAX_LEADERBOARD_PAGE_SIZE}.")
+        entries = leaderboard.top(offset, limit)
+        return Response(
             {
-                "active_games": active_games,
-                "waiting_games": waiting_games,
-                "queue_count": queue_count,
-                "recent_games": GameSerializer(recent_games, many=True, context={"request": request}).data,
+                "offset": offset,
+                "total_players": leaderboard.total_players(),
+                "results": LeaderboardEntrySerializer(entries, many=True).data,
             }
         )
-        return Response(serializer.data)
+
+
+class LeaderboardMeView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request: Request) -> Response:
+        user = request.user
+        return Response(
+            {
+                "rank": leaderboard.rank_of(user),
+                "rating": user.rating,
+                "rating_deviation": user.rating_deviation,
+                "total_players": leaderboard.total_players(),
+            }
+        )
+
+
+class RatingHistoryView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request: Request, user_id: int) -> Response:
+        entries = RatingHistory.objects.filter(user_id=user_id)[:RATING_HISTORY_LIMIT]
+        return Response(RatingHistorySerializer(entries, many=True).data)
+
+
+class PgnImportViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Upload a PGN file (optionally gzipped) and follow its background import."""
+
+    queryset = PgnImport.objects.all()
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def get_serializer_class(self):  # type: ignore[override]
+        if self.action == "create":
+            return PgnImportCreateSerializer
+        return PgnImportSerializer
+
+    def create(self, request: Request, *args, **kwargs):  # type: ignore[override]
+        from ..tasks import import_pgn_file  # noqa: WPS433 - tasks import the services
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        pgn_import = serializer.save(uploaded_by=request.user)
+        transaction.on_commit(lambda: import_pgn_file.delay(pgn_import.id))
+        return Response(PgnImportSerializer(pgn_import).data, status=status.HTTP_202_ACCEPTED)
 
 
 class ChatMessageViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
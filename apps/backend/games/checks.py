@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from django.core.checks import Tags, Warning, register
+
+from .utils.caching import cache_is_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs) -> list[Warning]:
+    if cache_is_shared():
+        return []
+    return [
+        Warning(
+            "The default cache is private to each process.",
+            hint=(
+                "Lobby counts are queried and game states rebuilt from the database on every read. "
+                "Point CACHE_URL at a shared backend such as Redis."
+            ),
+            id="games.W001",
+        )
+    ]
@@ -1,22 +1,45 @@
 from __future__ import annotations
 
+from urllib.parse import parse_qs
+
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
-from django.contrib.auth import get_user_model
-from django.utils import timezone
 
-from .models import Game, MatchmakingTicket
+from .models import Game
+from .services.events import events_since
+from .services.game_state import get_game_state
 from .services.gameplay import (
     GameStateError,
     NotParticipantError,
     NotYourTurnError,
-    apply_player_move,
+    submit_move,
 )
+from .services.lobby import lobby_snapshot, queue_count
+from .utils import fastjson
+from .utils.broadcast import agroup_send_many, collect_group_events
+from .utils.spectators import batch_frame, get_spectator_hub, spectator_fanout_enabled
+
+
+class FastJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
+    """JSON consumer that encodes with ``fastjson`` and relays pre-encoded events.
+
+    Group events built by ``encoded_event`` carry the frame as ``text``, so a
+    broadcast is serialised once by the sender instead of once per socket.
+    """
+
+    @classmethod
+    async def decode_json(cls, text_data):
+        return fastjson.loads(text_data)
 
-User = get_user_model()
+    @classmethod
+    async def encode_json(cls, content):
+        return fastjson.dumps(content)
 
+    async def send_event(self, event: dict):
+        await self.send(text_data=event["text"])
 
-class LobbyConsumer(AsyncJsonWebsocketConsumer):
+
+class LobbyConsumer(FastJsonWebsocketConsumer):
     group_name = "lobby"
 
     async def connect(self):
@@ -28,36 +51,14 @@ class LobbyConsumer(AsyncJsonWebsocketConsumer):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def lobby_broadcast(self, event: dict):
-        await self.send_json(event["payload"])
+        await self.send_event(event)
 
     @database_sync_to_async
     def _current_state(self) -> dict:
-        now = timezone.now()
-        active = Game.objects.filter(status=Game.Status.LIVE).count()
-        waiting = Game.objects.filter(status=Game.Status.WAITING).count()
-        queue = MatchmakingTicket.objects.filter(expires_at__gt=now).count()
-        recent = list(
-            Game.objects.select_related("white_player", "black_player").order_by("-created_at")[:5]
-        )
-        return {
-            "type": "lobby_state",
-            "active_games": active,
-            "waiting_games": waiting,
-            "queue_count": queue,
-            "recent_games": [
-                {
-                    "id": game.id,
-                    "white_player": game.white_player.username if game.white_player_id else None,
-                    "black_player": game.black_player.username if game.black_player_id else None,
-                    "status": game.status,
-                    "created_at": game.created_at.isoformat() if game.created_at else None,
-                }
-                for game in recent
-            ],
-        }
-
-
-class MatchmakingConsumer(AsyncJsonWebsocketConsumer):
+        return lobby_snapshot()
+
+
+class MatchmakingConsumer(FastJsonWebsocketConsumer):
     group_name = "matchmaking"
 
     async def connect(self):
@@ -69,26 +70,55 @@ class MatchmakingConsumer(AsyncJsonWebsocketConsumer):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def matchmaking_broadcast(self, event: dict):
-        await self.send_json(event["payload"])
+        await self.send_event(event)
 
     @database_sync_to_async
     def _current_state(self) -> dict:
-        now = timezone.now()
-        queue = MatchmakingTicket.objects.filter(expires_at__gt=now).count()
-        return {"type": "queue_update", "count": queue}
+        return {"type": "queue_update", "count": queue_count()}
 
 
-class GameConsumer(AsyncJsonWebsocketConsumer):
+class GameConsumer(FastJsonWebsocketConsumer):
     async def connect(self):
         self.game_id = int(self.scope["url_route"]["kwargs"]["game_id"])
         self.group_name = f"game_{self.game_id}"
-        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        self.spectator_hub = None
+        # Last event seq written to the socket; live events up to it repeat
+        # what the snapshot or replay already covered and are dropped.
+        self.seq = 0
+        players = await database_sync_to_async(self._players)()
         await self.accept()
-        initial_state = await self._game_state()
-        await self.send_json({"type": "game_state", "state": initial_state})
+        # Join before reading the state, so every event published after the
+        # read arrives live.
+        if spectator_fanout_enabled() and not self._is_player(players):
+            # Spectators share one group subscription per worker.
+            self.spectator_hub = get_spectator_hub(self.channel_layer)
+            await self.spectator_hub.subscribe(self.game_id, self)
+        else:
+            await self.channel_layer.group_add(self.group_name, self.channel_name)
+        state = await database_sync_to_async(get_game_state)(self.game_id)
+        self.seq = state.seq
+        resume_from = self._query_int("resume_from")
+        if resume_from is not None:
+            frames = await database_sync_to_async(events_since)(self.game_id, resume_from, state.seq)
+            if frames is not None:
+                await self.send_json({"type": "resumed", "seq": resume_from, "events": len(frames)})
+                for text in frames:
+                    await self.send(text_data=text)
+                return
+        await self.send(text_data=state.socket_frame(self._query_int("after") or 0))
 
     async def disconnect(self, close_code: int):  # pragma: no cover
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.spectator_hub is not None:
+            await self.spectator_hub.unsubscribe(self.game_id, self)
+        else:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    def _players(self) -> tuple[int, int]:
+        return Game.objects.values_list("white_player_id", "black_player_id").get(pk=self.game_id)
+
+    def _is_player(self, players: tuple[int, int]) -> bool:
+        user = self.scope.get("user")
+        return user is not None and user.is_authenticated and user.id in players
 
     async def receive_json(self, content, **kwargs):
         message_type = content.get("type")
@@ -105,7 +135,10 @@ class GameConsumer(AsyncJsonWebsocketConsumer):
             await self.send_json({"type": "error", "message": "Move missing."})
             return
         try:
-            payload = await self._apply_move(user.id, uci)
+            pending = await self._apply_move(user.id, uci)
+        except Game.DoesNotExist:
+            await self.send_json({"type": "error", "message": "Game not found."})
+            return
         except GameStateError as exc:
             await self.send_json({"type": "error", "message": str(exc)})
             return
@@ -118,68 +151,29 @@ class GameConsumer(AsyncJsonWebsocketConsumer):
         except ValueError as exc:
             await self.send_json({"type": "error", "message": str(exc)})
             return
-
-        await self.channel_layer.group_send(
-            self.group_name,
-            {"type": "game.broadcast", "payload": {"type": "move_applied", **payload}},
-        )
+        # The move_applied event reaches the group through the event outbox;
+        # the move's other broadcasts go out from this event loop.
+        await agroup_send_many(pending)
 
     async def game_broadcast(self, event: dict):
-        await self.send_json(event["payload"])
+        await self.send_game_events([(event.get("seq"), event["text"])])
 
-    @database_sync_to_async
-    def _game_state(self) -> dict:
-        game = (
-            Game.objects.select_related("white_player", "black_player")
-            .prefetch_related("moves")
-            .get(pk=self.game_id)
-        )
-        return {
-            "game": {
-                "id": game.id,
-                "status": game.status,
-                "fen": game.fen,
-                "pgn": game.pgn,
-                "time_control": game.time_control,
-                "moves_count": game.moves_count,
-                "winner": game.winner,
-            },
-            "moves": [
-                {
-                    "id": move.id,
-                    "san": move.san,
-                    "uci": move.uci,
-                    "move_number": move.move_number,
-                    "is_check": move.is_check,
-                    "is_mate": move.is_mate,
-                    "player": move.player.username,
-                }
-                for move in game.moves.order_by("move_number")
-            ],
-        }
+    async def send_game_events(self, events: list[tuple[int | None, str]]):
+        """Write pre-encoded game events, dropping any the socket already has."""
+        texts = [text for seq, text in events if seq is None or seq > self.seq]
+        self.seq = max([self.seq, *(seq for seq, _ in events if seq is not None)])
+        if texts:
+            await self.send(text_data=batch_frame(texts))
+
+    def _query_int(self, name: str) -> int | None:
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        try:
+            return max(0, int(query[name][0]))
+        except (KeyError, ValueError):
+            return None
 
     @database_sync_to_async
-    def _apply_move(self, user_id: int, uci: str) -> dict:
-        user = User.objects.get(pk=user_id)
-        game = Game.objects.select_related("white_player", "black_player").get(pk=self.game_id)
-        applied = apply_player_move(game, user, uci)
-        move = applied.move
-        result = applied.result
-        return {
-            "move": {
-                "id": move.id,
-                "san": move.san,
-                "uci": move.uci,
-                "move_number": move.move_number,
-                "is_check": move.is_check,
-                "is_mate": move.is_mate,
-                "player": move.player.username,
-            },
-            "game": {
-                "fen": result.fen,
-                "pgn": result.pgn,
-                "status": applied.current_status,
-                "winner": game.winner,
-                "moves_count": game.moves_count,
-            },
-        }
+    def _apply_move(self, user_id: int, uci: str) -> list[tuple[str, dict]]:
+        with collect_group_events() as pending:
+            submit_move(self.game_id, user_id, uci)
+        return pending
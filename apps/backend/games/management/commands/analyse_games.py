@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from games.models import Game, GameAnalysis
+from games.services.analysis import request_analysis, run_analysis
+from games.services.engine_pool import EngineUnavailable, analysis_enabled, close_engine_pool, get_engine_pool
+
+
+class Command(BaseCommand):
+    help = "Queue or run engine analysis of finished games"
+
+    def add_arguments(self, parser):
+        parser.add_argument("game_ids", nargs="*", type=int, help="Games to analyse (default: unanalysed games)")
+        parser.add_argument("--limit", type=int, default=1000, help="Most games to pick when no ids are given")
+        parser.add_argument("--force", action="store_true", help="Re-analyse games analysed before")
+        parser.add_argument("--depth", type=int, help="Search depth (default: ANALYSIS_DEPTH)")
+        parser.add_argument(
+            "--inline",
+            action="store_true",
+            help="Analyse here on this process's engine pool instead of queueing Celery tasks",
+        )
+
+    def handle(self, *args, **options):
+        if not analysis_enabled():
+            raise CommandError("ANALYSIS_ENGINE_COMMAND is not set.")
+        game_ids = options["game_ids"]
+        if not game_ids:
+            game_ids = list(
+                Game.objects.filter(status=Game.Status.FINISHED, analysis__isnull=True)
+                .order_by("-id")
+                .values_list("id", flat=True)[: options["limit"]]
+            )
+        added = request_analysis(game_ids, force=options["force"])
+        self.stdout.write(f"{len(added)} of {len(game_ids)} games added to the analysis backlog.")
+        if not options["inline"]:
+            from games.tasks import schedule_analysis_dispatch  # noqa: WPS433 - tasks import the services
+
+            schedule_analysis_dispatch()
+            return
+
+        try:
+            pool = get_engine_pool()
+        except EngineUnavailable as exc:
+            raise CommandError(str(exc)) from exc
+        started = time.monotonic()
+        analysed = positions = cached = 0
+        try:
+            for game_id in added:
+                try:
+                    analysis = run_analysis(game_id, depth=options["depth"], pool=pool)
+                except Exception as exc:  # noqa: BLE001 - recorded on the analysis row
+                    self.stderr.write(f"Game {game_id}: {exc}")
+                    continue
+                if analysis is None:
+                    continue
+                analysed += 1
+                positions += analysis.positions
+                cached += analysis.cached_positions
+        finally:
+            close_engine_pool()
+        elapsed = time.monotonic() - started
+        failed = GameAnalysis.objects.filter(game_id__in=added, status=GameAnalysis.Status.FAILED).count()
+        hit_rate = cached / positions if positions else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Analysed {analysed} games ({failed} failed) in {elapsed:.1f}s; "
+                f"{cached} of {positions} positions came from the evaluation cache ({hit_rate:.0%})."
+            )
+        )
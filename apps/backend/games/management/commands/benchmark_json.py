@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from games.utils import fastjson
+
+
+class Command(BaseCommand):
+    help = "Compare socket payload encoding: stdlib per recipient versus fastjson once per broadcast"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20_000)
+        parser.add_argument("--recipients", type=int, default=100)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        recipients = options["recipients"]
+        self.stdout.write(f"fastjson backend: {fastjson.BACKEND}")
+        for name, payload in (("lobby_state", lobby_payload()), ("move_applied", move_payload())):
+            stdlib = _time_per_call(json.dumps, payload, iterations)
+            fast = _time_per_call(fastjson.dumps, payload, iterations)
+            self.stdout.write(
+                f"{name:>13} ({len(fastjson.dumps(payload)):>5} bytes): "
+                f"json {stdlib * 1e6:7.2f} us | fastjson {fast * 1e6:7.2f} us | "
+                f"{recipients} recipients: per socket {stdlib * recipients * 1e3:7.3f} ms, "
+                f"encode once {fast * 1e3:7.3f} ms"
+            )
+
+
+def _time_per_call(encode, payload: dict, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        encode(payload)
+    return (time.perf_counter() - started) / iterations
+
+
+def lobby_payload() -> dict:
+    return {
+        "type": "lobby_state",
+        "active_games": 1834,
+        "waiting_games": 212,
+        "queue_count": 97,
+        "recent_games": [
+            {
+                "id": 100_000 + index,
+                "white_player": f"player{index}",
+                "black_player": f"opponent{index}",
+                "status": "live",
+                "created_at": "2024-05-01T12:00:00.000000+00:00",
+            }
+            for index in range(5)
+        ],
+    }
+
+
+def move_payload() -> dict:
+    return {
+        "type": "move_applied",
+        "move": {
+            "id": 9_812_345,
+            "ply": 3,
+            "san": "Nf3",
+            "uci": "g1f3",
+            "move_number": 2,
+            "is_check": False,
+            "is_mate": False,
+            "player": "player1",
+        },
+        "game": {
+            "fen": "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2",
+            "status": "live",
+            "winner": None,
+            "moves_count": 2,
+            "clock": {"white": 178_000, "black": 180_000, "running": "black", "last_move_at": None},
+        },
+    }
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+
+from games.services.matchmaking import QueueEntry, find_pairings
+
+TIME_CONTROLS = ["60+0", "180+0", "180+2", "300+0", "600+0", "900+10"]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the matchmaking engine on synthetic ticket queues"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000])
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--legacy-max",
+            type=int,
+            default=0,
+            help="Also time the original pairwise loop for queues up to this size",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        for size in options["sizes"]:
+            entries = synthetic_queue(size, rng)
+            started = time.perf_counter()
+            pairings = find_pairings(entries)
+            elapsed = time.perf_counter() - started
+            line = f"{size:>8} tickets: {len(pairings):>7} pairs in {elapsed * 1000:9.1f} ms"
+            if size <= options["legacy_max"]:
+                started = time.perf_counter()
+                legacy_pairs = _legacy_pairings(entries)
+                legacy_elapsed = time.perf_counter() - started
+                line += f" | pairwise loop: {legacy_pairs:>7} pairs in {legacy_elapsed * 1000:9.1f} ms"
+            self.stdout.write(line)
+
+
+def synthetic_queue(size: int, rng: random.Random) -> list[QueueEntry]:
+    start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    entries = []
+    for index in range(size):
+        rating = max(100, int(rng.gauss(1500, 300)))
+        window = rng.choice((100, 200, 300, 400))
+        entries.append(
+            QueueEntry(
+                ticket_id=index,
+                user_id=index,
+                rating=rating,
+                rating_min=max(0, rating - window),
+                rating_max=rating + window,
+                time_control=rng.choice(TIME_CONTROLS),
+                created_at=start + timedelta(milliseconds=rng.randint(0, 300_000)),
+            )
+        )
+    return entries
+
+
+def _legacy_pairings(entries: list[QueueEntry]) -> int:
+    tickets = sorted(entries, key=lambda entry: (entry.created_at, entry.ticket_id))
+    matched: set[int] = set()
+    pairs = 0
+    for idx, ticket in enumerate(tickets):
+        if ticket.ticket_id in matched:
+            continue
+        for other in tickets[idx + 1 :]:
+            if other.ticket_id in matched or ticket.time_control != other.time_control:
+                continue
+            if ticket.accepts(other.rating) and other.accepts(ticket.rating):
+                matched.update({ticket.ticket_id, other.ticket_id})
+                pairs += 1
+                break
+    return pairs
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from games.models import Game
+from games.services.explorer import apply_tally, index_depth, load_games, pending_games, reset_index
+from games.services.positions import tally_games
+
+
+class Command(BaseCommand):
+    help = "Add every finished, unindexed game to the opening-explorer position index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Empty the index and re-add all finished games")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Games hashed per worker task")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Hashing processes")
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            reset_index()
+        depth = index_depth()
+        batch_size = options["batch_size"]
+        workers = max(1, options["workers"])
+        started = time.monotonic()
+        indexed = 0
+        # Batches are read here and hashed in worker processes; each result
+        # is written in its own transaction, at most 2 * workers batches ahead.
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight: deque = deque()
+            for batch in self._batches(batch_size):
+                in_flight.append((batch, pool.submit(tally_games, _tally_input(batch), depth)))
+                if len(in_flight) >= 2 * workers:
+                    indexed += self._store(*in_flight.popleft(), depth)
+                    self._progress(indexed, started)
+            while in_flight:
+                indexed += self._store(*in_flight.popleft(), depth)
+                self._progress(indexed, started)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} games to a depth of {depth} plies."))
+
+    def _batches(self, batch_size: int):
+        last_id = 0
+        while True:
+            rows = list(
+                pending_games()
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "initial_fen", "winner", "packed_moves")[:batch_size]
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield load_games(rows)
+
+    def _store(self, batch: list, future, depth: int) -> int:
+        tally = future.result()
+        with transaction.atomic():
+            game_ids = [game_id for game_id, *_ in batch]
+            fresh = set(
+                pending_games().select_for_update().filter(id__in=game_ids).values_list("id", flat=True)
+            )
+            if len(fresh) < len(game_ids):
+                # The periodic task indexed some of these meanwhile; recount the rest.
+                tally = tally_games(_tally_input([game for game in batch if game[0] in fresh]), depth)
+            apply_tally(tally)
+            Game.objects.filter(id__in=fresh).update(positions_indexed=True)
+        return len(fresh)
+
+    def _progress(self, indexed: int, started: float) -> None:
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"{indexed} games ({indexed / elapsed if elapsed else 0:.0f} games/s)")
+
+
+def _tally_input(batch: list) -> list[tuple[str, list[str], str]]:
+    return [(initial_fen, ucis, winner) for _, initial_fen, ucis, winner in batch]
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from games.models import Game, Move
+from games.services.move_codec import pack_moves, row_moves_by_game
+
+
+class Command(BaseCommand):
+    help = "Pack the Move rows of finished games into Game.packed_moves and delete the rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Games packed per transaction")
+        parser.add_argument(
+            "--include-live",
+            action="store_true",
+            help="Also pack waiting and live games; their next moves are then stored packed",
+        )
+
+    def handle(self, *args, **options):
+        statuses = [Game.Status.FINISHED, Game.Status.ABORTED]
+        if options["include_live"]:
+            statuses += [Game.Status.WAITING, Game.Status.LIVE]
+        pending = Game.objects.filter(packed_moves__isnull=True, status__in=statuses).order_by("id")
+        games = moves = packed_bytes = 0
+        while True:
+            with transaction.atomic():
+                # Locked games are mid-move; a later run picks them up.
+                locked = pending.select_for_update(skip_locked=True).values_list("id", flat=True)
+                ids = list(locked[: options["batch_size"]])
+                if not ids:
+                    break
+                ucis = row_moves_by_game(ids)
+                batch = [Game(id=game_id, packed_moves=pack_moves(ucis[game_id])) for game_id in ids]
+                Game.objects.bulk_update(batch, ["packed_moves"])
+                deleted, _ = Move.objects.filter(game_id__in=ids).delete()
+            games += len(ids)
+            moves += deleted
+            packed_bytes += sum(len(game.packed_moves) for game in batch)
+            self.stdout.write(f"Packed {games} games...")
+        self.stdout.write(
+            self.style.SUCCESS(f"Packed {games} games: {moves} move rows replaced by {packed_bytes} bytes.")
+        )
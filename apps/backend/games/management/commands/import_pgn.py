@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from games.services.pgn_import import IMPORT_BATCH_SIZE, ImportReport, import_pgn, open_pgn
+
+
+class Command(BaseCommand):
+    help = "Bulk-import finished games from a multi-game PGN file (plain or .gz)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="PGN file to import ('-' for stdin)")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Games per worker task and insert")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Validation processes (0: inline)")
+        parser.add_argument("--player-prefix", default="", help="Prefix for usernames matched or created from PGN names")
+        parser.add_argument("--show-errors", type=int, default=20, help="How many per-game errors to print")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if path == "-":
+            raw = sys.stdin.buffer
+        else:
+            try:
+                raw = open(path, "rb")  # noqa: SIM115 - closed below
+            except OSError as exc:
+                raise CommandError(str(exc)) from exc
+        try:
+            report = import_pgn(
+                open_pgn(raw, path),
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                player_prefix=options["player_prefix"],
+                progress=self._progress,
+            )
+        finally:
+            if raw is not sys.stdin.buffer:
+                raw.close()
+        for error in report.errors[: options["show_errors"]]:
+            self.stderr.write(f"Game {error['game']} ({error['white']} - {error['black']}): {error['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report.imported} games, {report.failed} failed, in {report.seconds:.1f}s "
+                f"({report.games_per_second:.0f} games/s)."
+            )
+        )
+
+    def _progress(self, report: ImportReport) -> None:
+        self.stdout.write(f"{report.imported} imported, {report.failed} failed ({report.games_per_second:.0f} games/s)")
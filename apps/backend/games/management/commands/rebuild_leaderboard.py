@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from games.services import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis leaderboard sorted set from users' current ratings"
+
+    def handle(self, *args, **options):
+        if not leaderboard.available():
+            raise CommandError("LEADERBOARD_REDIS_URL is not configured; the leaderboard is served from the database.")
+        count = leaderboard.rebuild()
+        if count is None:
+            raise CommandError("Another leaderboard rebuild is running.")
+        self.stdout.write(self.style.SUCCESS(f"Leaderboard rebuilt with {count} players."))
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import asyncio
+
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+
+from games.services.clock import FlagWatcher
+
+
+class Command(BaseCommand):
+    help = "Run the flag-fall watcher that ends live games when a clock runs out"
+
+    def handle(self, *args, **options):
+        layer = get_channel_layer()
+        if layer is None:
+            raise CommandError("A channel layer is required to receive clock deadlines.")
+        self.stdout.write(self.style.SUCCESS("Watching game clocks..."))
+        try:
+            asyncio.run(FlagWatcher(layer).run())
+        except KeyboardInterrupt:  # pragma: no cover - interactive shutdown
+            self.stdout.write("Stopped.")
@@ -47,12 +47,22 @@ class Game(models.Model):
     pgn = models.TextField(blank=True)
     time_control = models.JSONField(default=default_time_control)
     moves_count = models.PositiveIntegerField(default=0)
+    # Moves packed two bytes per ply (see services.move_codec) instead of
+    # ``Move`` rows; NULL while the game's moves are stored as rows.
+    packed_moves = models.BinaryField(blank=True, null=True)
+    white_time_ms = models.PositiveIntegerField(blank=True, null=True)
+    black_time_ms = models.PositiveIntegerField(blank=True, null=True)
+    last_move_at = models.DateTimeField(blank=True, null=True)
     winner = models.CharField(
         max_length=8,
         choices=Winner.choices,
         default=Winner.NONE,
     )
+    # Sequence number of the game's latest ``GameEvent``; the socket snapshot
+    # carries it so clients can resume from there.
+    event_seq = models.PositiveIntegerField(default=0)
     elo_processed = models.BooleanField(default=False)
+    positions_indexed = models.BooleanField(default=False)
     started_at = models.DateTimeField(blank=True, null=True)
     ended_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -63,6 +73,12 @@ class Game(models.Model):
         indexes = [
             models.Index(fields=["status"]),
             models.Index(fields=["winner"]),
+            models.Index(fields=["ended_at"]),
+            models.Index(
+                fields=["id"],
+                name="games_game_unindexed",
+                condition=models.Q(status="finished", positions_indexed=False),
+            ),
         ]
 
     def __str__(self) -> str:  # pragma: no cover - representation only
@@ -109,9 +125,55 @@ class Move(models.Model):
         return f"{self.game_id}#{self.move_number} {self.san}"
 
 
+class GameEvent(models.Model):
+    """Outbox row for an event published to the game's channel-layer group.
+
+    Written in the same transaction as the change it describes and marked
+    ``published_at`` once the relay has delivered it. ``seq`` is the game's
+    ``event_seq`` after the event: it increases by one per event within a
+    game, whatever the event, so clients can detect gaps.
+    """
+
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="events")
+    seq = models.PositiveIntegerField()
+    event_type = models.CharField(max_length=32)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(fields=["game", "seq"], name="games_gameevent_game_seq"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="games_gameevent_unpublished",
+                condition=models.Q(published_at__isnull=True),
+            ),
+            models.Index(fields=["published_at"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"GameEvent({self.game_id}#{self.seq} {self.event_type})"
+
+
+def time_control_key(time_control: dict | None) -> str:
+    """Canonical ``"<base>+<increment>"`` form of a time control, as stored and bucketed."""
+    time_control = time_control or {}
+    return f"{int(time_control.get('base', 0))}+{int(time_control.get('increment', 0))}"
+
+
+def time_control_from_key(key: str) -> dict[str, int]:
+    base, _, increment = key.partition("+")
+    return {"base": int(base), "increment": int(increment or 0)}
+
+
 class MatchmakingTicket(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="ticket")
     time_control = models.JSONField(default=default_time_control)
+    time_control_key = models.CharField(max_length=32, editable=False, default="300+0")
     rating_min = models.PositiveIntegerField(default=0)
     rating_max = models.PositiveIntegerField(default=4000)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -122,8 +184,16 @@ class MatchmakingTicket(models.Model):
         indexes = [
             models.Index(fields=["created_at"]),
             models.Index(fields=["rating_min", "rating_max"]),
+            models.Index(fields=["time_control_key", "created_at"]),
         ]
 
+    def save(self, *args, **kwargs) -> None:
+        self.time_control_key = time_control_key(self.time_control)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "time_control" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "time_control_key"}
+        super().save(*args, **kwargs)
+
     def is_expired(self) -> bool:
         return timezone.now() >= self.expires_at
 
@@ -131,6 +201,171 @@ class MatchmakingTicket(models.Model):
         return f"Ticket({self.user_id})"
 
 
+class RatingHistory(models.Model):
+    """A player's rating after one rating batch (append-only)."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="rating_history")
+    engine = models.CharField(max_length=16)
+    rating = models.PositiveIntegerField()
+    previous_rating = models.PositiveIntegerField()
+    rating_deviation = models.FloatField(blank=True, null=True)
+    games = models.PositiveIntegerField(default=1)
+    last_game = models.ForeignKey(Game, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"RatingHistory({self.user_id}: {self.previous_rating} -> {self.rating})"
+
+
+class RatingPeriod(models.Model):
+    """A closed Glicko-2 rating period, ending (exclusively) at ``end``.
+
+    Games that ended before ``end`` were rated together and every player
+    without one had their deviation grown by their volatility.
+    """
+
+    end = models.DateTimeField(unique=True)
+    games = models.PositiveIntegerField(default=0)
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-end"]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"RatingPeriod(until {self.end:%Y-%m-%d %H:%M})"
+
+
+class PositionStat(models.Model):
+    """Results of all indexed games that reached a position.
+
+    ``key`` is the position's polyglot Zobrist hash stored as a signed 64-bit
+    integer (see ``services.positions``).
+    """
+
+    key = models.BigIntegerField(primary_key=True)
+    games = models.PositiveIntegerField(default=0)
+    white_wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    black_wins = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"PositionStat({self.key}: {self.games} games)"
+
+
+class PositionMove(models.Model):
+    """Results of the indexed games that played ``uci`` from a position."""
+
+    position_key = models.BigIntegerField()
+    uci = models.CharField(max_length=8)
+    games = models.PositiveIntegerField(default=0)
+    white_wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    black_wins = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["position_key", "uci"], name="games_positionmove_key_uci"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"PositionMove({self.position_key} {self.uci}: {self.games} games)"
+
+
+class PositionEvaluation(models.Model):
+    """Engine evaluation of a position, shared by every analysed game reaching it.
+
+    ``key`` is the signed polyglot hash, as for ``PositionStat``. Scores are
+    from White's point of view: ``cp`` in centipawns or ``mate`` in moves
+    (negative when Black mates).
+    """
+
+    key = models.BigIntegerField(primary_key=True)
+    depth = models.PositiveSmallIntegerField()
+    cp = models.IntegerField(blank=True, null=True)
+    mate = models.SmallIntegerField(blank=True, null=True)
+    best_move = models.CharField(max_length=8, blank=True)
+
+    def __str__(self) -> str:  # pragma: no cover
+        score = f"#{self.mate}" if self.mate is not None else self.cp
+        return f"PositionEvaluation({self.key}: {score} at depth {self.depth})"
+
+
+class GameAnalysis(models.Model):
+    """Engine annotations of a finished game, written by ``games.tasks.analyse_game``.
+
+    ``moves`` holds one entry per ply: the evaluation after it, the move's
+    accuracy, its judgement (inaccuracy, mistake or blunder) and the engine's
+    preferred move.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        QUEUED = "queued", _("Queued")
+        RUNNING = "running", _("Running")
+        DONE = "done", _("Done")
+        FAILED = "failed", _("Failed")
+
+    game = models.OneToOneField(Game, on_delete=models.CASCADE, related_name="analysis")
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    depth = models.PositiveSmallIntegerField(default=0)
+    white_accuracy = models.FloatField(blank=True, null=True)
+    black_accuracy = models.FloatField(blank=True, null=True)
+    white_inaccuracies = models.PositiveSmallIntegerField(default=0)
+    white_mistakes = models.PositiveSmallIntegerField(default=0)
+    white_blunders = models.PositiveSmallIntegerField(default=0)
+    black_inaccuracies = models.PositiveSmallIntegerField(default=0)
+    black_mistakes = models.PositiveSmallIntegerField(default=0)
+    black_blunders = models.PositiveSmallIntegerField(default=0)
+    moves = models.JSONField(default=list, blank=True)
+    positions = models.PositiveIntegerField(default=0)
+    cached_positions = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    queued_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"GameAnalysis({self.game_id}: {self.status})"
+
+
+class PgnImport(models.Model):
+    """An uploaded PGN file imported in the background by ``games.tasks.import_pgn_file``."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        RUNNING = "running", _("Running")
+        DONE = "done", _("Done")
+        FAILED = "failed", _("Failed")
+
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
+    file = models.FileField(upload_to="pgn_imports/%Y/%m/")
+    player_prefix = models.CharField(max_length=32, blank=True)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    imported = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    seconds = models.FloatField(default=0.0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"PgnImport({self.pk}: {self.status})"
+
+
 class ChatMessage(models.Model):
     game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="chat_messages")
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chat_messages")
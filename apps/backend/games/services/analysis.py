@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import timedelta
+from statistics import fmean
+from typing import Iterable
+
+import chess
+import chess.engine
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import DEFAULT_START_FEN, Game, GameAnalysis, PositionEvaluation
+from .engine_pool import EnginePool, get_engine_pool
+from .move_codec import stored_moves
+from .positions import position_keys
+
+DEFAULT_DEPTH = 14
+UPSERT_CHUNK = 500
+# Drops in the mover's expected score (0-1) that make a move a blunder,
+# mistake or inaccuracy; lichess uses the same thresholds.
+JUDGEMENTS = ((0.15, "blunder"), (0.10, "mistake"), (0.05, "inaccuracy"))
+COUNT_FIELDS = {"blunder": "blunders", "mistake": "mistakes", "inaccuracy": "inaccuracies"}
+IN_FLIGHT = (GameAnalysis.Status.QUEUED, GameAnalysis.Status.RUNNING)
+WAITING = (GameAnalysis.Status.PENDING, *IN_FLIGHT)
+
+
+@dataclass(slots=True)
+class Evaluation:
+    score: chess.engine.Score  # White's point of view
+    best_move: str = ""
+
+
+def request_analysis(game_ids: Iterable[int], force: bool = False) -> list[int]:
+    """Add finished games to the analysis backlog and return the ids added.
+
+    Games already waiting or analysed are skipped; ``force`` re-queues
+    analysed and failed ones. Once ``ANALYSIS_BACKLOG_LIMIT`` games are
+    waiting nothing more is added, so a burst of finished games or a large
+    backfill cannot grow the backlog without bound.
+    """
+    game_ids = list(Game.objects.filter(id__in=list(game_ids), status=Game.Status.FINISHED).values_list("id", flat=True))
+    if not game_ids:
+        return []
+    room = getattr(settings, "ANALYSIS_BACKLOG_LIMIT", 10000) - GameAnalysis.objects.filter(status__in=WAITING).count()
+    if room <= 0:
+        return []
+    existing = dict(GameAnalysis.objects.filter(game_id__in=game_ids).values_list("game_id", "status"))
+    redo = {GameAnalysis.Status.DONE, GameAnalysis.Status.FAILED} if force else set()
+    added = [game_id for game_id in game_ids if game_id not in existing or existing[game_id] in redo][:room]
+    GameAnalysis.objects.bulk_create(
+        [GameAnalysis(game_id=game_id) for game_id in added if game_id not in existing],
+        ignore_conflicts=True,
+    )
+    GameAnalysis.objects.filter(game_id__in=[game_id for game_id in added if game_id in existing]).update(
+        status=GameAnalysis.Status.PENDING, error="", queued_at=None
+    )
+    return added
+
+
+def claim_analyses(limit: int) -> list[int]:
+    """Mark pending analyses queued while fewer than ``limit`` are in flight.
+
+    Returns the game ids to hand to ``games.tasks.analyse_game``. Analyses
+    queued or running for longer than ``ANALYSIS_STALE_AFTER`` seconds are
+    taken to be lost (a worker died or the message was dropped) and become
+    pending again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, "ANALYSIS_STALE_AFTER", 3600))
+    GameAnalysis.objects.filter(status__in=IN_FLIGHT, queued_at__lt=stale).update(status=GameAnalysis.Status.PENDING)
+    with transaction.atomic():
+        free = limit - GameAnalysis.objects.filter(status__in=IN_FLIGHT).count()
+        if free <= 0:
+            return []
+        game_ids = list(
+            GameAnalysis.objects.select_for_update(skip_locked=True)
+            .filter(status=GameAnalysis.Status.PENDING)
+            .order_by("id")
+            .values_list("game_id", flat=True)[:free]
+        )
+        GameAnalysis.objects.filter(game_id__in=game_ids).update(status=GameAnalysis.Status.QUEUED, queued_at=now)
+    return game_ids
+
+
+def run_analysis(game_id: int, depth: int | None = None, pool: EnginePool | None = None) -> GameAnalysis | None:
+    """Analyse a game whose analysis is pending or queued.
+
+    Returns None when there is nothing to do: the game was never requested,
+    is already analysed or another worker took it.
+    """
+    depth = depth or getattr(settings, "ANALYSIS_DEPTH", DEFAULT_DEPTH)
+    rows = GameAnalysis.objects.filter(game_id=game_id)
+    waiting = (GameAnalysis.Status.PENDING, GameAnalysis.Status.QUEUED)
+    if not rows.filter(status__in=waiting).update(status=GameAnalysis.Status.RUNNING, queued_at=timezone.now()):
+        return None
+    try:
+        fields = evaluate_game(Game.objects.get(pk=game_id), depth, pool or get_engine_pool())
+    except Exception as exc:
+        rows.update(status=GameAnalysis.Status.FAILED, error=str(exc) or type(exc).__name__, finished_at=timezone.now())
+        raise
+    rows.update(status=GameAnalysis.Status.DONE, depth=depth, error="", finished_at=timezone.now(), **fields)
+    return rows.get()
+
+
+def evaluate_game(game: Game, depth: int, pool: EnginePool) -> dict:
+    """``GameAnalysis`` field values for ``game``.
+
+    Positions are looked up by polyglot key, so a position reached in many
+    games (every opening line) is analysed once; evaluations ignore how the
+    position was reached, repetitions included. Finished positions are
+    scored without the engine.
+    """
+    initial_fen = game.initial_fen or DEFAULT_START_FEN
+    ucis, sans = stored_moves(game)
+    keys = position_keys(initial_fen, ucis)
+    board = chess.Board(initial_fen)
+    finished: dict[int, Evaluation] = {}
+    boards: dict[int, chess.Board] = {}
+    for ply, key in enumerate(keys):
+        if ply:
+            board.push_uci(ucis[ply - 1])
+        outcome = board.outcome()
+        if outcome is not None:
+            finished[ply] = _outcome_evaluation(outcome)
+        elif key not in boards:
+            boards[key] = board.copy(stack=False)
+
+    evaluations, cached = evaluate_positions(boards, depth, pool)
+    scores = [finished[ply] if ply in finished else evaluations[key] for ply, key in enumerate(keys)]
+    fields = annotate(chess.Board(initial_fen).turn, ucis, sans, scores)
+    fields.update(positions=len(boards), cached_positions=cached)
+    return fields
+
+
+def evaluate_positions(
+    boards: dict[int, chess.Board], depth: int, pool: EnginePool
+) -> tuple[dict[int, Evaluation], int]:
+    """Evaluations of ``boards`` (by position key) and how many came from the cache.
+
+    Positions missing from ``PositionEvaluation`` at ``depth`` or deeper are
+    analysed on one pooled engine and stored for the next game.
+    """
+    evaluations = {
+        row.key: Evaluation(_stored_score(row.cp, row.mate), row.best_move)
+        for row in PositionEvaluation.objects.filter(key__in=list(boards), depth__gte=depth)
+    }
+    cached = len(evaluations)
+    missing = [key for key in boards if key not in evaluations]
+    if missing:
+        limit = chess.engine.Limit(depth=depth)
+        analysed: dict[int, Evaluation] = {}
+        with pool.engine() as engine:
+            for key in missing:
+                info = engine.analyse(boards[key], limit)
+                pv = info.get("pv") or []
+                analysed[key] = Evaluation(info["score"].white(), pv[0].uci() if pv else "")
+        _store_evaluations(analysed, depth)
+        evaluations.update(analysed)
+    return evaluations, cached
+
+
+def annotate(first_mover: chess.Color, ucis: list[str], sans: list[str], scores: list[Evaluation]) -> dict:
+    """Per-move annotations and per-player totals from the evaluation of every position.
+
+    A move's accuracy follows lichess: 103.1668 * exp(-0.04354 * loss) -
+    3.1669, where ``loss`` is the drop in the mover's winning chances in
+    percentage points. A player's accuracy is the mean over their moves.
+    """
+    moves = []
+    accuracies: dict[chess.Color, list[float]] = {chess.WHITE: [], chess.BLACK: []}
+    fields: dict = {f"{color}_{name}": 0 for color in ("white", "black") for name in COUNT_FIELDS.values()}
+    for ply, (uci, san) in enumerate(zip(ucis, sans)):
+        mover = first_mover if ply % 2 == 0 else not first_mover
+        before, after = scores[ply], scores[ply + 1]
+        loss = max(0.0, _expectation(before.score, mover) - _expectation(after.score, mover))
+        accuracy = min(100.0, max(0.0, 103.1668 * math.exp(-0.04354 * loss * 100) - 3.1669))
+        accuracies[mover].append(accuracy)
+        entry = {
+            "ply": ply + 1,
+            "uci": uci,
+            "san": san,
+            "cp": after.score.score(),
+            "mate": after.score.mate(),
+            "accuracy": round(accuracy, 1),
+        }
+        judgement = next((name for threshold, name in JUDGEMENTS if loss >= threshold), None)
+        if judgement and uci != before.best_move:
+            entry["judgement"] = judgement
+            entry["best"] = before.best_move
+            fields[f"{chess.COLOR_NAMES[mover]}_{COUNT_FIELDS[judgement]}"] += 1
+        moves.append(entry)
+    fields.update(
+        moves=moves,
+        white_accuracy=round(fmean(accuracies[chess.WHITE]), 1) if accuracies[chess.WHITE] else None,
+        black_accuracy=round(fmean(accuracies[chess.BLACK]), 1) if accuracies[chess.BLACK] else None,
+    )
+    return fields
+
+
+def _expectation(score: chess.engine.Score, color: chess.Color) -> float:
+    expectation = score.wdl(model="lichess").expectation()
+    return expectation if color == chess.WHITE else 1.0 - expectation
+
+
+def _outcome_evaluation(outcome: chess.Outcome) -> Evaluation:
+    if outcome.winner is None:
+        return Evaluation(chess.engine.Cp(0))
+    # Mate(0) is "mated", from White's point of view when White lost.
+    return Evaluation(chess.engine.MateGiven if outcome.winner == chess.WHITE else chess.engine.Mate(0))
+
+
+def _stored_score(cp: int | None, mate: int | None) -> chess.engine.Score:
+    return chess.engine.Mate(mate) if mate is not None else chess.engine.Cp(cp or 0)
+
+
+def _store_evaluations(evaluations: dict[int, Evaluation], depth: int) -> None:
+    # INSERT ... ON CONFLICT DO UPDATE ... WHERE (PostgreSQL and SQLite) lets
+    # a concurrent deeper analysis of the same position win; the ORM's
+    # update_conflicts cannot compare the depths.
+    quote = connection.ops.quote_name
+    table = quote(PositionEvaluation._meta.db_table)
+    columns = ("key", "depth", "cp", "mate", "best_move")
+    updates = ", ".join(f"{quote(column)} = EXCLUDED.{quote(column)}" for column in columns[1:])
+    placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    rows = [
+        (key, depth, evaluation.score.score(), evaluation.score.mate(), evaluation.best_move)
+        for key, evaluation in evaluations.items()
+    ]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_CHUNK):
+            chunk = rows[start : start + UPSERT_CHUNK]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+                f"VALUES {', '.join([placeholder] * len(chunk))} "
+                f"ON CONFLICT ({quote('key')}) DO UPDATE SET {updates} "
+                f"WHERE EXCLUDED.{quote('depth')} > {table}.{quote('depth')}",
+                [value for row in chunk for value in row],
+            )
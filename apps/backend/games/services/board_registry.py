@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+
+from ..models import Game
+from .chess_engine import GameEngine
+
+
+@dataclass(slots=True)
+class RegistryStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass(slots=True)
+class _Entry:
+    engine: GameEngine
+    touched_at: float
+
+
+class LiveBoardRegistry:
+    """Per-process cache of live ``GameEngine`` instances keyed by game id.
+
+    Entries are evicted least-recently-used once ``max_entries`` is reached and
+    expire after ``ttl`` seconds without access. A cached board is only reused
+    while its FEN matches ``Game.fen``, so a move applied by another process
+    simply turns into a miss and the board is rebuilt from the stored moves.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, game: Game) -> GameEngine:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(game.pk)
+            if entry is not None and now - entry.touched_at <= self.ttl and entry.engine.board.fen() == game.fen:
+                entry.touched_at = now
+                self._entries.move_to_end(game.pk)
+                self._hits += 1
+                return entry.engine
+            self._misses += 1
+
+        engine = GameEngine.from_game(game)
+        with self._lock:
+            self._entries[game.pk] = _Entry(engine=engine, touched_at=now)
+            self._entries.move_to_end(game.pk)
+            self._evict(now)
+        return engine
+
+    def discard(self, game_id: int) -> None:
+        with self._lock:
+            self._entries.pop(game_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> RegistryStats:
+        with self._lock:
+            return RegistryStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                size=len(self._entries),
+            )
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            game_id, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - entry.touched_at <= self.ttl:
+                break
+            del self._entries[game_id]
+            self._evictions += 1
+
+
+_registry: LiveBoardRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_live_board_registry() -> LiveBoardRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = LiveBoardRegistry(
+                    max_entries=getattr(settings, "LIVE_BOARD_REGISTRY_SIZE", 1024),
+                    ttl=getattr(settings, "LIVE_BOARD_REGISTRY_TTL", 3600),
+                )
+    return _registry
@@ -4,9 +4,10 @@ from dataclasses import dataclass
 from typing import Iterable, Sequence
 
 import chess
-import chess.pgn
 
 from ..models import DEFAULT_START_FEN, Game
+from .move_codec import is_packed, unpack_moves
+from .pgn import PgnBuilder
 
 
 @dataclass(slots=True)
@@ -16,25 +17,46 @@ class MoveValidationResult:
     move_number: int
     is_check: bool
     is_checkmate: bool
-    pgn: str
+    pgn: str | None  # None when rendering was skipped
 
 
 class GameEngine:
     """Utility wrapper around python-chess for ShamChess."""
 
-    def __init__(self, starting_fen: str = DEFAULT_START_FEN, moves: Sequence[str] | None = None) -> None:
+    def __init__(
+        self,
+        starting_fen: str = DEFAULT_START_FEN,
+        moves: Sequence[str] | None = None,
+        sans: Sequence[str] | None = None,
+    ) -> None:
         self.starting_fen = starting_fen
         self.board = chess.Board(starting_fen)
+        self.pgn = PgnBuilder(starting_fen)
         if moves:
-            for uci in moves:
-                self.board.push(chess.Move.from_uci(uci))
+            for index, uci in enumerate(moves):
+                move = chess.Move.from_uci(uci)
+                self.pgn.append(self.board, sans[index] if sans else self.board.san(move))
+                self.board.push(move)
+            if self.board.is_checkmate():
+                self.pgn.set_result(self._checkmate_result())
 
     @classmethod
     def from_game(cls, game: Game) -> "GameEngine":
-        existing_moves = list(game.moves.order_by("move_number", "created_at").values_list("uci", flat=True))
-        return cls(starting_fen=game.initial_fen or DEFAULT_START_FEN, moves=existing_moves)
+        if is_packed(game):
+            return cls(starting_fen=game.initial_fen or DEFAULT_START_FEN, moves=unpack_moves(game.packed_moves))
+        existing = list(game.moves.order_by("move_number", "created_at").values_list("uci", "san"))
+        return cls(
+            starting_fen=game.initial_fen or DEFAULT_START_FEN,
+            moves=[uci for uci, _ in existing],
+            sans=[san for _, san in existing],
+        )
+
+    def validate_move(self, uci: str, render_pgn: bool = True) -> MoveValidationResult:
+        """Push ``uci`` if it is legal.
 
-    def validate_move(self, uci: str) -> MoveValidationResult:
+        With ``render_pgn=False`` the move is still recorded for a later
+        render, but the PGN text is only produced if the move ends the game.
+        """
         try:
             move = chess.Move.from_uci(uci)
         except ValueError as exc:  # pragma: no cover - invalid format
@@ -44,13 +66,16 @@ class GameEngine:
             raise ValueError("Illegal move")
 
         san = self.board.san(move)
+        self.pgn.append(self.board, san)
         self.board.push(move)
 
         fen = self.board.fen()
         is_check = self.board.is_check()
         is_mate = self.board.is_checkmate()
+        if is_mate:
+            self.pgn.set_result(self._checkmate_result())
         move_number = self._current_move_number()
-        pgn = self._export_pgn()
+        pgn = self.pgn.render() if render_pgn or is_mate else None
 
         return MoveValidationResult(
             fen=fen,
@@ -64,18 +89,11 @@ class GameEngine:
     def _current_move_number(self) -> int:
         return self.board.fullmove_number - (1 if self.board.turn is chess.WHITE else 0)
 
+    def _checkmate_result(self) -> str:
+        return "0-1" if self.board.turn is chess.WHITE else "1-0"
+
     def _export_pgn(self) -> str:
-        game = chess.pgn.Game()
-        initial_board = chess.Board(self.starting_fen)
-        if self.starting_fen != chess.STARTING_FEN:
-            game.setup(initial_board)
-            game.headers["SetUp"] = "1"
-            game.headers["FEN"] = self.starting_fen
-        node = game
-        for move in self.board.move_stack:
-            node = node.add_variation(move)
-        exporter = chess.pgn.StringExporter(headers=True, variations=False, comments=False)
-        return game.accept(exporter)
+        return self.pgn.render()
 
 
 def validate_move_for_game(game: Game, uci: str) -> MoveValidationResult:
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta
+
+import chess
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Game
+from ..utils.broadcast import broadcast_clock_deadline, broadcast_lobby_state
+from . import move_codec
+from .board_registry import get_live_board_registry
+from .events import advance_seq, record_game_event
+
+CLOCK_GROUP = "game_clocks"
+
+
+def is_timed(game: Game) -> bool:
+    time_control = game.time_control or {}
+    return bool(time_control.get("base") or time_control.get("increment"))
+
+
+def side_to_move(game: Game) -> str:
+    return "black" if game.fen.split(" ")[1] == "b" else "white"
+
+
+def remaining_ms(game: Game, color: str, now: datetime) -> int:
+    """Time left on ``color``'s clock at ``now``, including the running turn."""
+    stored = getattr(game, f"{color}_time_ms")
+    if stored is None:
+        stored = _base_ms(game)
+    if game.status == Game.Status.LIVE and game.last_move_at is not None and color == side_to_move(game):
+        stored -= _elapsed_ms(game.last_move_at, now)
+    return stored
+
+
+def deadline(game: Game) -> datetime | None:
+    """When the side to move flags, or ``None`` if no clock is running."""
+    if not is_timed(game) or game.status != Game.Status.LIVE or game.last_move_at is None:
+        return None
+    stored = getattr(game, f"{side_to_move(game)}_time_ms")
+    if stored is None:
+        stored = _base_ms(game)
+    return game.last_move_at + timedelta(milliseconds=stored)
+
+
+def flagged_side(game: Game, now: datetime) -> str | None:
+    if not is_timed(game) or game.status != Game.Status.LIVE or game.last_move_at is None:
+        return None
+    color = side_to_move(game)
+    return color if remaining_ms(game, color, now) <= 0 else None
+
+
+def apply_move_clock(game: Game, color: str, now: datetime) -> list[str]:
+    """Charge ``color`` for the move just played and start the opponent's clock.
+
+    The first move of the game is free; from then on the mover loses the time
+    elapsed since ``last_move_at`` and gains the increment. Returns the fields
+    that need saving.
+    """
+    if not is_timed(game):
+        return []
+    base_ms = _base_ms(game)
+    if game.white_time_ms is None:
+        game.white_time_ms = base_ms
+    if game.black_time_ms is None:
+        game.black_time_ms = base_ms
+    if game.last_move_at is not None:
+        field = f"{color}_time_ms"
+        left = max(0, getattr(game, field) - _elapsed_ms(game.last_move_at, now))
+        setattr(game, field, left + _increment_ms(game))
+    game.last_move_at = now
+    return ["white_time_ms", "black_time_ms", "last_move_at"]
+
+
+def clock_payload(game: Game) -> dict | None:
+    if not is_timed(game):
+        return None
+    return {
+        "white": game.white_time_ms if game.white_time_ms is not None else _base_ms(game),
+        "black": game.black_time_ms if game.black_time_ms is not None else _base_ms(game),
+        "running": side_to_move(game) if game.status == Game.Status.LIVE and game.last_move_at else None,
+        "last_move_at": game.last_move_at.isoformat() if game.last_move_at else None,
+    }
+
+
+def publish_deadline(game: Game) -> None:
+    """Tell the flag watcher about the game's new deadline once committed."""
+    game_id = game.id
+    when = deadline(game)
+    timestamp = when.timestamp() if when is not None else None
+    transaction.on_commit(lambda: broadcast_clock_deadline(game_id, timestamp))
+
+
+def finish_on_time(game: Game, loser: str, now: datetime) -> None:
+    """End ``game`` because ``loser`` ran out of time.
+
+    The opponent wins unless they lack mating material, in which case the
+    game is drawn. Must be called with the game row locked.
+    """
+    winner_color = "black" if loser == "white" else "white"
+    board = chess.Board(game.fen)
+    if board.has_insufficient_material(chess.WHITE if winner_color == "white" else chess.BLACK):
+        game.winner = Game.Winner.DRAW
+        result = "1/2-1/2"
+    else:
+        game.winner = Game.Winner.WHITE if winner_color == "white" else Game.Winner.BLACK
+        result = "1-0" if winner_color == "white" else "0-1"
+
+    registry = get_live_board_registry()
+    engine = registry.get(game)
+    engine.pgn.set_result(result)
+    registry.discard(game.id)
+
+    setattr(game, f"{loser}_time_ms", 0)
+    game.status = Game.Status.FINISHED
+    game.ended_at = now
+    game.pgn = engine.pgn.render()
+    update_fields = ["status", "winner", "ended_at", "pgn", f"{loser}_time_ms", "updated_at"]
+    if move_codec.packs_move(game, finishing=True):
+        update_fields.extend(move_codec.store_board(game, engine.board))
+    update_fields.extend(advance_seq(game))
+    game.save(update_fields=update_fields)
+
+    from ..tasks import schedule_rating_update  # noqa: WPS433 - local import to avoid circular dependency
+    from .game_state import record_status_change  # noqa: WPS433 - game_state imports this module
+
+    record_status_change(game)
+
+    payload = {
+        "reason": "timeout",
+        "winner": game.winner,
+        "status": game.status,
+        "clock": clock_payload(game),
+    }
+    game_id = game.id
+    record_game_event(game_id, game.event_seq, "game_over", payload)
+    transaction.on_commit(lambda: schedule_rating_update(game_id))
+    transaction.on_commit(broadcast_lobby_state)
+
+
+def expire_game(game_id: int) -> float | None:
+    """Flag the side to move if its time is up.
+
+    Returns the game's current deadline (epoch seconds) when the clock has
+    not actually run out, e.g. because a move arrived after the watcher
+    scheduled this check, so the caller can reschedule.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        game = Game.objects.select_for_update().filter(pk=game_id).first()
+        if game is None or game.status != Game.Status.LIVE:
+            return None
+        loser = flagged_side(game, now)
+        if loser is None:
+            when = deadline(game)
+            return when.timestamp() if when is not None else None
+        finish_on_time(game, loser, now)
+    return None
+
+
+class FlagScheduler:
+    """Min-heap of per-game flag deadlines with lazy cancellation.
+
+    Rescheduling a game just pushes a new entry; entries whose deadline no
+    longer matches the game's latest one are skipped when they surface.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int]] = []
+        self._deadlines: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, game_id: int) -> bool:
+        return game_id in self._deadlines
+
+    def schedule(self, game_id: int, when: float) -> None:
+        if self._deadlines.get(game_id) == when:
+            return
+        self._deadlines[game_id] = when
+        heapq.heappush(self._heap, (when, game_id))
+
+    def cancel(self, game_id: int) -> None:
+        self._deadlines.pop(game_id, None)
+
+    def next_deadline(self) -> float | None:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> list[int]:
+        due = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, game_id = heapq.heappop(self._heap)
+            del self._deadlines[game_id]
+            due.append(game_id)
+
+    def _drop_stale(self) -> None:
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+
+class FlagWatcher:
+    """Single asyncio task that ends games whose clock runs out.
+
+    Deadlines arrive over the channel layer (``game_clocks`` group) after each
+    committed move and are kept in one ``FlagScheduler``. Those messages are
+    best effort (a full or expired channel drops them), so the deadlines of
+    all live games are also reloaded from the database at startup and every
+    ``reload_interval`` seconds; a lost update delays a flag by at most that
+    long. No per-game tasks are used: the loop sleeps until the earliest
+    deadline, the next update or the next reload.
+    """
+
+    def __init__(
+        self,
+        layer,
+        scheduler: FlagScheduler | None = None,
+        reload_interval: float | None = None,
+    ) -> None:
+        self.layer = layer
+        self.scheduler = scheduler or FlagScheduler()
+        if reload_interval is None:
+            reload_interval = getattr(settings, "CLOCK_DEADLINE_RELOAD_INTERVAL", 60.0)
+        self.reload_interval = reload_interval
+        self._wake = asyncio.Event()
+
+    async def run(self) -> None:
+        channel = await self.layer.new_channel()
+        await self.layer.group_add(CLOCK_GROUP, channel)
+        receiver = asyncio.create_task(self._receive(channel))
+        try:
+            await self._tick_loop()
+        finally:
+            receiver.cancel()
+            await self.layer.group_discard(CLOCK_GROUP, channel)
+
+    async def _receive(self, channel: str) -> None:
+        while True:
+            message = await self.layer.receive(channel)
+            self.handle(message)
+
+    def handle(self, message: dict) -> None:
+        game_id = message["game_id"]
+        when = message.get("deadline")
+        if when is None:
+            self.scheduler.cancel(game_id)
+        else:
+            self.scheduler.schedule(game_id, when)
+        self._wake.set()
+
+    async def _tick_loop(self) -> None:
+        expire = database_sync_to_async(expire_game)
+        load = database_sync_to_async(self._live_deadlines)
+        reload_at = 0.0
+        while True:
+            if time.time() >= reload_at:
+                for game_id, when in await load():
+                    self.scheduler.schedule(game_id, when)
+                reload_at = time.time() + self.reload_interval if self.reload_interval > 0 else float("inf")
+            self._wake.clear()
+            upcoming = self.scheduler.next_deadline()
+            wake_at = reload_at if upcoming is None else min(upcoming, reload_at)
+            timeout = None if wake_at == float("inf") else max(0.0, wake_at - time.time())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            for game_id in self.scheduler.pop_due(time.time()):
+                rescheduled = await expire(game_id)
+                if rescheduled is not None and game_id not in self.scheduler:
+                    self.scheduler.schedule(game_id, rescheduled)
+
+    @staticmethod
+    def _live_deadlines() -> list[tuple[int, float]]:
+        games = Game.objects.filter(status=Game.Status.LIVE, last_move_at__isnull=False).only(
+            "id", "status", "fen", "time_control", "white_time_ms", "black_time_ms", "last_move_at"
+        )
+        deadlines = []
+        for game in games.iterator(chunk_size=2000):
+            when = deadline(game)
+            if when is not None:
+                deadlines.append((game.id, when.timestamp()))
+        return deadlines
+
+
+def _base_ms(game: Game) -> int:
+    return int((game.time_control or {}).get("base", 0)) * 1000
+
+
+def _increment_ms(game: Game) -> int:
+    return int((game.time_control or {}).get("increment", 0)) * 1000
+
+
+def _elapsed_ms(since: datetime, now: datetime) -> int:
+    return int((now - since).total_seconds() * 1000)
@@ -1,74 +1,83 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from typing import Sequence
 
 from django.contrib.auth import get_user_model
-from django.db import transaction
 
-from ..models import Game
+from .ratings import RatedGame, RatingEngine
 
-User = get_user_model()
-
-
-@dataclass
-class EloResult:
-    white_rating: int
-    black_rating: int
-
-
-def apply_game_result(game: Game) -> EloResult:
-    if game.status != Game.Status.FINISHED or game.elo_processed:
-        return EloResult(game.white_player.rating, game.black_player.rating)
-
-    white = game.white_player
-    black = game.black_player
-
-    white_score, black_score = _scores_for_winner(game.winner)
-    white_new = _calculate_new_rating(white, black.rating, white_score)
-    black_new = _calculate_new_rating(black, white.rating, black_score)
-
-    with transaction.atomic():
-        _update_player_stats(white, white_score, white_new)
-        _update_player_stats(black, black_score, black_new)
-        white.save(update_fields=["rating", "wins", "losses", "draws"])
-        black.save(update_fields=["rating", "wins", "losses", "draws"])
-        game.elo_processed = True
-        game.save(update_fields=["elo_processed"])
+try:  # pragma: no cover - depends on the optional dependency
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
-    return EloResult(white_new, black_new)
-
-
-def _scores_for_winner(winner: str) -> tuple[float, float]:
-    if winner == Game.Winner.WHITE:
-        return 1.0, 0.0
-    if winner == Game.Winner.BLACK:
-        return 0.0, 1.0
-    if winner == Game.Winner.DRAW:
-        return 0.5, 0.5
-    return 0.0, 0.0
-
-
-def _calculate_new_rating(player: User, opponent_rating: int, score: float) -> int:
-    k = _k_factor(player)
-    expected = 1 / (1 + 10 ** ((opponent_rating - player.rating) / 400))
-    new_rating = player.rating + k * (score - expected)
-    return int(round(new_rating))
+User = get_user_model()
 
 
-def _k_factor(player: User) -> int:
-    games_played = player.games_played
+class EloEngine(RatingEngine):
+    """Elo with a games-played K-factor, applied game by game in order.
+
+    Games are grouped into waves in which no player appears twice; each
+    wave's expected scores and new ratings are computed together (vectorised
+    with NumPy when it is installed), which gives the same result as rating
+    the games one at a time.
+    """
+
+    name = "elo"
+
+    def rate(self, games: Sequence[RatedGame], players: dict[int, User]) -> None:
+        played = {player_id: player.games_played for player_id, player in players.items()}
+        for wave in _waves(games):
+            white = [players[game.white_id] for game in wave]
+            black = [players[game.black_id] for game in wave]
+            white_k = [_k_for_games(played[game.white_id]) for game in wave]
+            black_k = [_k_for_games(played[game.black_id]) for game in wave]
+            white_new = _new_ratings(white, black, white_k, [game.white_score for game in wave])
+            black_new = _new_ratings(black, white, black_k, [game.black_score for game in wave])
+            for index, game in enumerate(wave):
+                white[index].rating = white_new[index]
+                black[index].rating = black_new[index]
+                played[game.white_id] += 1
+                played[game.black_id] += 1
+
+
+def _waves(games: Sequence[RatedGame]) -> list[list[RatedGame]]:
+    """Split chronologically ordered games into waves of independent games.
+
+    A game goes into the wave after the last one containing either of its
+    players, so each player's games stay in order across waves.
+    """
+    waves: list[list[RatedGame]] = []
+    last_wave: dict[int, int] = {}
+    for game in games:
+        index = max(last_wave.get(game.white_id, -1), last_wave.get(game.black_id, -1)) + 1
+        if index == len(waves):
+            waves.append([])
+        waves[index].append(game)
+        last_wave[game.white_id] = last_wave[game.black_id] = index
+    return waves
+
+
+def _new_ratings(players: list[User], opponents: list[User], k: list[int], scores: list[float]) -> list[int]:
+    if np is None:
+        return [
+            _elo_update(player.rating, opponent.rating, k_factor, score)
+            for player, opponent, k_factor, score in zip(players, opponents, k, scores)
+        ]
+    ratings = np.array([player.rating for player in players], dtype=np.float64)
+    opponent_ratings = np.array([opponent.rating for opponent in opponents], dtype=np.float64)
+    expected = 1 / (1 + 10 ** ((opponent_ratings - ratings) / 400))
+    return [int(rating) for rating in np.rint(ratings + np.array(k) * (np.array(scores) - expected))]
+
+
+def _elo_update(rating: int, opponent_rating: int, k: int, score: float) -> int:
+    expected = 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+    return int(round(rating + k * (score - expected)))
+
+
+def _k_for_games(games_played: int) -> int:
     if games_played < 30:
         return 32
     if games_played < 100:
         return 24
     return 16
-
-
-def _update_player_stats(player: User, score: float, rating: int) -> None:
-    if score == 1.0:
-        player.wins += 1
-    elif score == 0.5:
-        player.draws += 1
-    else:
-        player.losses += 1
-    player.rating = rating
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import queue
+import shlex
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import chess.engine
+from django.conf import settings
+
+STUB_ENGINE = "stub"
+STUB_ENGINE_PATH = Path(__file__).with_name("uci_stub.py")
+
+
+class EngineUnavailable(RuntimeError):
+    """No engine process could be started or checked out in time."""
+
+
+class EnginePool:
+    """Long-lived UCI engine processes shared by the analyses run in one process.
+
+    Up to ``size`` engines are started on first use and kept running between
+    checkouts, so a game's analysis never pays for an engine start-up. An
+    engine whose checkout ends with an exception may be mid-search or dead; it
+    is closed and a fresh one is started by a later checkout.
+    """
+
+    def __init__(
+        self,
+        command: Sequence[str],
+        size: int = 1,
+        options: dict | None = None,
+        timeout: float = 30.0,
+    ) -> None:
+        self.command = list(command)
+        self.size = max(1, size)
+        self.options = options or {}
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[chess.engine.SimpleEngine] = queue.LifoQueue()
+        self._started = 0
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> int:
+        return self._started
+
+    @contextmanager
+    def engine(self) -> Iterator[chess.engine.SimpleEngine]:
+        engine = self._acquire()
+        healthy = False
+        try:
+            yield engine
+            healthy = True
+        finally:
+            if healthy:
+                self._idle.put(engine)
+            else:
+                self._discard(engine)
+
+    def close(self) -> None:
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(engine)
+
+    def _acquire(self) -> chess.engine.SimpleEngine:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            start = self._started < self.size
+            if start:
+                self._started += 1
+        if start:
+            try:
+                return self._start()
+            except BaseException:
+                with self._lock:
+                    self._started -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty as exc:
+            raise EngineUnavailable(f"No analysis engine became free within {self.timeout:.0f}s.") from exc
+
+    def _start(self) -> chess.engine.SimpleEngine:
+        try:
+            engine = chess.engine.SimpleEngine.popen_uci(self.command, timeout=self.timeout)
+        except (OSError, chess.engine.EngineError, TimeoutError) as exc:
+            raise EngineUnavailable(f"Could not start {shlex.join(self.command)!r}: {exc}") from exc
+        options = {name: value for name, value in self.options.items() if name in engine.options}
+        if options:
+            engine.configure(options)
+        return engine
+
+    def _discard(self, engine: chess.engine.SimpleEngine) -> None:
+        with self._lock:
+            self._started -= 1
+        try:
+            engine.close()
+        except Exception:  # noqa: BLE001 - the process may already be gone
+            pass
+
+
+def engine_command(value: str | Sequence[str]) -> list[str]:
+    """Argument list for ``ANALYSIS_ENGINE_COMMAND``; ``"stub"`` is the bundled test engine."""
+    if isinstance(value, str):
+        if value == STUB_ENGINE:
+            return [sys.executable, str(STUB_ENGINE_PATH)]
+        return shlex.split(value)
+    return list(value)
+
+
+def analysis_enabled() -> bool:
+    return bool(getattr(settings, "ANALYSIS_ENGINE_COMMAND", ""))
+
+
+_pool: EnginePool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_engine_pool() -> EnginePool:
+    """The process-wide pool, created lazily so forked workers get their own engines.
+
+    Engines run on non-daemon threads, so a process that used the pool must
+    call ``close_engine_pool`` before it can exit.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                command = getattr(settings, "ANALYSIS_ENGINE_COMMAND", "")
+                if not command:
+                    raise EngineUnavailable("ANALYSIS_ENGINE_COMMAND is not set.")
+                _pool = EnginePool(
+                    engine_command(command),
+                    size=getattr(settings, "ANALYSIS_ENGINE_POOL_SIZE", 1),
+                    options=getattr(settings, "ANALYSIS_ENGINE_OPTIONS", {}),
+                    timeout=getattr(settings, "ANALYSIS_ENGINE_TIMEOUT", 30.0),
+                )
+    return _pool
+
+
+def close_engine_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from typing import Iterator
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from ..models import Game, GameEvent
+from ..utils.broadcast import encoded_event
+
+logger = logging.getLogger(__name__)
+
+RESUME_BUFFER_KEY = "game_events:{}"
+RELAY_LOCK_KEY = "game_events:{}:relay"
+# Seconds a relay may hold a game's cache lock before another may take over.
+RELAY_LOCK_TIMEOUT = 60
+# First key of the (namespace, game id) advisory locks taken by relays.
+RELAY_LOCK_NAMESPACE = 0x5E0E
+
+
+def advance_seq(game: Game) -> list[str]:
+    """Give the next event of ``game`` (locked by the caller) its ``seq``.
+
+    Returns the fields that need saving; the caller then records the event
+    with ``game.event_seq``.
+    """
+    game.event_seq += 1
+    return ["event_seq"]
+
+
+def record_game_event(game_id: int, seq: int, event_type: str, payload: dict) -> GameEvent:
+    """Write an event to the outbox as part of the current transaction.
+
+    Once the transaction commits the background relay is woken, or with
+    ``BROADCAST_MODE = "sync"`` the outbox is drained inline. If the event
+    cannot be published then (channel layer down, process killed) the
+    periodic ``relay_game_events`` task picks it up.
+    """
+    event = GameEvent.objects.create(game_id=game_id, seq=seq, event_type=event_type, payload=payload)
+    transaction.on_commit(_relay_committed_events)
+    return event
+
+
+def _relay_committed_events() -> None:
+    if getattr(settings, "BROADCAST_MODE", "outbox") == "outbox":
+        get_game_event_relay().wake()
+    else:
+        publish_pending_events(getattr(settings, "GAME_EVENT_RELAY_BATCH", 500))
+
+
+def event_message(event: GameEvent) -> dict:
+    # ``seq`` also rides outside the encoded frame so sockets can drop repeats
+    # without decoding it.
+    message = encoded_event("game.broadcast", {"type": event.event_type, "seq": event.seq, **event.payload})
+    message["seq"] = event.seq
+    return message
+
+
+def events_since(game_id: int, seq: int, latest_seq: int) -> list[str] | None:
+    """Encoded frames of the events after ``seq``, for a resuming client.
+
+    Served from the per-game ring buffer of recently published frames when
+    it reaches back far enough, otherwise from the outbox table. Returns
+    ``None`` when the missed events cannot all be replayed (more than
+    ``GAME_EVENT_RESUME_LIMIT`` of them, already pruned, or a ``seq`` this
+    game never reached), in which case the client needs a fresh snapshot.
+    ``latest_seq`` is the game's ``event_seq`` read after the socket joined
+    the game, so nothing published later is missed. Frames may repeat events
+    that are also delivered live; clients drop anything at or below the last
+    ``seq`` they applied.
+    """
+    limit = _resume_limit()
+    if seq < 0 or seq > latest_seq or latest_seq - seq > limit:
+        return None
+    buffered = cache.get(RESUME_BUFFER_KEY.format(game_id)) or []
+    if buffered and buffered[0][0] <= seq + 1 and buffered[-1][0] >= latest_seq:
+        return [text for event_seq, text in buffered if event_seq > seq]
+    events = list(GameEvent.objects.filter(game_id=game_id, seq__gt=seq).order_by("seq")[: limit + 1])
+    if len(events) > limit:
+        return None
+    if [event.seq for event in events] != list(range(seq + 1, seq + 1 + len(events))):
+        return None
+    if (events[-1].seq if events else seq) < latest_seq:
+        return None
+    return [event_message(event)["text"] for event in events]
+
+
+def publish_pending_events(limit: int = 500, run=async_to_sync) -> int:
+    """Publish up to ``limit`` unpublished events, oldest first.
+
+    Each game's events are published by one relay at a time, under a
+    per-game lock (``_game_lock``), and in ``seq`` order starting right
+    after the game's last published event, so concurrent relays can never
+    reorder a game. Games another relay is publishing are skipped. No row
+    locks are held while sending; after a failed send the rest of that
+    game's events stay queued. Returns the number of events published.
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return 0
+    game_ids = list(
+        dict.fromkeys(
+            GameEvent.objects.filter(published_at__isnull=True).order_by("id").values_list("game_id", flat=True)[:limit]
+        )
+    )
+    with ExitStack() as locks:
+        batch = []
+        for game_id in game_ids:
+            if len(batch) >= limit:
+                break
+            if not locks.enter_context(_game_lock(game_id)):
+                continue
+            # Read under the lock: whatever another relay published before it
+            # released the game is not sent again.
+            batch.extend(
+                GameEvent.objects.filter(game_id=game_id, published_at__isnull=True).order_by("seq")[
+                    : limit - len(batch)
+                ]
+            )
+        if not batch:
+            return 0
+        messages = {event.id: event_message(event) for event in batch}
+        published = run(_publish)(layer, batch, messages)
+        if published:
+            GameEvent.objects.filter(id__in=published).update(published_at=timezone.now())
+            published_ids = set(published)
+            _remember([event for event in batch if event.id in published_ids], messages)
+    return len(published)
+
+
+@contextmanager
+def _game_lock(game_id: int) -> Iterator[bool]:
+    """Try to become the only relay publishing ``game_id``; yields whether it did.
+
+    A session-level advisory lock on PostgreSQL, so no transaction or row
+    lock stays open across the sends; elsewhere a short-lived cache entry.
+    """
+    if connection.vendor == "postgresql":
+        lock_key = [RELAY_LOCK_NAMESPACE, game_id % 2**31]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s::integer, %s::integer)", lock_key)
+            locked = cursor.fetchone()[0]
+        try:
+            yield locked
+        finally:
+            if locked:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s::integer, %s::integer)", lock_key)
+        return
+    key = RELAY_LOCK_KEY.format(game_id)
+    locked = cache.add(key, os.getpid(), RELAY_LOCK_TIMEOUT)
+    try:
+        yield locked
+    finally:
+        if locked:
+            cache.delete(key)
+
+
+def prune_published_events(older_than: timedelta) -> int:
+    deleted, _ = GameEvent.objects.filter(published_at__lt=timezone.now() - older_than).delete()
+    return deleted
+
+
+def _remember(events: list[GameEvent], messages: dict[int, dict]) -> None:
+    """Append published frames to each game's bounded resume buffer."""
+    by_game: dict[int, list[GameEvent]] = defaultdict(list)
+    for event in events:
+        by_game[event.game_id].append(event)
+    limit = _resume_limit()
+    timeout = getattr(settings, "GAME_EVENT_RETENTION", 3600)
+    for game_id, game_events in by_game.items():
+        key = RESUME_BUFFER_KEY.format(game_id)
+        buffered = cache.get(key) or []
+        last_seq = buffered[-1][0] if buffered else None
+        for event in game_events:
+            if last_seq is not None and event.seq != last_seq + 1:
+                # A gap (the buffer expired or was evicted): start over.
+                buffered = []
+            buffered.append((event.seq, messages[event.id]["text"]))
+            last_seq = event.seq
+        cache.set(key, buffered[-limit:], timeout)
+
+
+def _resume_limit() -> int:
+    return getattr(settings, "GAME_EVENT_RESUME_LIMIT", 100)
+
+
+async def _publish(layer, batch: list[GameEvent], messages: dict[int, dict]) -> list[int]:
+    by_game: dict[int, list[GameEvent]] = defaultdict(list)
+    for event in batch:
+        by_game[event.game_id].append(event)
+    results = await asyncio.gather(*(_publish_game(layer, events, messages) for events in by_game.values()))
+    return [event_id for published in results for event_id in published]
+
+
+async def _publish_game(layer, events: list[GameEvent], messages: dict[int, dict]) -> list[int]:
+    published = []
+    for event in events:
+        try:
+            await layer.group_send(f"game_{event.game_id}", messages[event.id])
+        except Exception as exc:  # noqa: BLE001 - left unpublished for the next pass
+            logger.warning("Publishing event %s#%s failed: %r", event.game_id, event.seq, exc)
+            break
+        published.append(event.id)
+    return published
+
+
+class GameEventRelay:
+    """Background thread that drains the event outbox after each commit.
+
+    ``wake`` is cheap and never blocks the committing request; the thread
+    publishes in batches on its own event loop until the outbox is empty.
+    """
+
+    def __init__(self, batch_size: int = 500) -> None:
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid: int | None = None
+
+    def wake(self) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._wakeup = threading.Event()
+                threading.Thread(
+                    target=self._run, args=(self._wakeup,), name="game-event-relay", daemon=True
+                ).start()
+        self._wakeup.set()
+
+    def _run(self, wakeup: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+
+        def run(coroutine_function):
+            return lambda *args: loop.run_until_complete(coroutine_function(*args))
+
+        while True:
+            wakeup.wait()
+            wakeup.clear()
+            try:
+                while publish_pending_events(self.batch_size, run=run) >= self.batch_size:
+                    pass
+            except Exception:  # noqa: BLE001 - the periodic task retries
+                logger.exception("Game event relay pass failed")
+            finally:
+                close_old_connections()
+
+
+_relay: GameEventRelay | None = None
+_relay_lock = threading.Lock()
+
+
+def get_game_event_relay() -> GameEventRelay:
+    global _relay
+    if _relay is None:
+        with _relay_lock:
+            if _relay is None:
+                _relay = GameEventRelay(getattr(settings, "GAME_EVENT_RELAY_BATCH", 500))
+    return _relay
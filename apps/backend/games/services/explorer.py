@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import chess
+from django.conf import settings
+from django.db import connection, transaction
+
+from ..models import Game, PositionMove, PositionStat
+from .move_codec import row_moves_by_game, unpack_moves
+from .positions import MoveTally, Tally, position_key, tally_games, unsigned_key
+
+DEFAULT_MOVE_LIMIT = 12
+MAX_MOVE_LIMIT = 50
+UPSERT_CHUNK = 500
+COUNT_COLUMNS = ("games", "white_wins", "draws", "black_wins")
+
+
+def index_depth() -> int:
+    return getattr(settings, "POSITION_INDEX_DEPTH", 40)
+
+
+def pending_games():
+    return Game.objects.filter(status=Game.Status.FINISHED, positions_indexed=False)
+
+
+def load_games(rows: Sequence[tuple[int, str, str, bytes | None]]) -> list[tuple[int, str, list[str], str]]:
+    """Turn ``(id, initial_fen, winner, packed_moves)`` rows into ``(id, initial_fen, ucis, winner)``.
+
+    Moves of row-stored games are read with one query for the whole batch.
+    """
+    row_stored = [game_id for game_id, _, _, packed in rows if packed is None]
+    by_game = row_moves_by_game(row_stored) if row_stored else {}
+    return [
+        (game_id, initial_fen, unpack_moves(packed) if packed is not None else by_game.get(game_id, []), winner)
+        for game_id, initial_fen, winner, packed in rows
+    ]
+
+
+def index_pending_games(limit: int = 1000) -> list[int]:
+    """Add up to ``limit`` finished, unindexed games to the position index.
+
+    Games locked by a concurrent batch are skipped and picked up by the next
+    one. Returns the ids of the games indexed.
+    """
+    with transaction.atomic():
+        rows = list(
+            pending_games()
+            .select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", "initial_fen", "winner", "packed_moves")[:limit]
+        )
+        if not rows:
+            return []
+        games = load_games(rows)
+        apply_tally(tally_games(((fen, ucis, winner) for _, fen, ucis, winner in games), index_depth()))
+        game_ids = [game_id for game_id, *_ in rows]
+        Game.objects.filter(id__in=game_ids).update(positions_indexed=True)
+    return game_ids
+
+
+def apply_tally(tally: tuple[Tally, MoveTally]) -> None:
+    """Add ``tally`` to the stored counts; call inside a transaction."""
+    positions, moves = tally
+    # Sorted so concurrent batches lock rows in the same order.
+    _upsert(PositionStat, ("key",), sorted((key, *counts) for key, counts in positions.items()))
+    _upsert(
+        PositionMove,
+        ("position_key", "uci"),
+        sorted((key, uci, *counts) for (key, uci), counts in moves.items()),
+    )
+
+
+def reset_index() -> None:
+    with transaction.atomic():
+        PositionMove.objects.all().delete()
+        PositionStat.objects.all().delete()
+        Game.objects.filter(positions_indexed=True).update(positions_indexed=False)
+
+
+def _upsert(model, key_columns: tuple[str, ...], rows: list[tuple]) -> None:
+    # INSERT ... ON CONFLICT DO UPDATE (PostgreSQL and SQLite) increments the
+    # counters in place; the ORM can only overwrite them.
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ", ".join(quote(column) for column in (*key_columns, *COUNT_COLUMNS))
+    conflict = ", ".join(quote(column) for column in key_columns)
+    updates = ", ".join(
+        f"{quote(column)} = {table}.{quote(column)} + EXCLUDED.{quote(column)}" for column in COUNT_COLUMNS
+    )
+    placeholder = "(" + ", ".join(["%s"] * (len(key_columns) + len(COUNT_COLUMNS))) + ")"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_CHUNK):
+            chunk = rows[start : start + UPSERT_CHUNK]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholder] * len(chunk))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}",
+                [value for row in chunk for value in row],
+            )
+
+
+def resolve_board(fen: str | None, moves: str | None) -> chess.Board:
+    """Board for ``fen`` (the standard start when empty) after the UCI ``moves``.
+
+    Raises ``ValueError`` for an invalid FEN or an illegal move.
+    """
+    try:
+        board = chess.Board(fen or chess.STARTING_FEN)
+    except ValueError as exc:
+        raise ValueError("Invalid FEN.") from exc
+    for uci in (moves or "").replace(",", " ").split():
+        try:
+            move = chess.Move.from_uci(uci)
+        except ValueError as exc:
+            raise ValueError(f"Invalid move {uci!r}.") from exc
+        if move not in board.legal_moves:
+            raise ValueError(f"Illegal move {uci!r}.")
+        board.push(move)
+    return board
+
+
+def explore(board: chess.Board, limit: int = DEFAULT_MOVE_LIMIT) -> dict:
+    """Indexed results for ``board`` and the moves most often played from it."""
+    key = position_key(board)
+    stat = PositionStat.objects.filter(key=key).first()
+    moves = []
+    for row in PositionMove.objects.filter(position_key=key).order_by("-games", "uci")[:limit]:
+        move = chess.Move.from_uci(row.uci)
+        moves.append(
+            {
+                "uci": row.uci,
+                "san": board.san(move) if board.is_legal(move) else None,
+                **_counts(row),
+            }
+        )
+    return {
+        "fen": board.fen(),
+        "key": f"{unsigned_key(key):016x}",
+        **(_counts(stat) if stat is not None else dict.fromkeys(("games", "white", "draws", "black"), 0)),
+        "moves": moves,
+    }
+
+
+def _counts(row: PositionStat | PositionMove) -> dict:
+    return {"games": row.games, "white": row.white_wins, "draws": row.draws, "black": row.black_wins}
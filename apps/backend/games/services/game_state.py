@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from functools import partial
+
+import chess
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from ..api.renderers import FastJSONRenderer
+from ..models import Game
+from ..utils import fastjson
+from ..utils.caching import cache_is_shared
+from .clock import clock_payload
+from .history import player_summary
+from .move_codec import stored_moves
+
+GAME_STATE_KEY = "game_state:{}"
+# Everything rendered into a cached state that can change without a move or a
+# status transition (a rating batch, a renamed player) is read back with these
+# to check an entry is still current.
+SOURCE_FIELDS = (
+    "fen",
+    "status",
+    "updated_at",
+    "white_player__username",
+    "white_player__rating",
+    "black_player__username",
+    "black_player__rating",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedGameState:
+    """Pre-rendered representations of one game at one version.
+
+    ``version`` is ``"<plies>-<status>-<digest>"``, where the digest covers
+    ``source``, the ``SOURCE_FIELDS`` values the entry was rendered from: it
+    changes on every move, status transition and change to a player's name
+    or rating, and doubles as the REST ETag. ``seq`` is the game's
+    ``event_seq``; the socket frame carries it so clients can later resume
+    from it. ``rest`` is the encoded ``GameSerializer`` body and ``socket``
+    the encoded ``game_state`` frame with the full compact history; both are
+    served without touching the database.
+    """
+
+    game_id: int
+    version: str
+    source: tuple
+    plies: int
+    seq: int
+    game: dict
+    history: dict
+    rest: bytes
+    socket: str
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.game_id}-{self.version}"'
+
+    def socket_frame(self, after: int = 0) -> str:
+        """``game_state`` frame holding only the moves after full move ``after``."""
+        if after <= 0:
+            return self.socket
+        return _socket_frame(self.game, _history_after(self.history, after))
+
+
+def get_game_state(game_id: int) -> CachedGameState:
+    """Return the state of ``game_id``, from the cache while it is current.
+
+    A cached entry is served only if the ``SOURCE_FIELDS`` of the game and
+    its players still match the ones it was rendered from: one primary-key
+    lookup instead of a rebuild, and neither an entry written late by a
+    slower process nor one holding old ratings is ever served. Nothing is
+    cached when the cache backend is private to each process (see
+    ``games.W001``).
+
+    Raises ``Game.DoesNotExist`` for unknown games.
+    """
+    key = GAME_STATE_KEY.format(game_id)
+    state = cache.get(key) if _enabled() else None
+    if state is not None:
+        current = Game.objects.filter(pk=game_id).values_list(*SOURCE_FIELDS).first()
+        if current is None:
+            raise Game.DoesNotExist(f"Game {game_id} does not exist.")
+        if current == state.source:
+            return state
+    game = Game.objects.select_related("white_player", "black_player").get(pk=game_id)
+    state = build_game_state(game, *stored_moves(game))
+    if _enabled():
+        _store(state)
+    return state
+
+
+def build_game_state(game: Game, ucis: list[str], sans: list[str]) -> CachedGameState:
+    """Render ``game`` (with both players loaded) and its move list."""
+    from ..api.serializers import GameSerializer  # noqa: WPS433 - the API layer imports services
+
+    game_block = {
+        "id": game.id,
+        "seq": game.event_seq,
+        "status": str(game.status),
+        "fen": game.fen,
+        "time_control": game.time_control,
+        "moves_count": game.moves_count,
+        "winner": game.winner,
+        "clock": clock_payload(game),
+    }
+    history = {
+        "game_id": game.id,
+        "initial_fen": game.initial_fen,
+        "white": player_summary(game, "white"),
+        "black": player_summary(game, "black"),
+        "after": 0,
+        "next": None,
+        "uci": " ".join(ucis),
+        "san": " ".join(sans),
+    }
+    source = _source(game)
+    digest = hashlib.blake2b(repr(source).encode(), digest_size=6).hexdigest()
+    return CachedGameState(
+        game_id=game.id,
+        version=f"{len(ucis)}-{game.status}-{digest}",
+        source=source,
+        plies=len(ucis),
+        seq=game.event_seq,
+        game=game_block,
+        history=history,
+        rest=FastJSONRenderer().render(GameSerializer(game).data),
+        socket=_socket_frame(game_block, history),
+    )
+
+
+def record_move(game: Game, plies: int, uci: str, san: str) -> None:
+    """Append a committed move to the cached state of ``game``.
+
+    Runs after commit. An entry already holding this ply or a later one is
+    left alone; any other entry that is not exactly the previous ply is
+    dropped and rebuilt by the next reader instead.
+    """
+    transaction.on_commit(partial(_apply_move, game, plies, uci, san))
+
+
+def record_status_change(game: Game) -> None:
+    """Re-render the cached state of ``game`` after a change without a move."""
+    transaction.on_commit(partial(_apply_move, game, None, None, None))
+
+
+def invalidate_game_state(game_id: int) -> None:
+    cache.delete(GAME_STATE_KEY.format(game_id))
+
+
+def invalidate_game_states(game_ids: list[int]) -> None:
+    if game_ids:
+        cache.delete_many([GAME_STATE_KEY.format(game_id) for game_id in game_ids])
+
+
+def _apply_move(game: Game, plies: int | None, uci: str | None, san: str | None) -> None:
+    if not _enabled():
+        return
+    key = GAME_STATE_KEY.format(game.id)
+    state = cache.get(key)
+    if state is None:
+        return
+    history = state.history
+    if uci is None:
+        ucis, sans = history["uci"], history["san"]
+    elif state.plies >= plies:
+        # A later move was cached first; never put an older ply back.
+        return
+    elif state.plies == plies - 1:
+        ucis = f"{history['uci']} {uci}".lstrip()
+        sans = f"{history['san']} {san}".lstrip()
+    else:
+        cache.delete(key)
+        return
+    _store(
+        build_game_state(
+            game,
+            ucis.split(" ") if ucis else [],
+            sans.split(" ") if sans else [],
+        )
+    )
+
+
+def _source(game: Game) -> tuple:
+    """``SOURCE_FIELDS`` of ``game``, as ``values_list`` would return them."""
+    white, black = game.white_player, game.black_player
+    return (
+        game.fen,
+        str(game.status),
+        game.updated_at,
+        white.username if white else None,
+        white.rating if white else None,
+        black.username if black else None,
+        black.rating if black else None,
+    )
+
+
+def _store(state: CachedGameState) -> None:
+    cache.set(GAME_STATE_KEY.format(state.game_id), state, _ttl())
+
+
+def _ttl() -> int:
+    return getattr(settings, "GAME_STATE_CACHE_TTL", 300)
+
+
+def _enabled() -> bool:
+    return _ttl() > 0 and cache_is_shared()
+
+
+def _socket_frame(game_block: dict, history: dict) -> str:
+    return fastjson.dumps({"type": "game_state", "state": {"game": game_block, "history": history}})
+
+
+def _history_after(history: dict, after: int) -> dict:
+    # Plies before full move ``after + 1``: from a position with black to move,
+    # the first full move holds a single ply.
+    board = chess.Board(history["initial_fen"])
+    skip = 2 * (after + 1 - board.fullmove_number)
+    if board.turn == chess.BLACK:
+        skip -= 1
+    skip = max(0, skip)
+    ucis = history["uci"].split(" ")[skip:] if history["uci"] else []
+    sans = history["san"].split(" ")[skip:] if history["san"] else []
+    return {**history, "after": after, "uci": " ".join(ucis), "san": " ".join(sans)}
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import datetime
 
+import chess
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.utils import timezone
 
 from ..models import Game, Move
-from .chess_engine import GameEngine, MoveValidationResult
+from . import clock, events, game_state, move_codec
+from .board_registry import get_live_board_registry
+from .chess_engine import MoveValidationResult
 
 User = get_user_model()
 
@@ -24,31 +29,140 @@ class NotYourTurnError(Exception):
     """Raised when a user attempts to move out of turn."""
 
 
+class TimeExpiredError(GameStateError):
+    """Raised when the mover's clock ran out before the move arrived."""
+
+
 @dataclass(slots=True)
 class AppliedMove:
+    game: Game
     move: Move
     result: MoveValidationResult
     previous_status: str
     current_status: str
+    seq: int
+
 
+def submit_move(game_id: int, player_id: int, uci: str) -> AppliedMove:
+    """Apply a move for ``player_id`` while holding a row lock on the game.
 
-def apply_player_move(game: Game, player: User, uci: str) -> AppliedMove:
+    This is the single entry point used by both the REST and WebSocket move
+    handlers. The game row (with both players) is read once with
+    ``SELECT ... FOR UPDATE`` so concurrent moves on the same game are
+    serialised and the turn check always sees the committed position.
+
+    A move arriving after the mover's flag fell ends the game on time and
+    then raises ``TimeExpiredError``; callers running inside an outer
+    transaction must let it commit rather than roll the loss back.
+    """
+    with transaction.atomic():
+        game = (
+            Game.objects.select_for_update(of=("self",))
+            .select_related("white_player", "black_player")
+            .get(pk=game_id)
+        )
+        if player_id == game.white_player_id:
+            player = game.white_player
+        elif player_id == game.black_player_id:
+            player = game.black_player
+        else:
+            raise NotParticipantError("Player is not part of this game.")
+        now = timezone.now()
+        loser = clock.flagged_side(game, now)
+        if loser is None:
+            return apply_player_move(game, player, uci, now=now)
+        # Commit the loss on time before rejecting the move.
+        clock.finish_on_time(game, loser, now)
+    raise TimeExpiredError("Time expired.")
+
+
+def pgn_deferred() -> bool:
+    """Whether ``Game.pgn`` is only written when a game ends (``DEFER_PGN_UNTIL_FINISHED``)."""
+    return getattr(settings, "DEFER_PGN_UNTIL_FINISHED", False)
+
+
+def move_payload(applied: AppliedMove) -> dict:
+    """Build the ``move_applied`` broadcast body without further queries."""
+    move = applied.move
+    game = applied.game
+    return {
+        "move": {
+            "id": move.id,
+            "ply": move.ply,
+            "san": move.san,
+            "uci": move.uci,
+            "move_number": move.move_number,
+            "is_check": move.is_check,
+            "is_mate": move.is_mate,
+            "player": move.player.username,
+        },
+        "game": {
+            "fen": applied.result.fen,
+            "status": applied.current_status,
+            "winner": game.winner,
+            "moves_count": game.moves_count,
+            "clock": clock.clock_payload(game),
+        },
+    }
+
+
+def apply_player_move(game: Game, player: User, uci: str, now: datetime | None = None) -> AppliedMove:
     if game.status in {Game.Status.FINISHED, Game.Status.ABORTED}:
         raise GameStateError("Game is not accepting moves.")
-    if player not in (game.white_player, game.black_player):
+    if player.pk not in (game.white_player_id, game.black_player_id):
         raise NotParticipantError("Player is not part of this game.")
 
-    expected_turn = "white" if game.white_player == player else "black"
-    engine = GameEngine.from_game(game)
+    now = now or timezone.now()
+    if clock.flagged_side(game, now) is not None:
+        raise TimeExpiredError("Time expired.")
+    expected_turn = "white" if game.white_player_id == player.pk else "black"
+    registry = get_live_board_registry()
+    engine = registry.get(game)
     board_turn = "white" if engine.board.turn else "black"
     if board_turn != expected_turn:
         raise NotYourTurnError("It is not your turn to move.")
 
-    move_result = engine.validate_move(uci)
+    move_result = engine.validate_move(uci, render_pgn=not pgn_deferred())
     previous_status = game.status
 
-    with transaction.atomic():
-        move = Move.objects.create(
+    try:
+        move = _persist_move(game, player, uci, move_result, expected_turn, now, engine.board)
+    except Exception:
+        # The cached board already holds the pushed move; drop it so the next
+        # request rebuilds from what was actually committed.
+        registry.discard(game.id)
+        raise
+    plies = len(engine.board.move_stack)
+    move.ply = plies
+    game_state.record_move(game, plies, uci, move_result.san)
+    if game.status in {Game.Status.FINISHED, Game.Status.ABORTED}:
+        registry.discard(game.id)
+
+    applied = AppliedMove(
+        game=game,
+        move=move,
+        result=move_result,
+        previous_status=previous_status,
+        current_status=game.status,
+        seq=game.event_seq,
+    )
+    events.record_game_event(game.id, game.event_seq, "move_applied", move_payload(applied))
+    return applied
+
+
+def _persist_move(
+    game: Game,
+    player: User,
+    uci: str,
+    move_result: MoveValidationResult,
+    expected_turn: str,
+    now: datetime,
+    board: chess.Board,
+) -> Move:
+    # No savepoint: when called from submit_move the outer transaction already
+    # holds the row lock and any failure rolls the whole move back.
+    with transaction.atomic(savepoint=False):
+        move = Move(
             game=game,
             player=player,
             move_number=move_result.move_number,
@@ -58,27 +172,32 @@ def apply_player_move(game: Game, player: User, uci: str) -> AppliedMove:
             is_check=move_result.is_check,
             is_mate=move_result.is_checkmate,
         )
-        update_fields = ["fen", "pgn", "moves_count", "updated_at", "status"]
+        update_fields = ["fen", "moves_count", "updated_at", "status"]
+        if move_codec.packs_move(game, finishing=move_result.is_checkmate):
+            # ``move`` stays unsaved; the whole game is one packed field.
+            update_fields.extend(move_codec.store_board(game, board))
+        else:
+            move.save(force_insert=True)
         game.fen = move_result.fen
-        game.pgn = move_result.pgn
+        if move_result.pgn is not None:
+            game.pgn = move_result.pgn
+            update_fields.append("pgn")
         game.moves_count = move_result.move_number
         if game.status == Game.Status.WAITING:
             game.status = Game.Status.LIVE
             if game.started_at is None:
-                game.started_at = timezone.now()
+                game.started_at = now
                 update_fields.append("started_at")
+        update_fields.extend(clock.apply_move_clock(game, expected_turn, now))
+        update_fields.extend(events.advance_seq(game))
         if move_result.is_checkmate:
             game.status = Game.Status.FINISHED
             game.winner = Game.Winner.WHITE if expected_turn == "white" else Game.Winner.BLACK
-            game.ended_at = timezone.now()
+            game.ended_at = now
             update_fields.extend(["winner", "ended_at"])
-            from ..tasks import update_game_elo  # noqa: WPS433 - local import to avoid circular dependency
-            transaction.on_commit(lambda: update_game_elo.delay(game.id))
+            from ..tasks import schedule_rating_update  # noqa: WPS433 - local import to avoid circular dependency
+            transaction.on_commit(lambda: schedule_rating_update(game.id))
         game.save(update_fields=update_fields)
-
-    return AppliedMove(
-        move=move,
-        result=move_result,
-        previous_status=previous_status,
-        current_status=game.status,
-    )
+        if clock.is_timed(game):
+            clock.publish_deadline(game)
+    return move
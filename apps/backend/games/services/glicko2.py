@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import math
+from typing import Sequence
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Value
+from django.db.models.functions import Least, Power, Sqrt
+
+from .ratings import RatedGame, RatingEngine
+
+try:  # pragma: no cover - depends on the optional dependency
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+User = get_user_model()
+
+SCALE = 173.7178
+BASE_RATING = 1500.0
+MAX_DEVIATION = 350.0
+CONVERGENCE = 1e-6
+
+
+class Glicko2Engine(RatingEngine):
+    """Glicko-2 (Glickman, 2012) over fixed ``RATING_PERIOD`` rating periods.
+
+    All games of the period are rated against the opponents' ratings from
+    the start of the period. Per-game terms are computed as arrays over
+    every (player, opponent) pair and summed per player; only the volatility
+    root-finding runs per player. Players without games in the period only
+    have their deviation grown by their volatility (``rest``). With
+    ``RATING_PERIOD = 0`` every rating batch is a period of its own.
+    """
+
+    name = "glicko2"
+    update_fields = ("rating", "rating_deviation", "rating_volatility")
+    uses_rating_periods = True
+
+    def __init__(self, tau: float | None = None) -> None:
+        self.tau = tau if tau is not None else getattr(settings, "GLICKO2_TAU", 0.5)
+
+    def rate(self, games: Sequence[RatedGame], players: dict[int, User]) -> None:
+        ids = list(players)
+        index = {player_id: position for position, player_id in enumerate(ids)}
+        mu = [(players[player_id].rating - BASE_RATING) / SCALE for player_id in ids]
+        phi = [players[player_id].rating_deviation / SCALE for player_id in ids]
+
+        # One entry per game and side: (player, opponent, score).
+        me = [index[game.white_id] for game in games] + [index[game.black_id] for game in games]
+        them = [index[game.black_id] for game in games] + [index[game.white_id] for game in games]
+        scores = [game.white_score for game in games] + [game.black_score for game in games]
+        variance_inv, improvement = _period_sums(mu, phi, me, them, scores, len(ids))
+
+        for position, player_id in enumerate(ids):
+            if variance_inv[position] <= 0:
+                continue
+            player = players[player_id]
+            variance = 1 / variance_inv[position]
+            delta = variance * improvement[position]
+            sigma = _new_volatility(phi[position], player.rating_volatility, variance, delta, self.tau)
+            phi_star = math.sqrt(phi[position] ** 2 + sigma**2)
+            phi_new = 1 / math.sqrt(1 / phi_star**2 + 1 / variance)
+            mu_new = mu[position] + phi_new**2 * improvement[position]
+            player.rating = max(0, int(round(SCALE * mu_new + BASE_RATING)))
+            player.rating_deviation = min(MAX_DEVIATION, SCALE * phi_new)
+            player.rating_volatility = sigma
+
+    def rest(self, players) -> int:
+        """Step 6 for players who did not compete: phi' = sqrt(phi^2 + sigma^2), capped at 350."""
+        phi = F("rating_deviation") / Value(SCALE)
+        grown = Value(SCALE) * Sqrt(Power(phi, 2) + Power(F("rating_volatility"), 2))
+        return players.filter(rating_deviation__lt=MAX_DEVIATION).update(
+            rating_deviation=Least(Value(MAX_DEVIATION), grown)
+        )
+
+
+def _period_sums(mu, phi, me, them, scores, size: int) -> tuple[list[float], list[float]]:
+    """Per player: sum of g^2 E (1 - E) and sum of g (s - E) over the period."""
+    if np is None:
+        variance_inv = [0.0] * size
+        improvement = [0.0] * size
+        for player, opponent, score in zip(me, them, scores):
+            g = _g(phi[opponent])
+            expected = 1 / (1 + math.exp(-g * (mu[player] - mu[opponent])))
+            variance_inv[player] += g * g * expected * (1 - expected)
+            improvement[player] += g * (score - expected)
+        return variance_inv, improvement
+    mu_arr = np.asarray(mu)
+    phi_arr = np.asarray(phi)
+    me_arr = np.asarray(me)
+    them_arr = np.asarray(them)
+    g = 1 / np.sqrt(1 + 3 * phi_arr[them_arr] ** 2 / math.pi**2)
+    expected = 1 / (1 + np.exp(-g * (mu_arr[me_arr] - mu_arr[them_arr])))
+    variance_inv = np.bincount(me_arr, weights=g * g * expected * (1 - expected), minlength=size)
+    improvement = np.bincount(me_arr, weights=g * (np.asarray(scores) - expected), minlength=size)
+    return variance_inv.tolist(), improvement.tolist()
+
+
+def _g(phi: float) -> float:
+    return 1 / math.sqrt(1 + 3 * phi * phi / math.pi**2)
+
+
+def _new_volatility(phi: float, sigma: float, variance: float, delta: float, tau: float) -> float:
+    """Step 5 of the Glicko-2 algorithm (Illinois variant of regula falsi)."""
+    a = math.log(sigma * sigma)
+
+    def f(x: float) -> float:
+        ex = math.exp(x)
+        return ex * (delta * delta - phi * phi - variance - ex) / (2 * (phi * phi + variance + ex) ** 2) - (
+            x - a
+        ) / (tau * tau)
+
+    lower = a
+    if delta * delta > phi * phi + variance:
+        upper = math.log(delta * delta - phi * phi - variance)
+    else:
+        k = 1
+        while f(a - k * tau) < 0:
+            k += 1
+        upper = a - k * tau
+    f_lower, f_upper = f(lower), f(upper)
+    while abs(upper - lower) > CONVERGENCE:
+        candidate = lower + (lower - upper) * f_lower / (f_upper - f_lower)
+        f_candidate = f(candidate)
+        if f_candidate * f_upper <= 0:
+            lower, f_lower = upper, f_upper
+        else:
+            f_lower /= 2
+        upper, f_upper = candidate, f_candidate
+    return math.exp(lower / 2)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from ..models import Game
+from . import move_codec
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def player_summary(game: Game, color: str) -> dict | None:
+    player_id = getattr(game, f"{color}_player_id")
+    if player_id is None:
+        return None
+    return {"id": player_id, "username": getattr(game, f"{color}_player").username}
+
+
+def move_history(game: Game, after: int = 0, limit: int | None = None) -> dict:
+    """Compact, cursor-paginated move list for ``game``.
+
+    Moves are returned as space-separated UCI and SAN strings instead of one
+    object per ply; who played what follows from the side to move, so the
+    players are sent once. ``after`` is a full-move number: only moves with a
+    larger ``move_number`` are included, and ``limit`` counts full moves. The
+    ``next`` cursor is the ``after`` value for the following page, or
+    ``None`` when the page reaches the latest move.
+    """
+    after = max(0, after)
+    if move_codec.is_packed(game):
+        rows = _packed_rows(game, after, limit)
+    else:
+        moves = game.moves.filter(move_number__gt=after)
+        if limit is not None:
+            moves = moves.filter(move_number__lte=after + limit)
+        rows = list(moves.order_by("move_number", "created_at").values_list("uci", "san"))
+    next_cursor = after + limit if limit is not None and after + limit < game.moves_count else None
+    return {
+        "game_id": game.id,
+        "initial_fen": game.initial_fen,
+        "white": player_summary(game, "white"),
+        "black": player_summary(game, "black"),
+        "after": after,
+        "next": next_cursor,
+        "uci": " ".join(uci for uci, _ in rows),
+        "san": " ".join(san for _, san in rows),
+    }
+
+
+def _packed_rows(game: Game, after: int, limit: int | None) -> list[tuple[str, str]]:
+    ucis, sans = move_codec.stored_moves(game)
+    numbers = move_codec.move_numbers(game.initial_fen, len(ucis))
+    return [
+        (uci, san)
+        for uci, san, number in zip(ucis, sans, numbers)
+        if number > after and (limit is None or number <= after + limit)
+    ]
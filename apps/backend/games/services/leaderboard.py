@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+try:  # pragma: no cover - redis is installed with channels-redis
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+User = get_user_model()
+
+LEADERBOARD_KEY = "leaderboard:ratings"
+REBUILD_LOCK_KEY = f"{LEADERBOARD_KEY}:rebuild_lock"
+REBUILD_SCHEDULED_KEY = f"{LEADERBOARD_KEY}:rebuild_scheduled"
+REBUILD_CHUNK = 5000
+# Longest a rebuild may hold the lock and keep its staging set.
+REBUILD_TIMEOUT = 600
+# Sorted-set scores are ``rating * ID_SPAN - user_id``: best rating first,
+# then lowest id, the same order as the database index. Exact in a double for
+# ids below 2**32 and ratings up to two million.
+ID_SPAN = 2**32
+
+
+@dataclass(frozen=True, slots=True)
+class LeaderboardEntry:
+    rank: int
+    user_id: int
+    username: str
+    rating: int
+
+
+def top(offset: int = 0, limit: int = 50) -> list[LeaderboardEntry]:
+    """One page of the leaderboard, best rating first.
+
+    Ranks are competition ranks (equal ratings share a rank); ties are
+    listed by user id. Pages are the same whether the Redis sorted set or
+    the database index answers.
+    """
+    client = _client()
+    if client is not None:
+        try:
+            if _ensure_built(client):
+                return _top_from_redis(client, offset, limit)
+        except redis.RedisError:
+            _mark_down()
+    return _top_from_db(offset, limit)
+
+
+def rank_of(user: User) -> int | None:
+    """``user``'s rank: one plus the number of players rated strictly higher."""
+    if not user.is_active:
+        return None
+    client = _client()
+    if client is not None:
+        try:
+            if _ensure_built(client):
+                return _count_above(client, user.rating) + 1
+        except redis.RedisError:
+            _mark_down()
+    return _ranked_users().filter(rating__gt=user.rating).count() + 1
+
+
+def total_players() -> int:
+    client = _client()
+    if client is not None:
+        try:
+            if _ensure_built(client):
+                return client.zcard(LEADERBOARD_KEY)
+        except redis.RedisError:
+            _mark_down()
+    return _ranked_users().count()
+
+
+def update_ratings(ratings: dict[int, int]) -> None:
+    """Write new ratings to the sorted set; called after a rating batch commits."""
+    client = _client()
+    if client is None or not ratings:
+        return
+    try:
+        if client.exists(LEADERBOARD_KEY):
+            client.zadd(LEADERBOARD_KEY, {str(user_id): _score(user_id, rating) for user_id, rating in ratings.items()})
+    except redis.RedisError:
+        # The set is rebuilt from the database on the next read that misses.
+        _mark_down()
+
+
+def remove_user(user_id: int) -> None:
+    client = _client()
+    if client is None:
+        return
+    try:
+        client.zrem(LEADERBOARD_KEY, str(user_id))
+    except redis.RedisError:
+        _mark_down()
+
+
+def available() -> bool:
+    """Whether a Redis leaderboard is configured and currently reachable."""
+    return _client() is not None
+
+
+def rebuild() -> int | None:
+    """Replace the sorted set with the ratings of all active users.
+
+    Returns the number of players written, or None when another rebuild
+    holds the lock. Each rebuild fills its own staging set, so an abandoned
+    one cannot leak members into the next.
+    """
+    client = _client()
+    if client is None:
+        return 0
+    lock = client.lock(REBUILD_LOCK_KEY, timeout=REBUILD_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return None
+    staging = f"{LEADERBOARD_KEY}:rebuild:{uuid.uuid4().hex}"
+    try:
+        count = 0
+        chunk: dict[str, int] = {}
+        for user_id, rating in _ranked_users().values_list("id", "rating").iterator(chunk_size=REBUILD_CHUNK):
+            chunk[str(user_id)] = _score(user_id, rating)
+            if len(chunk) >= REBUILD_CHUNK:
+                count += _stage(client, staging, chunk)
+                chunk = {}
+        if chunk:
+            count += _stage(client, staging, chunk)
+        if count:
+            client.rename(staging, LEADERBOARD_KEY)
+            client.persist(LEADERBOARD_KEY)
+            client.delete(REBUILD_SCHEDULED_KEY)
+        else:
+            # Nothing to rank: the pending marker keeps reads from queueing
+            # another rebuild until it expires.
+            client.delete(LEADERBOARD_KEY)
+        return count
+    finally:
+        client.delete(staging)
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            # Held past REBUILD_TIMEOUT; another rebuild may own it now.
+            pass
+
+
+def schedule_rebuild(client) -> None:
+    """Queue one background rebuild; reads use the database until it is done."""
+    if client.set(REBUILD_SCHEDULED_KEY, 1, nx=True, ex=REBUILD_TIMEOUT):
+        from ..tasks import rebuild_leaderboard  # noqa: WPS433 - tasks import the services
+
+        rebuild_leaderboard.delay()
+
+
+def _stage(client, staging: str, chunk: dict[str, int]) -> int:
+    pipe = client.pipeline(transaction=False)
+    pipe.zadd(staging, chunk)
+    pipe.expire(staging, REBUILD_TIMEOUT)
+    pipe.execute()
+    return len(chunk)
+
+
+def _top_from_redis(client, offset: int, limit: int) -> list[LeaderboardEntry]:
+    rows = client.zrevrange(LEADERBOARD_KEY, offset, offset + limit - 1, withscores=True)
+    if not rows:
+        return []
+    ids = [int(member) for member, _ in rows]
+    ratings = [_rating(user_id, score) for user_id, (_, score) in zip(ids, rows)]
+    usernames = dict(User.objects.filter(id__in=ids).values_list("id", "username"))
+    rank = _count_above(client, ratings[0]) + 1
+    return _ranked_page(
+        [(user_id, usernames.get(user_id, ""), rating) for user_id, rating in zip(ids, ratings)],
+        rank,
+        offset,
+    )
+
+
+def _score(user_id: int, rating: int) -> int:
+    return rating * ID_SPAN - user_id
+
+
+def _rating(user_id: int, score: float) -> int:
+    return (int(score) + user_id) // ID_SPAN
+
+
+def _count_above(client, rating: int) -> int:
+    """Players rated strictly higher than ``rating``: every score above ``rating * ID_SPAN``."""
+    return client.zcount(LEADERBOARD_KEY, f"({rating * ID_SPAN}", "+inf")
+
+
+def _top_from_db(offset: int, limit: int) -> list[LeaderboardEntry]:
+    ranked = _ranked_users().order_by("-rating", "id").values_list("id", "username", "rating")
+    rows = list(ranked[offset : offset + limit])
+    if not rows:
+        return []
+    rank = _ranked_users().filter(rating__gt=rows[0][2]).count() + 1
+    return _ranked_page(rows, rank, offset)
+
+
+def _ranked_page(rows: list[tuple[int, str, int]], first_rank: int, offset: int) -> list[LeaderboardEntry]:
+    entries = []
+    rank = first_rank
+    previous_rating = None
+    for position, (user_id, username, rating) in enumerate(rows):
+        if previous_rating is not None and rating != previous_rating:
+            rank = offset + position + 1
+        entries.append(LeaderboardEntry(rank=rank, user_id=user_id, username=username, rating=rating))
+        previous_rating = rating
+    return entries
+
+
+def _ranked_users():
+    return User.objects.filter(is_active=True)
+
+
+def _ensure_built(client) -> bool:
+    """Whether the sorted set can answer; a missing one is rebuilt off the request."""
+    if client.exists(LEADERBOARD_KEY):
+        return True
+    schedule_rebuild(client)
+    return False
+
+
+_redis_client = None
+_redis_lock = threading.Lock()
+_retry_at = 0.0
+RETRY_AFTER = 30.0
+
+
+def _client():
+    global _redis_client
+    url = getattr(settings, "LEADERBOARD_REDIS_URL", "")
+    if redis is None or not url or time.monotonic() < _retry_at:
+        return None
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _redis_client
+
+
+def _mark_down() -> None:
+    """Serve from the database for a while instead of timing out on every read."""
+    global _retry_at
+    _retry_at = time.monotonic() + RETRY_AFTER
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Game, MatchmakingTicket
+from ..utils.caching import cache_is_shared
+
+User = get_user_model()
+
+LIVE_GAMES_KEY = "lobby:live_games"
+WAITING_GAMES_KEY = "lobby:waiting_games"
+QUEUE_COUNT_KEY = "lobby:queue_count"
+RECENT_GAMES_KEY = "lobby:recent_games"
+RECENT_GAMES_LIMIT = 5
+# Entries kept in the cache; the spares stand in for removed games so the
+# list is only refilled from the database when it runs short.
+RECENT_GAMES_CACHED = 2 * RECENT_GAMES_LIMIT
+
+_STATUS_KEYS = {
+    Game.Status.LIVE: LIVE_GAMES_KEY,
+    Game.Status.WAITING: WAITING_GAMES_KEY,
+}
+
+
+def lobby_snapshot() -> dict:
+    """Return the lobby payload from the cached counters.
+
+    The counters live in the shared cache (Redis in production) and are
+    maintained incrementally by the game/ticket signal handlers. When any of
+    them is missing the state is rebuilt from the database once. A cache
+    private to each process would leave every process with its own drifting
+    counts, so with such a backend the lobby is counted on every read.
+    """
+    if not cache_is_shared():
+        return _payload(_count())
+    values = cache.get_many([LIVE_GAMES_KEY, WAITING_GAMES_KEY, QUEUE_COUNT_KEY, RECENT_GAMES_KEY])
+    if len(values) < 4:
+        return reconcile_lobby_stats()
+    return _payload(values)
+
+
+def queue_count() -> int:
+    if not cache_is_shared():
+        return _count_queue()
+    count = cache.get(QUEUE_COUNT_KEY)
+    if count is None:
+        return reconcile_lobby_stats()["queue_count"]
+    return count
+
+
+def reconcile_lobby_stats() -> dict:
+    """Recount everything from the database and overwrite the cached state."""
+    values = _count()
+    if cache_is_shared():
+        cache.set_many(values, timeout=None)
+    return _payload(values)
+
+
+def recent_game_entry(game: Game) -> dict:
+    return {
+        "id": game.id,
+        "white_player": game.white_player.username if game.white_player_id else None,
+        "black_player": game.black_player.username if game.black_player_id else None,
+        "status": str(game.status),
+        "created_at": game.created_at.isoformat() if game.created_at else None,
+    }
+
+
+def record_game_status(game: Game, previous_status: str | None, created: bool = False) -> None:
+    """Account for a created game or a status transition once the transaction commits."""
+    transaction.on_commit(partial(_apply_game_status, recent_game_entry(game), previous_status, created))
+
+
+def record_games_created(games: list[Game]) -> None:
+    """Account for games inserted with ``bulk_create`` (which sends no signals)."""
+    if not games:
+        return
+    newest = games[-RECENT_GAMES_CACHED:]
+    players = User.objects.in_bulk(
+        {game.white_player_id for game in newest} | {game.black_player_id for game in newest}
+    )
+    for game in newest:
+        game.white_player = players.get(game.white_player_id)
+        game.black_player = players.get(game.black_player_id)
+    entries = [recent_game_entry(game) for game in reversed(newest)]
+    transaction.on_commit(partial(_apply_games_created, len(games), entries))
+
+
+def record_game_removed(game_id: int, status: str) -> None:
+    transaction.on_commit(partial(_apply_game_removed, game_id, status))
+
+
+def record_queue_change(delta: int) -> None:
+    if delta:
+        transaction.on_commit(partial(_adjust, QUEUE_COUNT_KEY, delta))
+
+
+def _count() -> dict:
+    return {
+        LIVE_GAMES_KEY: Game.objects.filter(status=Game.Status.LIVE).count(),
+        WAITING_GAMES_KEY: Game.objects.filter(status=Game.Status.WAITING).count(),
+        QUEUE_COUNT_KEY: _count_queue(),
+        RECENT_GAMES_KEY: [
+            recent_game_entry(game)
+            for game in Game.objects.select_related("white_player", "black_player").order_by("-created_at")[
+                :RECENT_GAMES_CACHED
+            ]
+        ],
+    }
+
+
+def _count_queue() -> int:
+    return MatchmakingTicket.objects.filter(expires_at__gt=timezone.now()).count()
+
+
+def _apply_game_status(entry: dict, previous_status: str | None, created: bool) -> None:
+    status = entry["status"]
+    if previous_status != status:
+        if previous_status in _STATUS_KEYS:
+            _adjust(_STATUS_KEYS[previous_status], -1)
+        if status in _STATUS_KEYS:
+            _adjust(_STATUS_KEYS[status], 1)
+
+    recent = cache.get(RECENT_GAMES_KEY)
+    if recent is None:
+        return
+    if created:
+        recent = [entry, *recent][:RECENT_GAMES_CACHED]
+    else:
+        recent = [entry if item["id"] == entry["id"] else item for item in recent]
+    cache.set(RECENT_GAMES_KEY, recent, timeout=None)
+
+
+def _apply_games_created(count: int, entries: list[dict]) -> None:
+    _adjust(WAITING_GAMES_KEY, count)
+    recent = cache.get(RECENT_GAMES_KEY)
+    if recent is not None:
+        cache.set(RECENT_GAMES_KEY, [*entries, *recent][:RECENT_GAMES_CACHED], timeout=None)
+
+
+def _apply_game_removed(game_id: int, status: str) -> None:
+    if status in _STATUS_KEYS:
+        _adjust(_STATUS_KEYS[status], -1)
+    recent = cache.get(RECENT_GAMES_KEY)
+    if recent is None:
+        return
+    remaining = [item for item in recent if item["id"] != game_id]
+    if len(remaining) == len(recent):
+        return
+    if len(remaining) < RECENT_GAMES_LIMIT:
+        # Out of spares: let the next read refill the list from the database.
+        cache.delete(RECENT_GAMES_KEY)
+    else:
+        cache.set(RECENT_GAMES_KEY, remaining, timeout=None)
+
+
+def _adjust(key: str, delta: int) -> None:
+    try:
+        value = cache.incr(key, delta)
+    except ValueError:
+        # Counter not initialised yet: the next read rebuilds it from the DB.
+        return
+    if value < 0:
+        cache.delete(key)
+
+
+def _payload(values: dict) -> dict:
+    return {
+        "type": "lobby_state",
+        "active_games": values[LIVE_GAMES_KEY],
+        "waiting_games": values[WAITING_GAMES_KEY],
+        "queue_count": values[QUEUE_COUNT_KEY],
+        "recent_games": values[RECENT_GAMES_KEY][:RECENT_GAMES_LIMIT],
+    }
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from ..models import Game, MatchmakingTicket
+
+OPPONENT_CANDIDATE_LIMIT = 50
+
+
+@dataclass(frozen=True, slots=True)
+class RatingWindowPolicy:
+    """How far a ticket's rating window widens while it waits in the queue.
+
+    Every ``interval`` seconds of age adds one step on each side of the window:
+    ``linear`` adds ``step`` points per interval, ``exponential`` doubles the
+    widening each interval (``step``, ``3 * step``, ``7 * step``, ...). The
+    total widening never exceeds ``cap``.
+    """
+
+    curve: str = "linear"
+    step: int = 50
+    interval: float = 10.0
+    cap: int = 400
+
+    @classmethod
+    def from_settings(cls) -> "RatingWindowPolicy":
+        config = getattr(settings, "MATCHMAKING_RATING_WINDOW", {})
+        return cls(
+            curve=config.get("CURVE", cls.curve),
+            step=config.get("STEP", cls.step),
+            interval=config.get("INTERVAL", cls.interval),
+            cap=config.get("CAP", cls.cap),
+        )
+
+    def widening(self, age_seconds: float) -> int:
+        if self.interval <= 0 or self.step <= 0 or age_seconds <= 0:
+            return 0
+        steps = int(age_seconds // self.interval)
+        if self.curve == "exponential":
+            amount = self.step * ((1 << min(steps, 32)) - 1)
+        else:
+            amount = self.step * steps
+        return min(self.cap, amount)
+
+    def window(self, rating_min: int, rating_max: int, created_at: datetime, now: datetime) -> tuple[int, int]:
+        extra = self.widening((now - created_at).total_seconds())
+        return max(0, rating_min - extra), rating_max + extra
+
+
+@dataclass(slots=True)
+class QueueEntry:
+    ticket_id: int
+    user_id: int
+    rating: int
+    rating_min: int
+    rating_max: int
+    # ``time_control_key`` of the ticket; tickets only pair within one.
+    time_control: str
+    created_at: datetime
+
+    def accepts(self, rating: int) -> bool:
+        return self.rating_min <= rating <= self.rating_max
+
+
+@dataclass(slots=True)
+class Pairing:
+    white: QueueEntry
+    black: QueueEntry
+
+
+def queue_entries(
+    tickets: QuerySet[MatchmakingTicket],
+    now: datetime | None = None,
+    policy: RatingWindowPolicy | None = None,
+) -> list[QueueEntry]:
+    """Load tickets as lightweight entries with a single query.
+
+    The stored windows are widened in memory according to ``policy`` and each
+    ticket's age at ``now``; the rows themselves are never rewritten.
+    """
+    now = now or timezone.now()
+    policy = policy or RatingWindowPolicy.from_settings()
+    rows = tickets.values_list(
+        "id", "user_id", "user__rating", "rating_min", "rating_max", "time_control_key", "created_at"
+    )
+    entries = []
+    for ticket_id, user_id, rating, rating_min, rating_max, time_control, created_at in rows:
+        rating_min, rating_max = policy.window(rating_min, rating_max, created_at, now)
+        entries.append(
+            QueueEntry(
+                ticket_id=ticket_id,
+                user_id=user_id,
+                rating=rating,
+                rating_min=rating_min,
+                rating_max=rating_max,
+                time_control=time_control,
+                created_at=created_at,
+            )
+        )
+    return entries
+
+
+def match_ticket(ticket_id: int) -> Game | None:
+    """Try to pair a freshly submitted ticket right away.
+
+    Both the new ticket and the chosen opponent are locked with
+    ``FOR UPDATE SKIP LOCKED``, so a ticket already claimed by another worker
+    (or by the periodic pass) is skipped instead of being matched twice. The
+    oldest compatible ticket in the same time control wins and plays white.
+    Returns ``None`` when nothing compatible is waiting; the ticket then stays
+    queued for the periodic pass.
+    """
+    now = timezone.now()
+    policy = RatingWindowPolicy.from_settings()
+    lockable = MatchmakingTicket.objects.select_for_update(skip_locked=True, of=("self",))
+    with transaction.atomic():
+        ticket = lockable.select_related("user").filter(pk=ticket_id, expires_at__gt=now).first()
+        if ticket is None:
+            return None
+        rating = ticket.user.rating
+        rating_min, rating_max = policy.window(ticket.rating_min, ticket.rating_max, ticket.created_at, now)
+        # Coarse index filter that allows for the maximum widening; the exact,
+        # age-dependent window of each candidate is checked below.
+        candidates = (
+            MatchmakingTicket.objects.filter(
+                time_control_key=ticket.time_control_key,
+                expires_at__gt=now,
+                rating_min__lte=rating + policy.cap,
+                rating_max__gte=rating - policy.cap,
+                user__rating__gte=rating_min,
+                user__rating__lte=rating_max,
+            )
+            .exclude(pk=ticket.pk)
+            .order_by("created_at", "id")
+            .values_list("id", "rating_min", "rating_max", "created_at")[:OPPONENT_CANDIDATE_LIMIT]
+        )
+        opponent = None
+        for candidate_id, candidate_min, candidate_max, created_at in candidates:
+            low, high = policy.window(candidate_min, candidate_max, created_at, now)
+            if not low <= rating <= high:
+                continue
+            opponent = lockable.filter(pk=candidate_id, expires_at__gt=now).first()
+            if opponent is not None:
+                break
+        if opponent is None:
+            return None
+        game = Game.objects.create(
+            white_player_id=opponent.user_id,
+            black_player=ticket.user,
+            time_control=opponent.time_control,
+        )
+        MatchmakingTicket.objects.filter(id__in=(ticket.id, opponent.id)).delete()
+    return game
+
+
+def find_pairings(entries: Iterable[QueueEntry]) -> list[Pairing]:
+    """Pair compatible tickets in O(n log n) for typical queues.
+
+    Tickets are bucketed by time control, then visited oldest first. Each
+    ticket is paired with the oldest unmatched ticket that lies inside its
+    window and whose own window accepts it, the same choice ``match_ticket``
+    makes, so the longest waits are served first. The older ticket of a pair
+    plays white.
+    """
+    buckets: dict[str, list[QueueEntry]] = defaultdict(list)
+    for entry in entries:
+        buckets[entry.time_control].append(entry)
+
+    pairings: list[Pairing] = []
+    for bucket in buckets.values():
+        pairings.extend(_pair_bucket(bucket))
+    pairings.sort(key=lambda pairing: (pairing.white.created_at, pairing.white.ticket_id))
+    return pairings
+
+
+def _pair_bucket(bucket: Sequence[QueueEntry]) -> list[Pairing]:
+    fifo = sorted(bucket, key=lambda entry: (entry.created_at, entry.ticket_id))
+    size = len(fifo)
+    if size < 2:
+        return []
+
+    by_rating = sorted(range(size), key=lambda index: (fifo[index].rating, index))
+    ratings = [fifo[index].rating for index in by_rating]
+    waiting = _OldestWaiting(by_rating)
+
+    pairings: list[Pairing] = []
+    for index, entry in enumerate(fifo):
+        if not waiting.remove(index):
+            continue
+        lo = bisect_left(ratings, entry.rating_min)
+        hi = bisect_right(ratings, entry.rating_max) - 1
+        # Walk the unmatched tickets in the window oldest first, hiding the
+        # ones whose own window rejects this ticket until it is paired.
+        rejected: list[int] = []
+        opponent = None
+        while (candidate := waiting.oldest(lo, hi)) is not None:
+            if fifo[candidate].accepts(entry.rating):
+                opponent = candidate
+                break
+            waiting.remove(candidate)
+            rejected.append(candidate)
+        for candidate in rejected:
+            waiting.restore(candidate)
+        if opponent is None:
+            continue
+        waiting.remove(opponent)
+        pairings.append(Pairing(white=entry, black=fifo[opponent]))
+    return pairings
+
+
+class _OldestWaiting:
+    """Unmatched tickets laid out in rating order, queried for the oldest in a range.
+
+    A segment tree over rating positions holds the smallest FIFO index of
+    the tickets still waiting in each span, so finding the oldest ticket in
+    a rating range and removing or restoring one are O(log n).
+    """
+
+    def __init__(self, by_rating: list[int]) -> None:
+        size = len(by_rating)
+        self.empty = size
+        self.leaves = 1
+        while self.leaves < size:
+            self.leaves *= 2
+        self.tree = [self.empty] * (2 * self.leaves)
+        self.position = [0] * size
+        for pos, index in enumerate(by_rating):
+            self.position[index] = pos
+            self.tree[self.leaves + pos] = index
+        for node in range(self.leaves - 1, 0, -1):
+            self.tree[node] = min(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def remove(self, index: int) -> bool:
+        """Take ``index`` out; False if it was already gone."""
+        leaf = self.leaves + self.position[index]
+        if self.tree[leaf] == self.empty:
+            return False
+        self._set(leaf, self.empty)
+        return True
+
+    def restore(self, index: int) -> None:
+        self._set(self.leaves + self.position[index], index)
+
+    def oldest(self, lo: int, hi: int) -> int | None:
+        """FIFO index of the oldest waiting ticket at rating positions ``lo..hi``."""
+        best = self.empty
+        lo += self.leaves
+        hi += self.leaves + 1
+        while lo < hi:
+            if lo & 1:
+                best = min(best, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = min(best, self.tree[hi])
+            lo //= 2
+            hi //= 2
+        return None if best == self.empty else best
+
+    def _set(self, node: int, value: int) -> None:
+        self.tree[node] = value
+        node //= 2
+        while node:
+            self.tree[node] = min(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
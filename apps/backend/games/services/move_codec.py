@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from collections import defaultdict
+from typing import Iterable
+
+import chess
+from django.conf import settings
+
+from ..models import DEFAULT_START_FEN, Game, Move
+
+# One ply per 16-bit big-endian word: from square in bits 0-5, to square in
+# bits 6-11 and the promotion piece type (0 for none) in bits 12-14.
+_SWAP = sys.byteorder == "little"
+_PROMOTIONS = ["", "", "n", "b", "r", "q", "", ""]
+
+STORAGE_MODES = ("rows", "finished", "packed")
+
+
+def encode_move(uci: str) -> int:
+    move = chess.Move.from_uci(uci)
+    if not move or move.drop:
+        raise ValueError(f"Cannot pack move {uci!r}.")
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code: int) -> str:
+    return chess.SQUARE_NAMES[code & 63] + chess.SQUARE_NAMES[code >> 6 & 63] + _PROMOTIONS[code >> 12 & 7]
+
+
+def pack_moves(ucis: Iterable[str]) -> bytes:
+    codes = array("H", (encode_move(uci) for uci in ucis))
+    if _SWAP:
+        codes.byteswap()
+    return codes.tobytes()
+
+
+def unpack_moves(data: bytes | memoryview) -> list[str]:
+    codes = array("H")
+    codes.frombytes(bytes(data))
+    if _SWAP:
+        codes.byteswap()
+    return [decode_move(code) for code in codes]
+
+
+def storage_mode() -> str:
+    mode = getattr(settings, "GAME_MOVE_STORAGE", "rows")
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"GAME_MOVE_STORAGE must be one of {', '.join(STORAGE_MODES)}.")
+    return mode
+
+
+def is_packed(game: Game) -> bool:
+    return game.packed_moves is not None
+
+
+def packs_move(game: Game, finishing: bool = False) -> bool:
+    """Whether the next move of ``game`` is stored packed instead of as a row.
+
+    Packed games stay packed whatever the setting. With ``"packed"`` new
+    games are packed from their first move; with ``"finished"`` a game is
+    packed by the move that ends it.
+    """
+    if is_packed(game):
+        return True
+    mode = storage_mode()
+    if mode == "packed":
+        return game.moves_count == 0 or finishing
+    return finishing and mode == "finished"
+
+
+def store_board(game: Game, board: chess.Board) -> list[str]:
+    """Pack ``board``'s move stack into ``game`` and drop its move rows.
+
+    Returns the fields to save. Must run in the transaction holding the game
+    row lock.
+    """
+    if not is_packed(game) and game.moves_count:
+        Move.objects.filter(game=game).delete()
+    game.packed_moves = pack_moves(move.uci() for move in board.move_stack)
+    return ["packed_moves"]
+
+
+def stored_moves(game: Game) -> tuple[list[str], list[str]]:
+    """UCI and SAN of every ply of ``game``, whichever way it is stored."""
+    if not is_packed(game):
+        rows = list(game.moves.order_by("move_number", "created_at").values_list("uci", "san"))
+        return [uci for uci, _ in rows], [san for _, san in rows]
+    ucis = unpack_moves(game.packed_moves)
+    board = chess.Board(game.initial_fen or DEFAULT_START_FEN)
+    sans = []
+    for uci in ucis:
+        move = chess.Move.from_uci(uci)
+        sans.append(board.san(move))
+        board.push(move)
+    return ucis, sans
+
+
+def row_moves_by_game(game_ids: Iterable[int]) -> dict[int, list[str]]:
+    """UCI moves of row-stored games, one query for all of them."""
+    ucis: dict[int, list[str]] = defaultdict(list)
+    rows = Move.objects.filter(game_id__in=list(game_ids)).order_by("game_id", "move_number", "created_at")
+    for game_id, uci in rows.values_list("game_id", "uci").iterator(chunk_size=5000):
+        ucis[game_id].append(uci)
+    return ucis
+
+
+def move_numbers(initial_fen: str, count: int) -> list[int]:
+    """Full-move number of each of the first ``count`` plies from ``initial_fen``."""
+    fields = (initial_fen or DEFAULT_START_FEN).split()
+    first = int(fields[5]) if len(fields) > 5 else 1
+    offset = 1 if len(fields) > 1 and fields[1] == "b" else 0
+    return [first + (ply + offset) // 2 for ply in range(count)]
+
+
+def move_objects(game: Game) -> list[Move]:
+    """Unsaved ``Move`` instances for a packed game (no ``id`` or ``created_at``).
+
+    Each carries its ``ply``, the identifier clients key moves by whichever
+    way they are stored. ``game`` should have both players loaded.
+    """
+    board = chess.Board(game.initial_fen or DEFAULT_START_FEN)
+    moves = []
+    for uci in unpack_moves(game.packed_moves):
+        move = chess.Move.from_uci(uci)
+        player = game.white_player if board.turn == chess.WHITE else game.black_player
+        move_number = board.fullmove_number
+        san = board.san(move)
+        board.push(move)
+        row = Move(
+            game=game,
+            player=player,
+            move_number=move_number,
+            san=san,
+            uci=uci,
+            fen_after=board.fen(),
+            is_check=board.is_check(),
+            is_mate=board.is_checkmate(),
+        )
+        row.ply = len(moves) + 1
+        moves.append(row)
+    return moves
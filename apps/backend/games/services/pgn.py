@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import chess
+
+# No Django imports: PGN import workers use this module without setting up Django.
+DEFAULT_START_FEN = chess.STARTING_FEN
+PGN_COLUMNS = 80
+
+
+def _default_headers() -> dict[str, str]:
+    return {
+        "Event": "?",
+        "Site": "?",
+        "Date": "????.??.??",
+        "Round": "?",
+        "White": "?",
+        "Black": "?",
+        "Result": "*",
+    }
+
+
+class PgnBuilder:
+    """Maintains a game's PGN text incrementally as moves are played.
+
+    The output matches ``chess.pgn.StringExporter(headers=True, variations=False,
+    comments=False)`` for a mainline-only game: movetext is wrapped at 80
+    columns and move numbers are written before white moves (and before the
+    first move when black starts). Appending a move only touches the current
+    movetext line, and the header block is re-rendered only after a header
+    value changes.
+    """
+
+    def __init__(self, starting_fen: str = DEFAULT_START_FEN, columns: int | None = PGN_COLUMNS) -> None:
+        self.columns = columns
+        self._headers = _default_headers()
+        if starting_fen != chess.STARTING_FEN:
+            self._headers["FEN"] = starting_fen
+            self._headers["SetUp"] = "1"
+        self._header_text: str | None = None
+        self._lines: list[str] = []
+        self._current_line = ""
+        self._force_movenumber = True
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return dict(self._headers)
+
+    @property
+    def result(self) -> str:
+        return self._headers["Result"]
+
+    def set_header(self, name: str, value: str) -> None:
+        if self._headers.get(name) != value:
+            self._headers[name] = value
+            self._header_text = None
+
+    def set_result(self, result: str) -> None:
+        self.set_header("Result", result)
+
+    def append(self, board: chess.Board, san: str) -> None:
+        """Append ``san`` played from ``board`` (the position *before* the move)."""
+        if board.turn == chess.WHITE:
+            self._write_token(f"{board.fullmove_number}. ")
+        elif self._force_movenumber:
+            self._write_token(f"{board.fullmove_number}... ")
+        self._write_token(f"{san} ")
+        self._force_movenumber = False
+
+    def movetext(self) -> str:
+        result_token = f"{self.result} "
+        lines = list(self._lines)
+        current = self._current_line
+        if self._wraps(current, result_token):
+            if current:
+                lines.append(current.rstrip())
+            current = ""
+        lines.append((current + result_token).rstrip())
+        return "\n".join(lines)
+
+    def render(self) -> str:
+        if self._header_text is None:
+            self._header_text = "\n".join(f'[{name} "{value}"]' for name, value in self._headers.items())
+        return f"{self._header_text}\n\n{self.movetext()}"
+
+    def _write_token(self, token: str) -> None:
+        if self._wraps(self._current_line, token):
+            if self._current_line:
+                self._lines.append(self._current_line.rstrip())
+            self._current_line = ""
+        self._current_line += token
+
+    def _wraps(self, line: str, token: str) -> bool:
+        return self.columns is not None and self.columns - len(line) < len(token)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Iterator
+
+import chess
+from django.contrib.auth import get_user_model
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from ..models import DEFAULT_START_FEN, Game, time_control_key
+from .move_codec import row_moves_by_game, unpack_moves
+from .pgn import PgnBuilder
+
+User = get_user_model()
+
+EXPORT_CHUNK_SIZE = 500
+RESULTS = {
+    Game.Winner.WHITE: "1-0",
+    Game.Winner.BLACK: "0-1",
+    Game.Winner.DRAW: "1/2-1/2",
+}
+_RESULT_TOKEN = re.compile(r"(1-0|0-1|1/2-1/2|\*)\s*$")
+
+
+def finished_games(user: User | None = None, since: date | None = None, until: date | None = None) -> QuerySet:
+    """Finished games, oldest first, optionally for one player and an end-date range (inclusive)."""
+    games = Game.objects.filter(status=Game.Status.FINISHED)
+    if user is not None:
+        games = games.filter(Q(white_player=user) | Q(black_player=user))
+    if since is not None:
+        games = games.filter(ended_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+    if until is not None:
+        games = games.filter(ended_at__lt=timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min)))
+    return (
+        games.select_related("white_player", "black_player")
+        .only(
+            "id",
+            "initial_fen",
+            "pgn",
+            "packed_moves",
+            "winner",
+            "time_control",
+            "started_at",
+            "ended_at",
+            "created_at",
+            "white_player__username",
+            "white_player__rating",
+            "black_player__username",
+            "black_player__rating",
+        )
+        .order_by("id")
+    )
+
+
+def iter_pgn(games: QuerySet, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """Yield the PGN of ``games``, one string per ``chunk_size`` games.
+
+    Games are read through ``iterator`` so memory use does not grow with the
+    export. The stored ``Game.pgn`` movetext is reused; games without one are
+    rendered from their moves, fetched once per chunk.
+    """
+    for _, text in iter_pgn_chunks(games, chunk_size):
+        yield text
+
+
+def iter_pgn_chunks(games: QuerySet, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[tuple[int, str]]:
+    """Like ``iter_pgn`` but yields ``(number of games, text)`` pairs."""
+    batch: list[Game] = []
+    for game in games.iterator(chunk_size=chunk_size):
+        batch.append(game)
+        if len(batch) >= chunk_size:
+            yield len(batch), _render_batch(batch)
+            batch = []
+    if batch:
+        yield len(batch), _render_batch(batch)
+
+
+def game_pgn(game: Game, ucis: list[str] | None = None) -> str:
+    """PGN of a finished ``game`` with player, rating, date and time-control headers."""
+    result = RESULTS.get(game.winner, "*")
+    headers = pgn_headers(game, result)
+    if game.pgn and ucis is None:
+        movetext = _RESULT_TOKEN.sub(result, game.pgn.split("\n\n", 1)[-1])
+    else:
+        if ucis is None:
+            ucis = unpack_moves(game.packed_moves) if game.packed_moves is not None else []
+        movetext = _movetext(game.initial_fen or DEFAULT_START_FEN, ucis, result)
+    header_text = "\n".join(f'[{name} "{_escape(value)}"]' for name, value in headers.items())
+    return f"{header_text}\n\n{movetext}\n\n"
+
+
+def pgn_headers(game: Game, result: str) -> dict[str, str]:
+    started = game.started_at or game.created_at
+    headers = {
+        "Event": "Rated game",
+        "Site": "ShamChess",
+        "Date": started.strftime("%Y.%m.%d") if started else "????.??.??",
+        "Round": "-",
+        "White": game.white_player.username,
+        "Black": game.black_player.username,
+        "Result": result,
+        "WhiteElo": str(game.white_player.rating),
+        "BlackElo": str(game.black_player.rating),
+        "TimeControl": time_control_key(game.time_control),
+        "GameId": str(game.id),
+    }
+    if started:
+        headers["UTCDate"] = started.strftime("%Y.%m.%d")
+        headers["UTCTime"] = started.strftime("%H:%M:%S")
+    if game.ended_at:
+        headers["EndDate"] = game.ended_at.strftime("%Y.%m.%d")
+    if game.initial_fen and game.initial_fen != DEFAULT_START_FEN:
+        headers["SetUp"] = "1"
+        headers["FEN"] = game.initial_fen
+    return headers
+
+
+def _render_batch(batch: list[Game]) -> str:
+    missing = [game.id for game in batch if not game.pgn and game.packed_moves is None]
+    moves = row_moves_by_game(missing) if missing else {}
+    return "".join(game_pgn(game, moves.get(game.id)) for game in batch)
+
+
+def _movetext(initial_fen: str, ucis: list[str], result: str) -> str:
+    board = chess.Board(initial_fen)
+    builder = PgnBuilder(initial_fen)
+    for uci in ucis:
+        move = chess.Move.from_uci(uci)
+        builder.append(board, board.san(move))
+        board.push(move)
+    builder.set_result(result)
+    return builder.movetext()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
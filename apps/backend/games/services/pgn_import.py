@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import gzip
+import io
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+from typing import IO, Callable, Iterable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Game, PgnImport, default_time_control
+from .move_codec import pack_moves
+from .pgn_reader import ParsedGame, ParseError, parse_games, split_games
+
+User = get_user_model()
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+WINNERS = {"1-0": Game.Winner.WHITE, "0-1": Game.Winner.BLACK, "1/2-1/2": Game.Winner.DRAW}
+
+
+@dataclass(slots=True)
+class ImportReport:
+    imported: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    errors: list[dict] = field(default_factory=list)
+
+    @property
+    def games_per_second(self) -> float:
+        return self.imported / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "seconds": round(self.seconds, 3),
+            "games_per_second": round(self.games_per_second, 1),
+            "errors": self.errors,
+        }
+
+
+def import_pgn(
+    lines: Iterable[str],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    workers: int = 0,
+    player_prefix: str = "",
+    progress: Callable[[ImportReport], None] | None = None,
+) -> ImportReport:
+    """Import every finished game of a PGN stream.
+
+    The stream is split into games without parsing; batches of
+    ``batch_size`` games are validated in ``workers`` processes (inline when
+    0) and each batch is stored with ``bulk_create`` in one transaction.
+    Games are stored packed and finished, already counted as rated so
+    historical results do not move current ratings. Players are matched by
+    ``player_prefix`` + PGN name against inactive placeholder accounts only
+    (see ``_PlayerCache``), created for unknown names. Games that fail
+    validation are reported, not stored.
+    """
+    report = ImportReport()
+    players = _PlayerCache(player_prefix)
+    started = time.monotonic()
+    for results in _parsed_batches(lines, batch_size, workers):
+        _store_batch(results, players, report)
+        report.seconds = time.monotonic() - started
+        if progress is not None:
+            progress(report)
+    report.seconds = time.monotonic() - started
+    if report.imported:
+        from ..tasks import schedule_position_indexing  # noqa: WPS433 - tasks import the services
+
+        transaction.on_commit(schedule_position_indexing)
+    return report
+
+
+def open_pgn(raw: IO[bytes], name: str = "") -> io.TextIOWrapper:
+    """Text lines of a binary PGN stream, gunzipped when ``name`` ends in ``.gz``."""
+    if name.endswith(".gz"):
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+
+
+def run_import(pgn_import: PgnImport, workers: int = 0) -> ImportReport:
+    """Import an uploaded file, recording progress and the report on the row."""
+    rows = PgnImport.objects.filter(pk=pgn_import.pk)
+    rows.update(status=PgnImport.Status.RUNNING)
+
+    def progress(report: ImportReport) -> None:
+        rows.update(imported=report.imported, failed=report.failed, seconds=report.seconds)
+
+    try:
+        with pgn_import.file.open("rb") as raw:
+            report = import_pgn(
+                open_pgn(raw, pgn_import.file.name),
+                workers=workers,
+                player_prefix=pgn_import.player_prefix,
+                progress=progress,
+            )
+    except Exception:
+        rows.update(status=PgnImport.Status.FAILED, finished_at=timezone.now())
+        raise
+    rows.update(
+        status=PgnImport.Status.DONE,
+        imported=report.imported,
+        failed=report.failed,
+        seconds=report.seconds,
+        errors=report.errors,
+        finished_at=timezone.now(),
+    )
+    return report
+
+
+def _parsed_batches(lines: Iterable[str], batch_size: int, workers: int) -> Iterator[list[ParsedGame | ParseError]]:
+    batches = _batches(split_games(lines), batch_size)
+    if workers <= 0:
+        for first_index, texts in batches:
+            yield parse_games(texts, first_index)
+        return
+    # At most 2 * workers batches are read ahead of the one being stored.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight: deque = deque()
+        for first_index, texts in batches:
+            in_flight.append(pool.submit(parse_games, texts, first_index))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def _batches(texts: Iterator[str], batch_size: int) -> Iterator[tuple[int, list[str]]]:
+    first_index = 1
+    while batch := list(islice(texts, batch_size)):
+        yield first_index, batch
+        first_index += len(batch)
+
+
+def _store_batch(results: list[ParsedGame | ParseError], players: "_PlayerCache", report: ImportReport) -> None:
+    parsed = [result for result in results if isinstance(result, ParsedGame)]
+    for result in results:
+        if isinstance(result, ParseError):
+            report.failed += 1
+            if len(report.errors) < MAX_REPORTED_ERRORS:
+                report.errors.append(
+                    {"game": result.index, "white": result.white, "black": result.black, "error": result.message}
+                )
+    if not parsed:
+        return
+    with transaction.atomic():
+        player_ids = players.resolve(parsed)
+        Game.objects.bulk_create(
+            [_game(game, player_ids) for game in parsed],
+            batch_size=500,
+        )
+    report.imported += len(parsed)
+
+
+def _game(parsed: ParsedGame, player_ids: dict[str, int]) -> Game:
+    headers = parsed.headers
+    started = _header_datetime(headers.get("UTCDate") or headers.get("Date"), headers.get("UTCTime"))
+    return Game(
+        white_player_id=player_ids[headers.get("White", "?")],
+        black_player_id=player_ids[headers.get("Black", "?")],
+        initial_fen=parsed.initial_fen,
+        fen=parsed.fen,
+        pgn=parsed.pgn,
+        packed_moves=pack_moves(parsed.ucis),
+        status=Game.Status.FINISHED,
+        winner=WINNERS[parsed.result],
+        moves_count=parsed.moves_count,
+        time_control=_time_control(headers.get("TimeControl")),
+        started_at=started,
+        ended_at=_header_datetime(headers.get("EndDate"), headers.get("EndTime")) or started,
+        elo_processed=True,
+    )
+
+
+class _PlayerCache:
+    """Maps PGN player names to user ids, creating inactive placeholders.
+
+    Only placeholders are ever matched: a name held by an active account is
+    given a placeholder of its own, ``<name>#pgn``, which registration cannot
+    take (``#`` fails the username validator), so an uploaded file can never
+    attach games to someone's account.
+    """
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+        self.ids: dict[str, int] = {}
+
+    def resolve(self, games: list[ParsedGame]) -> dict[str, int]:
+        ratings: dict[str, int] = {}
+        for game in games:
+            for color in ("White", "Black"):
+                name = game.headers.get(color, "?")
+                if name not in self.ids:
+                    ratings.setdefault(name, _rating(game.headers.get(f"{color}Elo")))
+        if not ratings:
+            return self.ids
+        usernames = {name: self._username(name) for name in ratings}
+        candidates = set(usernames.values()) | {_reserved_username(username) for username in usernames.values()}
+        accounts = {
+            username: (user_id, is_active)
+            for username, user_id, is_active in User.objects.filter(username__in=candidates).values_list(
+                "username", "id", "is_active"
+            )
+        }
+        for name, username in usernames.items():
+            if accounts.get(username, (None, False))[1]:
+                usernames[name] = _reserved_username(username)
+        found = {username: user_id for username, (user_id, is_active) in accounts.items() if not is_active}
+        missing = {username: ratings[name] for name, username in usernames.items() if username not in found}
+        if missing:
+            unusable = make_password(None)
+            default_rating = User._meta.get_field("rating").default
+            User.objects.bulk_create(
+                [
+                    User(username=username, password=unusable, is_active=False, rating=rating or default_rating)
+                    for username, rating in missing.items()
+                ],
+                ignore_conflicts=True,
+            )
+            # Re-read: ignore_conflicts returns no ids, and a concurrent import may have won.
+            found.update(
+                User.objects.filter(username__in=list(missing), is_active=False).values_list("username", "id")
+            )
+        for name, username in usernames.items():
+            if username not in found:
+                raise ValueError(f"No placeholder for {name!r}: {username!r} is an active account.")
+            self.ids[name] = found[username]
+        return self.ids
+
+    def _username(self, name: str) -> str:
+        name = name.strip() if name.strip() not in {"", "?"} else "Anonymous"
+        return (self.prefix + name)[:150]
+
+
+def _reserved_username(username: str) -> str:
+    return username[:146] + "#pgn"
+
+
+def _rating(value: str | None) -> int | None:
+    try:
+        rating = int(value) if value else None
+    except ValueError:
+        return None
+    return rating if rating and rating > 0 else None
+
+
+def _time_control(value: str | None) -> dict[str, int]:
+    base, _, increment = (value or "").partition("+")
+    if base.isdigit() and (not increment or increment.isdigit()):
+        return {"base": int(base), "increment": int(increment or 0)}
+    return default_time_control()
+
+
+def _header_datetime(day: str | None, clock: str | None) -> datetime | None:
+    try:
+        parsed = datetime.strptime(f"{day} {clock or '00:00:00'}", "%Y.%m.%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+    return parsed.replace(tzinfo=dt_timezone.utc)
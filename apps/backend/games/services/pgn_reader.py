@@ -0,0 +1,149 @@
+"""Splitting and validating multi-game PGN text.
+
+Only ``chess`` is imported here so ``parse_games`` can run in worker
+processes that have not set up Django.
+"""
+
+from __future__ import annotations
+
+import io
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+import chess
+import chess.pgn
+
+from .pgn import PgnBuilder
+
+RESULTS = ("1-0", "0-1", "1/2-1/2")
+COPIED_HEADERS = ("Event", "Site", "Date", "White", "Black")
+
+_TAG = re.compile(r'\[[A-Za-z0-9_]+\s+"')
+_UNESCAPE = re.compile(r'\\([\\"])')
+
+
+@dataclass(slots=True)
+class ParsedGame:
+    index: int
+    headers: dict[str, str]
+    initial_fen: str
+    ucis: list[str]
+    result: str
+    fen: str
+    pgn: str
+    moves_count: int
+
+
+@dataclass(slots=True)
+class ParseError:
+    index: int
+    white: str
+    black: str
+    message: str
+
+
+def split_games(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the text of each game in a PGN stream without parsing it.
+
+    A game ends where a tag pair line follows movetext.
+    """
+    buffer: list[str] = []
+    in_movetext = False
+    for line in lines:
+        is_tag = line.startswith("[") and _TAG.match(line) is not None
+        if is_tag and in_movetext:
+            yield "".join(buffer)
+            buffer = []
+            in_movetext = False
+        elif not is_tag and line.strip():
+            in_movetext = True
+        buffer.append(line)
+    if in_movetext or any(line.strip() for line in buffer):
+        yield "".join(buffer)
+
+
+def parse_games(texts: list[str], first_index: int) -> list[ParsedGame | ParseError]:
+    return [parse_game(text, first_index + offset) for offset, text in enumerate(texts)]
+
+
+def parse_game(text: str, index: int) -> ParsedGame | ParseError:
+    """Validate one game: standard chess, legal mainline moves and a final result."""
+    collector = chess.pgn.read_game(io.StringIO(text), Visitor=_MainlineCollector)
+    if collector is None:
+        return ParseError(index, "", "", "No game found.")
+    headers = collector.headers
+    white, black = headers.get("White", "?"), headers.get("Black", "?")
+    if collector.error is not None:
+        return ParseError(index, white, black, collector.error)
+    result = headers.get("Result", collector.movetext_result)
+    if result not in RESULTS:
+        return ParseError(index, white, black, f"Unsupported result {result!r}; only finished games can be imported.")
+    board = collector.board
+    outcome = board.outcome()
+    if outcome is not None and outcome.winner is not None and outcome.result() != result:
+        return ParseError(index, white, black, f"Result {result} contradicts the final position ({outcome.result()}).")
+
+    builder = collector.builder
+    for name in COPIED_HEADERS:
+        if name in headers:
+            builder.set_header(name, headers[name].replace("\\", "\\\\").replace('"', '\\"'))
+    builder.set_result(result)
+    moves_count = 0
+    if board.move_stack:
+        moves_count = board.fullmove_number - (1 if board.turn == chess.WHITE else 0)
+    return ParsedGame(
+        index=index,
+        headers=headers,
+        initial_fen=collector.initial_fen,
+        ucis=[move.uci() for move in board.move_stack],
+        result=result,
+        fen=board.fen(),
+        pgn=builder.render(),
+        moves_count=moves_count,
+    )
+
+
+class _MainlineCollector(chess.pgn.BaseVisitor):
+    """Collects headers, the mainline board and its PGN; variations are skipped."""
+
+    def begin_game(self) -> None:
+        self.headers: dict[str, str] = {}
+        self.initial_fen: str | None = None
+        self.board: chess.Board | None = None
+        self.builder: PgnBuilder | None = None
+        self.movetext_result = "*"
+        self.error: str | None = None
+
+    def visit_header(self, tagname: str, tagvalue: str) -> None:
+        self.headers[tagname] = _UNESCAPE.sub(r"\1", tagvalue)
+
+    def end_headers(self):
+        if self.headers.get("Variant", "standard").lower() not in {"standard", "chess", "normal"}:
+            self.error = f"Unsupported variant {self.headers['Variant']!r}."
+            return chess.pgn.SKIP
+        return None
+
+    def visit_board(self, board: chess.Board) -> None:
+        if self.board is None:
+            if board.chess960:
+                self.error = "Chess960 games are not supported."
+            self.initial_fen = board.fen()
+            self.builder = PgnBuilder(self.initial_fen)
+        self.board = board
+
+    def visit_move(self, board: chess.Board, move: chess.Move) -> None:
+        self.builder.append(board, board.san(move))
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_result(self, result: str) -> None:
+        self.movetext_result = result
+
+    def handle_error(self, error: Exception) -> None:
+        if self.error is None:
+            self.error = str(error)
+
+    def result(self) -> "_MainlineCollector":
+        return self
@@ -0,0 +1,105 @@
+"""Polyglot position keys and per-position result tallies.
+
+Only ``chess`` is imported here so the functions can run in worker
+processes that have not set up Django.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Sequence
+
+import chess
+import chess.polyglot
+
+_HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+_ARRAY = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+
+# Tally columns: games, white wins, draws, black wins.
+RESULT_COLUMNS = {"white": 1, "draw": 2, "black": 3}
+
+Tally = dict[int, list[int]]
+MoveTally = dict[tuple[int, str], list[int]]
+
+
+def signed_key(key: int) -> int:
+    """Map an unsigned 64-bit polyglot key onto a signed ``BigIntegerField``."""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def unsigned_key(key: int) -> int:
+    return key + (1 << 64) if key < 0 else key
+
+
+def position_key(board: chess.Board) -> int:
+    return signed_key(_HASHER(board))
+
+
+def position_keys(initial_fen: str, ucis: Sequence[str]) -> list[int]:
+    """Signed polyglot keys of the start position and the position after each ply.
+
+    The piece part of the hash is updated incrementally from the moved,
+    captured and promoted pieces; castling and en passant moves, which touch
+    more squares, rehash the board.
+    """
+    board = chess.Board(initial_fen or chess.STARTING_FEN)
+    pieces = _HASHER.hash_board(board)
+    keys = [signed_key(pieces ^ _HASHER.hash_castling(board) ^ _HASHER.hash_ep_square(board) ^ _HASHER.hash_turn(board))]
+    for uci in ucis:
+        move = chess.Move.from_uci(uci)
+        if board.is_castling(move) or board.is_en_passant(move):
+            board.push(move)
+            pieces = _HASHER.hash_board(board)
+        else:
+            mover = int(board.turn)
+            moved = board.piece_type_at(move.from_square)
+            captured = board.piece_type_at(move.to_square)
+            pieces ^= _ARRAY[64 * ((moved - 1) * 2 + mover) + move.from_square]
+            if captured:
+                pieces ^= _ARRAY[64 * ((captured - 1) * 2 + (mover ^ 1)) + move.to_square]
+            pieces ^= _ARRAY[64 * (((move.promotion or moved) - 1) * 2 + mover) + move.to_square]
+            board.push(move)
+        keys.append(
+            signed_key(pieces ^ _HASHER.hash_castling(board) ^ _HASHER.hash_ep_square(board) ^ _HASHER.hash_turn(board))
+        )
+    return keys
+
+
+def tally_games(games: Iterable[tuple[str, Sequence[str], str]], depth: int) -> tuple[Tally, MoveTally]:
+    """Aggregate results per position and per (position, move) over ``games``.
+
+    ``games`` yields ``(initial_fen, ucis, winner)``. The first ``depth``
+    plies of each game are counted; a position or move repeated within one
+    game counts once. Games without a decisive or drawn result are skipped.
+    """
+    positions: Tally = {}
+    moves: MoveTally = {}
+    for initial_fen, ucis, winner in games:
+        column = RESULT_COLUMNS.get(winner)
+        if column is None:
+            continue
+        played = list(ucis[:depth])
+        keys = position_keys(initial_fen, played)
+        for key in set(keys):
+            counts = positions.get(key)
+            if counts is None:
+                counts = positions[key] = [0, 0, 0, 0]
+            counts[0] += 1
+            counts[column] += 1
+        for edge in set(zip(keys, played)):
+            counts = moves.get(edge)
+            if counts is None:
+                counts = moves[edge] = [0, 0, 0, 0]
+            counts[0] += 1
+            counts[column] += 1
+    return positions, moves
+
+
+def merge_tallies(target: tuple[Tally, MoveTally], other: tuple[Tally, MoveTally]) -> None:
+    for into, source in zip(target, other):
+        for key, counts in source.items():
+            existing = into.get(key)
+            if existing is None:
+                into[key] = list(counts)
+            else:
+                for column, value in enumerate(counts):
+                    existing[column] += value
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import partial
+from typing import NamedTuple, Sequence
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ..models import Game, RatingHistory, RatingPeriod
+from . import leaderboard
+
+User = get_user_model()
+
+RATING_ENGINES = {
+    "elo": "games.services.elo.EloEngine",
+    "glicko2": "games.services.glicko2.Glicko2Engine",
+}
+
+
+class RatedGame(NamedTuple):
+    game_id: int
+    white_id: int
+    black_id: int
+    white_score: float
+    black_score: float
+
+
+@dataclass(slots=True)
+class BatchResult:
+    game_ids: list[int] = field(default_factory=list)
+    user_ids: list[int] = field(default_factory=list)
+
+
+class RatingEngine:
+    """Computes new ratings for a batch of finished games.
+
+    ``rate`` receives the games in the order they ended together with every
+    player involved, locked and keyed by id, and updates the players'
+    ``update_fields`` in memory; win/loss/draw counters and persistence are
+    handled by ``apply_pending_results``.
+
+    Engines with ``uses_rating_periods`` rate the games of a whole
+    ``RATING_PERIOD`` at once (see ``close_rating_periods``) and update the
+    players who did not play in it through ``rest``.
+    """
+
+    name = ""
+    update_fields: tuple[str, ...] = ("rating",)
+    uses_rating_periods = False
+
+    def rate(self, games: Sequence[RatedGame], players: dict[int, User]) -> None:
+        raise NotImplementedError
+
+    def rest(self, players) -> int:
+        """Update the queryset of players without games in a closed period."""
+        return 0
+
+
+def get_rating_engine(name: str | None = None) -> RatingEngine:
+    name = name or getattr(settings, "RATING_ENGINE", "elo")
+    try:
+        path = RATING_ENGINES[name]
+    except KeyError as exc:
+        raise ValueError(f"Unknown rating engine {name!r}.") from exc
+    return import_string(path)()
+
+
+def scores_for_winner(winner: str) -> tuple[float, float]:
+    if winner == Game.Winner.WHITE:
+        return 1.0, 0.0
+    if winner == Game.Winner.BLACK:
+        return 0.0, 1.0
+    if winner == Game.Winner.DRAW:
+        return 0.5, 0.5
+    return 0.0, 0.0
+
+
+def record_outcome(player: User, score: float) -> None:
+    if score == 1.0:
+        player.wins += 1
+    elif score == 0.5:
+        player.draws += 1
+    else:
+        player.losses += 1
+
+
+def rating_periods_enabled(engine: RatingEngine | None = None) -> bool:
+    engine = engine or get_rating_engine()
+    return engine.uses_rating_periods and getattr(settings, "RATING_PERIOD", 0) > 0
+
+
+def apply_pending_results(
+    limit: int | None = 1000,
+    game_ids: Sequence[int] | None = None,
+    engine: RatingEngine | None = None,
+    ended_before: datetime | None = None,
+) -> BatchResult:
+    """Rate up to ``limit`` finished, unprocessed games in one transaction.
+
+    Games are handed to the configured engine in the order they ended. Users
+    are written with one ``bulk_update``, every rated player gets one
+    ``RatingHistory`` row, and the games are marked processed with one
+    ``UPDATE``. Games locked by a concurrent batch are skipped and picked up
+    by the next one. ``ended_before`` restricts the batch to games that
+    ended before it; ``limit=None`` rates every one of them. The leaderboard
+    is updated once the batch commits.
+    """
+    engine = engine or get_rating_engine()
+    with transaction.atomic():
+        pending = Game.objects.select_for_update(skip_locked=True).filter(
+            status=Game.Status.FINISHED, elo_processed=False
+        )
+        if game_ids is not None:
+            pending = pending.filter(id__in=game_ids)
+        if ended_before is not None:
+            pending = pending.filter(ended_at__lt=ended_before)
+        rows = pending.order_by("ended_at", "id").values_list("id", "white_player_id", "black_player_id", "winner")
+        if limit is not None:
+            rows = rows[:limit]
+        games = [
+            RatedGame(game_id, white_id, black_id, *scores_for_winner(winner))
+            for game_id, white_id, black_id, winner in rows
+        ]
+        if not games:
+            return BatchResult()
+        player_ids = {player_id for game in games for player_id in (game.white_id, game.black_id)}
+        # Lock players in id order so concurrent batches cannot deadlock.
+        locked = User.objects.select_for_update().filter(id__in=player_ids).order_by("id")
+        players = {user.id: user for user in locked}
+        previous = {player_id: player.rating for player_id, player in players.items()}
+
+        engine.rate(games, players)
+        played: dict[int, int] = defaultdict(int)
+        last_game: dict[int, int] = {}
+        for game in games:
+            record_outcome(players[game.white_id], game.white_score)
+            record_outcome(players[game.black_id], game.black_score)
+            for player_id in (game.white_id, game.black_id):
+                played[player_id] += 1
+                last_game[player_id] = game.game_id
+
+        User.objects.bulk_update(list(players.values()), [*engine.update_fields, "wins", "losses", "draws"])
+        RatingHistory.objects.bulk_create(
+            RatingHistory(
+                user_id=player_id,
+                engine=engine.name,
+                rating=player.rating,
+                previous_rating=previous[player_id],
+                rating_deviation=player.rating_deviation if "rating_deviation" in engine.update_fields else None,
+                games=played[player_id],
+                last_game_id=last_game[player_id],
+            )
+            for player_id, player in players.items()
+        )
+        processed = [game.game_id for game in games]
+        Game.objects.filter(id__in=processed).update(elo_processed=True)
+        ratings = {player_id: player.rating for player_id, player in players.items()}
+        transaction.on_commit(partial(leaderboard.update_ratings, ratings))
+    return BatchResult(game_ids=processed, user_ids=list(players))
+
+
+def period_boundary(moment: datetime, period: int) -> datetime:
+    """Start of the ``period``-second rating period containing ``moment``, aligned to the epoch."""
+    seconds = int(moment.timestamp()) // period * period
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def close_rating_periods(now: datetime | None = None, engine: RatingEngine | None = None) -> list[BatchResult]:
+    """Rate every rating period that has ended since the last one closed.
+
+    Each period is one transaction: all unrated games that ended before its
+    end are rated together, as one Glicko-2 rating period, and every other
+    player is passed to the engine's ``rest``. Periods missed while no
+    worker ran are closed one by one so idle players age once per period;
+    the first run closes only the latest period. Returns one result per
+    period closed.
+    """
+    engine = engine or get_rating_engine()
+    if not rating_periods_enabled(engine):
+        return []
+    period = getattr(settings, "RATING_PERIOD", 0)
+    latest = period_boundary(now or timezone.now(), period)
+    last = RatingPeriod.objects.order_by("-end").values_list("end", flat=True).first()
+    ends = [latest]
+    if last is not None:
+        ends = []
+        end = last + timedelta(seconds=period)
+        while end <= latest:
+            ends.append(end)
+            end += timedelta(seconds=period)
+    results = []
+    for end in ends:
+        with transaction.atomic():
+            closed, created = RatingPeriod.objects.get_or_create(end=end)
+            if not created:
+                continue
+            result = apply_pending_results(limit=None, engine=engine, ended_before=end)
+            engine.rest(User.objects.exclude(id__in=result.user_ids))
+            closed.games = len(result.game_ids)
+            closed.save(update_fields=["games"])
+        results.append(result)
+    return results
@@ -0,0 +1,100 @@
+"""A minimal UCI engine for development and tests.
+
+It speaks enough UCI for ``chess.engine`` and scores positions by material
+after a one-ply search, so game analysis can run where Stockfish is not
+installed. Start it with ``python uci_stub.py`` (``ANALYSIS_ENGINE_COMMAND =
+"stub"``); only ``chess`` is imported.
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import TextIO
+
+import chess
+
+NAME = "ShamChess stub"
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 300,
+    chess.BISHOP: 320,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0,
+}
+
+
+def material(board: chess.Board) -> int:
+    """Material balance from the side to move's point of view."""
+    balance = 0
+    for piece_type, value in PIECE_VALUES.items():
+        balance += value * (
+            len(board.pieces(piece_type, board.turn)) - len(board.pieces(piece_type, not board.turn))
+        )
+    return balance
+
+
+def search(board: chess.Board) -> tuple[chess.Move | None, str, int]:
+    """Best move, UCI score and node count of a one-ply material search."""
+    if board.is_checkmate():
+        return None, "mate 0", 0
+    best: chess.Move | None = None
+    best_score = -(1 << 30)
+    nodes = 0
+    for move in board.legal_moves:
+        nodes += 1
+        board.push(move)
+        if board.is_checkmate():
+            board.pop()
+            return move, "mate 1", nodes
+        score = 0 if board.is_stalemate() or board.is_insufficient_material() else -material(board)
+        board.pop()
+        if score > best_score:
+            best, best_score = move, score
+    return best, f"cp {best_score if best is not None else 0}", nodes
+
+
+def set_position(tokens: list[str]) -> chess.Board:
+    if tokens[:1] == ["startpos"]:
+        board, rest = chess.Board(), tokens[1:]
+    else:
+        end = tokens.index("moves") if "moves" in tokens else len(tokens)
+        board, rest = chess.Board(" ".join(tokens[1:end])), tokens[end:]
+    for uci in rest[1:]:
+        board.push_uci(uci)
+    return board
+
+
+def run(stdin: TextIO = sys.stdin, stdout: TextIO = sys.stdout) -> None:
+    board = chess.Board()
+
+    def send(line: str) -> None:
+        stdout.write(line + "\n")
+        stdout.flush()
+
+    for line in stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == "uci":
+            send(f"id name {NAME}")
+            send("id author ShamChess")
+            send("uciok")
+        elif command == "isready":
+            send("readyok")
+        elif command == "ucinewgame":
+            board = chess.Board()
+        elif command == "position":
+            board = set_position(tokens[1:])
+        elif command == "go":
+            move, score, nodes = search(board)
+            pv = f" pv {move.uci()}" if move else ""
+            send(f"info depth 1 seldepth 1 nodes {nodes} score {score}{pv}")
+            send(f"bestmove {move.uci() if move else '(none)'}")
+        elif command == "quit":
+            break
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Game, MatchmakingTicket
+from .services import leaderboard, lobby
+from .services.engine_pool import analysis_enabled
+
+
+@receiver(post_init, sender=Game)
+def remember_game_status(sender, instance: Game, **kwargs) -> None:
+    # Read through __dict__ so deferred ``status`` fields are not fetched.
+    instance._lobby_status = instance.__dict__.get("status")
+
+
+@receiver(post_save, sender=Game)
+def track_game_status(sender, instance: Game, created: bool, **kwargs) -> None:
+    previous = None if created else instance._lobby_status
+    if created or previous != instance.status:
+        lobby.record_game_status(instance, previous, created=created)
+        if not created and instance.status == Game.Status.FINISHED:
+            from .tasks import schedule_game_analysis, schedule_position_indexing  # noqa: WPS433 - tasks import the services
+
+            transaction.on_commit(schedule_position_indexing)
+            if analysis_enabled() and getattr(settings, "ANALYSIS_ON_FINISH", True):
+                transaction.on_commit(partial(schedule_game_analysis, instance.id))
+    instance._lobby_status = instance.status
+
+
+@receiver(post_delete, sender=Game)
+def track_game_removed(sender, instance: Game, **kwargs) -> None:
+    lobby.record_game_removed(instance.id, instance._lobby_status)
+
+
+@receiver(post_save, sender=MatchmakingTicket)
+def track_ticket_created(sender, instance: MatchmakingTicket, created: bool, **kwargs) -> None:
+    if created:
+        lobby.record_queue_change(1)
+
+
+@receiver(post_delete, sender=MatchmakingTicket)
+def track_ticket_removed(sender, instance: MatchmakingTicket, **kwargs) -> None:
+    lobby.record_queue_change(-1)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def track_player_rating(sender, instance, created: bool, **kwargs) -> None:
+    # Rating batches update the leaderboard themselves; only new players are added here.
+    if created and instance.is_active:
+        transaction.on_commit(partial(leaderboard.update_ratings, {instance.id: instance.rating}))
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def track_player_removed(sender, instance, **kwargs) -> None:
+    transaction.on_commit(partial(leaderboard.remove_user, instance.id))
@@ -1,71 +1,237 @@
 from __future__ import annotations
 
+from datetime import timedelta
+
 from celery import shared_task
-from django.db import transaction
+from celery.signals import worker_process_shutdown, worker_shutdown
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.utils import timezone
 
-from .models import Game, MatchmakingTicket
-from .services.elo import apply_game_result
-from .utils.broadcast import broadcast_lobby_state, broadcast_match_found, broadcast_matchmaking_queue
+from .models import Game, MatchmakingTicket, PgnImport, time_control_from_key
+from .services import leaderboard, lobby
+from .services.analysis import claim_analyses, request_analysis, run_analysis
+from .services.engine_pool import analysis_enabled, close_engine_pool
+from .services.events import prune_published_events, publish_pending_events
+from .services.explorer import index_pending_games
+from .services.game_state import invalidate_game_state, invalidate_game_states
+from .services.matchmaking import find_pairings, queue_entries
+from .services.pgn_import import run_import
+from .services.ratings import apply_pending_results, close_rating_periods, rating_periods_enabled
+from .utils.broadcast import broadcast_lobby_state, broadcast_matches_found, broadcast_matchmaking_queue
 
 
 @shared_task(name="games.tasks.process_matchmaking_queue")
 def process_matchmaking_queue() -> list[int]:
     now = timezone.now()
-    MatchmakingTicket.objects.filter(expires_at__lte=now).delete()
-
-    tickets = list(
-        MatchmakingTicket.objects.select_related("user").filter(expires_at__gt=now).order_by("created_at")
-    )
-    matched_ids: set[int] = set()
-    created_games: list[int] = []
-
-    for idx, ticket in enumerate(tickets):
-        if ticket.id in matched_ids:
-            continue
-        for other in tickets[idx + 1 :]:
-            if other.id in matched_ids:
-                continue
-            if ticket.time_control != other.time_control:
-                continue
-            if not _within_rating_range(ticket, other):
-                continue
-            with transaction.atomic():
-                game = Game.objects.create(
-                    white_player=ticket.user,
-                    black_player=other.user,
-                    time_control=ticket.time_control,
+    _delete_tickets("expires_at <= %s", [connection.ops.adapt_datetimefield_value(now)])
+
+    with transaction.atomic():
+        # Tickets being paired by ``match_ticket`` are locked and skipped here,
+        # and the ones read here are locked until they are deleted, so a ticket
+        # can never end up in two games.
+        waiting = MatchmakingTicket.objects.select_for_update(skip_locked=True, of=("self",)).filter(expires_at__gt=now)
+        pairings = find_pairings(queue_entries(waiting, now=now))
+        if not pairings:
+            return []
+        games = Game.objects.bulk_create(
+            [
+                Game(
+                    white_player_id=pairing.white.user_id,
+                    black_player_id=pairing.black.user_id,
+                    time_control=time_control_from_key(pairing.white.time_control),
                 )
-                ticket_id = ticket.id
-                other_id = other.id
-                game_id = game.id
-                ticket.delete()
-                other.delete()
-                matched_ids.update({ticket_id, other_id})
-                created_games.append(game_id)
-                transaction.on_commit(lambda gid=game_id: broadcast_match_found(gid))
-            break
+                for pairing in pairings
+            ]
+        )
+        ticket_ids = [ticket_id for pairing in pairings for ticket_id in (pairing.white.ticket_id, pairing.black.ticket_id)]
+        _delete_tickets(f"id IN ({', '.join(['%s'] * len(ticket_ids))})", ticket_ids)
+        # bulk_create bypasses the model signals that keep the lobby counters.
+        lobby.record_games_created(games)
+        created_games = [game.id for game in games]
+        transaction.on_commit(lambda: broadcast_matches_found(created_games))
 
-    if matched_ids:
-        broadcast_matchmaking_queue()
-        broadcast_lobby_state()
+    broadcast_matchmaking_queue()
+    broadcast_lobby_state()
     return created_games
 
 
+def _delete_tickets(condition: str, params: list) -> int:
+    """Delete the tickets matching the SQL ``condition`` with one statement.
+
+    ``QuerySet.delete()`` would load every row to send the ``post_delete``
+    signal that keeps the queue counter; here the counter moves once, and
+    only if the DELETE commits (nothing references tickets, so there is
+    nothing to cascade).
+    """
+    table = connection.ops.quote_name(MatchmakingTicket._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {condition}", params)  # noqa: S608 - fixed conditions
+        removed = cursor.rowcount
+        lobby.record_queue_change(-removed)
+    return removed
+
+
 @shared_task(name="games.tasks.update_game_elo")
 def update_game_elo(game_id: int) -> None:
-    try:
-        game = Game.objects.select_related("white_player", "black_player").get(pk=game_id)
-    except Game.DoesNotExist:
+    if not apply_pending_results(game_ids=[game_id]).game_ids:
         return
-    apply_game_result(game)
+    # The cached REST body embeds the players' ratings.
+    invalidate_game_state(game_id)
     broadcast_lobby_state()
 
 
-def _within_rating_range(ticket_a: MatchmakingTicket, ticket_b: MatchmakingTicket) -> bool:
-    rating_a = ticket_a.user.rating
-    rating_b = ticket_b.user.rating
-    return (
-        ticket_a.rating_min <= rating_b <= ticket_a.rating_max
-        and ticket_b.rating_min <= rating_a <= ticket_b.rating_max
-    )
+RATING_BATCH_SCHEDULED_KEY = "elo:batch_scheduled"
+
+
+def schedule_rating_update(game_id: int) -> None:
+    """Queue rating updates for a game that just finished.
+
+    With ``ELO_BATCH_DELAY`` > 0 games ending close together share one
+    ``apply_pending_ratings`` run, scheduled by the first of them; otherwise
+    each game gets its own ``update_game_elo`` task. Engines rating whole
+    periods wait for ``close_rating_period`` instead.
+    """
+    if rating_periods_enabled():
+        return
+    delay = getattr(settings, "ELO_BATCH_DELAY", 2.0)
+    if delay <= 0:
+        update_game_elo.delay(game_id)
+    elif cache.add(RATING_BATCH_SCHEDULED_KEY, True, timeout=int(delay) + 60):
+        apply_pending_ratings.apply_async(countdown=delay)
+
+
+@shared_task(name="games.tasks.apply_pending_ratings")
+def apply_pending_ratings() -> int:
+    # Games finishing from here on schedule the next batch.
+    cache.delete(RATING_BATCH_SCHEDULED_KEY)
+    if rating_periods_enabled():
+        return 0
+    batch_size = getattr(settings, "ELO_BATCH_SIZE", 1000)
+    rated = 0
+    while True:
+        result = apply_pending_results(batch_size)
+        rated += len(result.game_ids)
+        invalidate_game_states(result.game_ids)
+        if len(result.game_ids) < batch_size:
+            break
+    if rated:
+        broadcast_lobby_state()
+    return rated
+
+
+@shared_task(name="games.tasks.close_rating_period")
+def close_rating_period() -> int:
+    """Rate the rating periods that have ended; a no-op for per-batch engines."""
+    results = close_rating_periods()
+    game_ids = [game_id for result in results for game_id in result.game_ids]
+    invalidate_game_states(game_ids)
+    if game_ids:
+        broadcast_lobby_state()
+    return len(game_ids)
+
+
+POSITION_INDEX_SCHEDULED_KEY = "positions:batch_scheduled"
+
+
+def schedule_position_indexing() -> None:
+    """Queue a position-index batch shortly after a game finishes.
+
+    Games finishing within ``POSITION_INDEX_DELAY`` seconds of each other
+    share one ``index_game_positions`` run; the periodic run catches anything
+    missed.
+    """
+    delay = getattr(settings, "POSITION_INDEX_DELAY", 10.0)
+    if cache.add(POSITION_INDEX_SCHEDULED_KEY, True, timeout=int(delay) + 60):
+        index_game_positions.apply_async(countdown=delay)
+
+
+@shared_task(name="games.tasks.index_game_positions")
+def index_game_positions() -> int:
+    cache.delete(POSITION_INDEX_SCHEDULED_KEY)
+    batch_size = getattr(settings, "POSITION_INDEX_BATCH", 1000)
+    indexed = 0
+    while True:
+        count = len(index_pending_games(batch_size))
+        indexed += count
+        if count < batch_size:
+            break
+    return indexed
+
+
+ANALYSIS_DISPATCH_SCHEDULED_KEY = "analysis:dispatch_scheduled"
+
+
+def schedule_game_analysis(game_id: int) -> None:
+    """Add a finished game to the analysis backlog and fill any free task slots."""
+    if request_analysis([game_id]):
+        schedule_analysis_dispatch()
+
+
+def schedule_analysis_dispatch() -> None:
+    # One dispatch at a time; slots freed while it runs are filled by the
+    # next analysis to finish or by the periodic run.
+    if cache.add(ANALYSIS_DISPATCH_SCHEDULED_KEY, True, timeout=60):
+        dispatch_game_analyses.delay()
+
+
+@shared_task(name="games.tasks.dispatch_game_analyses")
+def dispatch_game_analyses() -> int:
+    """Send pending analyses to workers, at most ``ANALYSIS_QUEUE_LIMIT`` in flight."""
+    try:
+        if not analysis_enabled():
+            return 0
+        game_ids = claim_analyses(getattr(settings, "ANALYSIS_QUEUE_LIMIT", 16))
+        for game_id in game_ids:
+            analyse_game.delay(game_id)
+    finally:
+        cache.delete(ANALYSIS_DISPATCH_SCHEDULED_KEY)
+    return len(game_ids)
+
+
+@shared_task(name="games.tasks.analyse_game")
+def analyse_game(game_id: int) -> dict | None:
+    try:
+        analysis = run_analysis(game_id)
+    finally:
+        schedule_analysis_dispatch()
+    if analysis is None:
+        return None
+    return {"game": game_id, "positions": analysis.positions, "cached_positions": analysis.cached_positions}
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def stop_analysis_engines(**kwargs) -> None:
+    close_engine_pool()
+
+
+@shared_task(name="games.tasks.import_pgn_file")
+def import_pgn_file(import_id: int) -> dict:
+    pgn_import = PgnImport.objects.get(pk=import_id)
+    return run_import(pgn_import, workers=getattr(settings, "PGN_IMPORT_WORKERS", 0)).as_dict()
+
+
+@shared_task(name="games.tasks.reconcile_lobby_stats")
+def reconcile_lobby_stats() -> dict:
+    return lobby.reconcile_lobby_stats()
+
+
+@shared_task(name="games.tasks.rebuild_leaderboard")
+def rebuild_leaderboard() -> int | None:
+    return leaderboard.rebuild()
+
+
+@shared_task(name="games.tasks.relay_game_events")
+def relay_game_events() -> int:
+    """Publish outbox events the in-process relay missed and prune old ones."""
+    batch_size = getattr(settings, "GAME_EVENT_RELAY_BATCH", 500)
+    published = 0
+    while True:
+        count = publish_pending_events(batch_size)
+        published += count
+        if count < batch_size:
+            break
+    prune_published_events(timedelta(seconds=getattr(settings, "GAME_EVENT_RETENTION", 3600)))
+    return published
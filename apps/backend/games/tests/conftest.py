@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import itertools
+
+import pytest
+from django.contrib.auth import get_user_model
+
+
+@pytest.fixture
+def make_player(db):
+    numbers = itertools.count(1)
+
+    def make(**fields):
+        return get_user_model().objects.create(username=f"player{next(numbers)}", **fields)
+
+    return make
+
+
+@pytest.fixture
+def shared_cache(settings, tmp_path):
+    """A cache every process could see, for code that skips per-process caches."""
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": str(tmp_path)}
+    }
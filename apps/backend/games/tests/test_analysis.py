@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import pytest
+
+from games.models import Game, GameAnalysis, PositionEvaluation
+from games.services import move_codec
+from games.services.analysis import request_analysis, run_analysis
+from games.services.engine_pool import STUB_ENGINE, EnginePool, engine_command
+
+pytestmark = pytest.mark.django_db
+
+SCHOLARS_MATE = ["e2e4", "e7e5", "d1h5", "b8c6", "f1c4", "g8f6", "h5f7"]
+
+
+@pytest.fixture
+def stub_pool():
+    pool = EnginePool(engine_command(STUB_ENGINE), timeout=10.0)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def scholars_mate(make_player):
+    return Game.objects.create(
+        white_player=make_player(),
+        black_player=make_player(),
+        status=Game.Status.FINISHED,
+        winner=Game.Winner.WHITE,
+        packed_moves=move_codec.pack_moves(SCHOLARS_MATE),
+    )
+
+
+def test_finished_game_is_annotated_with_the_stub_engine(scholars_mate, stub_pool):
+    assert request_analysis([scholars_mate.id]) == [scholars_mate.id]
+
+    analysis = run_analysis(scholars_mate.id, depth=1, pool=stub_pool)
+
+    assert analysis.status == GameAnalysis.Status.DONE
+    assert [move["uci"] for move in analysis.moves] == SCHOLARS_MATE
+    assert analysis.moves[-1]["san"] == "Qxf7#"
+    # ...Nf6 lets White mate in one, which the stub's one-ply search sees.
+    assert analysis.moves[5]["judgement"] == "blunder"
+    assert analysis.black_blunders >= 1
+    assert analysis.white_accuracy is not None and analysis.black_accuracy is not None
+    # The mated position is scored without the engine.
+    assert analysis.positions == len(SCHOLARS_MATE)
+    assert PositionEvaluation.objects.count() == len(SCHOLARS_MATE)
+    assert stub_pool.started == 1
+
+
+def test_positions_are_served_from_the_evaluation_cache(scholars_mate, stub_pool):
+    request_analysis([scholars_mate.id])
+    first = run_analysis(scholars_mate.id, depth=1, pool=stub_pool)
+    request_analysis([scholars_mate.id], force=True)
+
+    second = run_analysis(scholars_mate.id, depth=1, pool=stub_pool)
+
+    assert first.cached_positions == 0
+    assert second.cached_positions == second.positions == first.positions
+    assert second.moves == first.moves
+
+
+def test_games_never_requested_are_not_analysed(scholars_mate, stub_pool):
+    assert run_analysis(scholars_mate.id, depth=1, pool=stub_pool) is None
+    assert stub_pool.started == 0
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import pytest
+
+from games.models import Game
+from games.services.board_registry import LiveBoardRegistry, get_live_board_registry
+from games.services.gameplay import apply_player_move
+
+pytestmark = pytest.mark.django_db
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def game(make_player):
+    return Game.objects.create(white_player=make_player(), black_player=make_player())
+
+
+@pytest.fixture
+def registry():
+    registry = get_live_board_registry()
+    registry.clear()
+    yield registry
+    registry.clear()
+
+
+def play(game: Game, *ucis: str) -> None:
+    for index, uci in enumerate(ucis):
+        current = Game.objects.select_related("white_player", "black_player").get(pk=game.pk)
+        apply_player_move(current, current.white_player if index % 2 == 0 else current.black_player, uci)
+
+
+def test_moves_reuse_the_cached_board(game, registry):
+    play(game, "e2e4", "e7e5", "g1f3", "b8c6")
+
+    stats = registry.stats()
+    assert (stats.misses, stats.hits) == (1, 3)
+    game.refresh_from_db()
+    assert registry.get(game).board.fen() == game.fen
+
+
+def test_board_moved_on_elsewhere_is_rebuilt_from_the_stored_moves(game, registry):
+    play(game, "e2e4", "e7e5")
+    stale = registry.get(Game.objects.get(pk=game.pk))
+    stale.board.pop()
+
+    game.refresh_from_db()
+    rebuilt = registry.get(game)
+
+    assert rebuilt is not stale
+    assert rebuilt.board.fen() == game.fen
+    assert [move.uci() for move in rebuilt.board.move_stack] == ["e2e4", "e7e5"]
+
+
+def test_finished_games_leave_the_registry(game, registry):
+    play(game, "f2f3", "e7e5", "g2g4", "d8h4")
+
+    game.refresh_from_db()
+    assert game.status == Game.Status.FINISHED
+    assert registry.stats().size == 0
+
+
+def test_least_recently_used_and_expired_boards_are_evicted(make_player):
+    clock = FakeClock()
+    registry = LiveBoardRegistry(max_entries=2, ttl=60, clock=clock)
+    games = [Game.objects.create(white_player=make_player(), black_player=make_player()) for _ in range(3)]
+
+    registry.get(games[0])
+    registry.get(games[1])
+    registry.get(games[0])
+    registry.get(games[2])
+    assert registry.stats().evictions == 1
+    registry.get(games[0])
+    assert registry.stats().hits == 2
+
+    clock.now = 61
+    registry.get(games[0])
+    assert registry.stats().misses == 4
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from games.models import Game
+from games.services.clock import FlagScheduler, expire_game
+
+BARE_KINGS_AND_QUEEN = "8/8/8/8/8/8/k7/K6Q w - - 0 1"
+
+
+def live_game(make_player, elapsed: timedelta, fen: str | None = None) -> Game:
+    fields = {"initial_fen": fen, "fen": fen} if fen else {}
+    return Game.objects.create(
+        white_player=make_player(),
+        black_player=make_player(),
+        status=Game.Status.LIVE,
+        time_control={"base": 60, "increment": 0},
+        white_time_ms=60_000,
+        black_time_ms=60_000,
+        last_move_at=timezone.now() - elapsed,
+        **fields,
+    )
+
+
+@pytest.mark.django_db
+def test_expired_clock_loses_the_game(make_player):
+    game = live_game(make_player, timedelta(seconds=61))
+
+    assert expire_game(game.id) is None
+
+    game.refresh_from_db()
+    assert (game.status, game.winner, game.white_time_ms) == (Game.Status.FINISHED, Game.Winner.BLACK, 0)
+    assert game.pgn.endswith("0-1")
+
+
+@pytest.mark.django_db
+def test_running_clock_is_rescheduled(make_player):
+    game = live_game(make_player, timedelta(seconds=10))
+
+    deadline = expire_game(game.id)
+
+    assert deadline == pytest.approx((game.last_move_at + timedelta(seconds=60)).timestamp())
+    game.refresh_from_db()
+    assert game.status == Game.Status.LIVE
+
+
+@pytest.mark.django_db
+def test_flag_against_a_lone_king_is_a_draw(make_player):
+    game = live_game(make_player, timedelta(seconds=61), fen=BARE_KINGS_AND_QUEEN)
+
+    expire_game(game.id)
+
+    game.refresh_from_db()
+    assert game.winner == Game.Winner.DRAW
+
+
+@pytest.mark.django_db
+def test_late_move_is_rejected_and_the_loss_kept(make_player):
+    game = live_game(make_player, timedelta(seconds=61))
+    client = APIClient()
+    client.force_authenticate(game.white_player)
+
+    response = client.post(f"/api/games/{game.id}/move/", {"uci": "e2e4"}, format="json")
+
+    assert response.status_code == 400
+    game.refresh_from_db()
+    assert (game.status, game.winner, game.moves_count) == (Game.Status.FINISHED, Game.Winner.BLACK, 0)
+
+
+def test_scheduler_pops_only_the_latest_deadline_of_each_game():
+    scheduler = FlagScheduler()
+    scheduler.schedule(1, 10.0)
+    scheduler.schedule(2, 5.0)
+    scheduler.schedule(1, 20.0)
+    scheduler.cancel(2)
+
+    assert scheduler.pop_due(15.0) == []
+    assert scheduler.next_deadline() == 20.0
+    assert scheduler.pop_due(20.0) == [1]
+    assert len(scheduler) == 0
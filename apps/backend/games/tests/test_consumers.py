@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import json
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.utils import timezone
+
+from games.models import Game, GameEvent
+from games.routing import websocket_urlpatterns
+from games.services.clock import expire_game
+from games.services.gameplay import submit_move
+from games.utils.broadcast import encoded_event
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def game(make_player):
+    return Game.objects.create(white_player=make_player(), black_player=make_player(), status=Game.Status.LIVE)
+
+
+async def connect(game: Game, query: str = "", user=None) -> WebsocketCommunicator:
+    communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/game/{game.id}/?{query}")
+    if user is not None:
+        communicator.scope["user"] = user
+    connected, _ = await communicator.connect()
+    assert connected
+    return communicator
+
+
+async def receive(communicator: WebsocketCommunicator) -> dict:
+    return json.loads(await communicator.receive_from())
+
+
+def test_snapshot_carries_the_event_seq_and_moves_follow_live(game):
+    submit_move(game.id, game.white_player_id, "e2e4")
+
+    async def scenario():
+        communicator = await connect(game, user=game.black_player)
+        snapshot = await receive(communicator)
+        await communicator.send_json_to({"type": "move", "uci": "e7e5"})
+        applied = await receive(communicator)
+        await communicator.disconnect()
+        return snapshot, applied
+
+    snapshot, applied = async_to_sync(scenario)()
+    assert (snapshot["type"], snapshot["state"]["game"]["seq"]) == ("game_state", 1)
+    assert (applied["type"], applied["seq"], applied["move"]["ply"]) == ("move_applied", 2, 2)
+
+
+def test_resume_replays_the_missed_events(game):
+    for player_id, uci in [(game.white_player_id, "e2e4"), (game.black_player_id, "e7e5"), (game.white_player_id, "g1f3")]:
+        submit_move(game.id, player_id, uci)
+
+    async def scenario():
+        communicator = await connect(game, "resume_from=1")
+        frames = [await receive(communicator) for _ in range(3)]
+        await communicator.disconnect()
+        return frames
+
+    resumed, *events = async_to_sync(scenario)()
+    assert resumed == {"type": "resumed", "seq": 1, "events": 2}
+    assert [(event["seq"], event["move"]["uci"]) for event in events] == [(2, "e7e5"), (3, "g1f3")]
+
+
+def test_events_the_socket_already_has_are_dropped(game, settings):
+    settings.SPECTATOR_FANOUT = False
+    submit_move(game.id, game.white_player_id, "e2e4")
+    layer = get_channel_layer()
+
+    def event(seq: int) -> dict:
+        return {**encoded_event("game.broadcast", {"type": "ping", "seq": seq}), "seq": seq}
+
+    async def scenario():
+        communicator = await connect(game)
+        await receive(communicator)
+        await layer.group_send(f"game_{game.id}", event(1))
+        await layer.group_send(f"game_{game.id}", event(2))
+        await layer.group_send(f"game_{game.id}", event(2))
+        frames = [await receive(communicator)]
+        assert await communicator.receive_nothing()
+        await communicator.disconnect()
+        return frames
+
+    assert async_to_sync(scenario)() == [{"type": "ping", "seq": 2}]
+
+
+def test_loss_on_time_takes_the_next_event_seq(make_player):
+    game = Game.objects.create(
+        white_player=make_player(),
+        black_player=make_player(),
+        status=Game.Status.LIVE,
+        time_control={"base": 60, "increment": 0},
+    )
+    submit_move(game.id, game.white_player_id, "e2e4")
+    Game.objects.filter(pk=game.pk).update(last_move_at=timezone.now() - timedelta(seconds=61))
+
+    expire_game(game.id)
+
+    events = GameEvent.objects.filter(game=game).order_by("seq").values_list("seq", "event_type")
+    assert list(events) == [(1, "move_applied"), (2, "game_over")]
+    assert Game.objects.get(pk=game.pk).event_seq == 2
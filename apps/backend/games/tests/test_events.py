@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import pytest
+from django.core.cache import cache
+
+from games.models import Game, GameEvent
+from games.services import events
+from games.services.gameplay import submit_move
+from games.utils import fastjson
+
+pytestmark = pytest.mark.django_db
+
+
+class RecordingLayer:
+    """Channel layer that records the seq of every frame and can fail on cue."""
+
+    def __init__(self) -> None:
+        self.sent: list[tuple[str, int]] = []
+        self.fail_on: set[tuple[str, int]] = set()
+
+    async def group_send(self, group: str, message: dict) -> None:
+        seq = fastjson.loads(message["text"])["seq"]
+        if (group, seq) in self.fail_on:
+            self.fail_on.discard((group, seq))
+            raise ConnectionError("channel layer unavailable")
+        self.sent.append((group, seq))
+
+
+@pytest.fixture
+def layer(monkeypatch):
+    layer = RecordingLayer()
+    monkeypatch.setattr(events, "get_channel_layer", lambda: layer)
+    return layer
+
+
+@pytest.fixture
+def game(make_player):
+    return Game.objects.create(white_player=make_player(), black_player=make_player())
+
+
+def add_events(game: Game, count: int) -> None:
+    for seq in range(1, count + 1):
+        GameEvent.objects.create(game=game, seq=seq, event_type="move_applied", payload={})
+
+
+def sent_seqs(layer: RecordingLayer, game: Game) -> list[int]:
+    return [seq for group, seq in layer.sent if group == f"game_{game.id}"]
+
+
+def test_failed_send_holds_back_the_rest_of_the_game(layer, game):
+    add_events(game, 3)
+    layer.fail_on.add((f"game_{game.id}", 2))
+
+    assert events.publish_pending_events() == 1
+    assert events.publish_pending_events() == 2
+    assert sent_seqs(layer, game) == [1, 2, 3]
+    assert not GameEvent.objects.filter(published_at__isnull=True).exists()
+
+
+def test_game_held_by_another_relay_is_left_to_it(layer, game, make_player):
+    other = Game.objects.create(white_player=make_player(), black_player=make_player())
+    add_events(game, 3)
+    add_events(other, 1)
+    lock_key = events.RELAY_LOCK_KEY.format(game.id)
+    cache.add(lock_key, "another relay")
+
+    assert events.publish_pending_events() == 1
+    assert sent_seqs(layer, game) == []
+
+    cache.delete(lock_key)
+    assert events.publish_pending_events(limit=2) == 2
+    assert events.publish_pending_events() == 1
+    assert sent_seqs(layer, game) == [1, 2, 3]
+    assert sent_seqs(layer, other) == [1]
+
+
+def test_moves_are_relayed_in_ply_order_without_pgn(layer, game, django_capture_on_commit_callbacks):
+    for player, uci in [(game.white_player, "e2e4"), (game.black_player, "e7e5"), (game.white_player, "g1f3")]:
+        with django_capture_on_commit_callbacks(execute=True):
+            submit_move(game.id, player.id, uci)
+
+    assert sent_seqs(layer, game) == [1, 2, 3]
+    payloads = GameEvent.objects.filter(game=game).order_by("seq").values_list("payload", flat=True)
+    assert all("pgn" not in payload["game"] for payload in payloads)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+from rest_framework.test import APIClient
+
+from games.models import Game
+from games.services.game_state import build_game_state, get_game_state
+from games.services.gameplay import submit_move
+from games.services.move_codec import stored_moves
+
+
+@pytest.fixture
+def game(make_player):
+    return Game.objects.create(white_player=make_player(), black_player=make_player(), status=Game.Status.LIVE)
+
+
+@pytest.fixture
+def client(game):
+    client = APIClient()
+    client.force_authenticate(game.white_player)
+    return client
+
+
+def fetch(client, game, if_none_match=None):
+    headers = {"HTTP_IF_NONE_MATCH": if_none_match} if if_none_match is not None else {}
+    return client.get(f"/api/games/{game.id}/", **headers)
+
+
+@pytest.mark.django_db
+def test_cached_state_costs_one_lookup(game, shared_cache, django_assert_num_queries):
+    first = get_game_state(game.id)
+
+    with django_assert_num_queries(1):
+        assert get_game_state(game.id) == first
+
+
+@pytest.mark.django_db
+def test_moves_are_appended_to_the_cached_state(game, shared_cache, django_capture_on_commit_callbacks):
+    get_game_state(game.id)
+    with django_capture_on_commit_callbacks(execute=True):
+        submit_move(game.id, game.white_player_id, "e2e4")
+        submit_move(game.id, game.black_player_id, "e7e5")
+
+    cached = get_game_state(game.id)
+    fresh = Game.objects.select_related("white_player", "black_player").get(pk=game.id)
+    assert cached.plies == 2
+    assert cached == build_game_state(fresh, *stored_moves(fresh))
+
+
+@pytest.mark.django_db
+def test_rating_change_is_a_new_version(game, shared_cache):
+    before = get_game_state(game.id)
+    type(game.white_player).objects.filter(pk=game.white_player_id).update(rating=1650)
+
+    after = get_game_state(game.id)
+
+    assert after.etag != before.etag
+    assert json.loads(after.rest)["white_player"]["rating"] == 1650
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("{etag}", 304),
+        ("W/{etag}", 304),
+        ('"stale", {etag}', 304),
+        ("*", 304),
+        ('"{inner}0"', 200),
+        ('"x{inner}"', 200),
+        ("", 200),
+    ],
+)
+def test_if_none_match_compares_whole_tags(game, client, shared_cache, header, expected):
+    etag = fetch(client, game)["ETag"]
+
+    response = fetch(client, game, header.format(etag=etag, inner=etag.strip('"')))
+
+    assert response.status_code == expected
+    assert response["ETag"] == etag
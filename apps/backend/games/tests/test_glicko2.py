@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from games.models import Game, RatingPeriod
+from games.services.glicko2 import SCALE, Glicko2Engine
+from games.services.ratings import RatedGame, close_rating_periods
+from games.tasks import schedule_rating_update
+
+PERIOD_START = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def test_glickman_worked_example():
+    # Section 3 of Glickman's "Example of the Glicko-2 system": a 1500/200
+    # player beats a 1400/30 player and loses to 1550/100 and 1700/300.
+    players = {
+        1: SimpleNamespace(rating=1500, rating_deviation=200.0, rating_volatility=0.06),
+        2: SimpleNamespace(rating=1400, rating_deviation=30.0, rating_volatility=0.06),
+        3: SimpleNamespace(rating=1550, rating_deviation=100.0, rating_volatility=0.06),
+        4: SimpleNamespace(rating=1700, rating_deviation=300.0, rating_volatility=0.06),
+    }
+    games = [RatedGame(1, 1, 2, 1.0, 0.0), RatedGame(2, 1, 3, 0.0, 1.0), RatedGame(3, 1, 4, 0.0, 1.0)]
+
+    Glicko2Engine(tau=0.5).rate(games, players)
+
+    assert players[1].rating == 1464  # 1464.06
+    assert players[1].rating_deviation == pytest.approx(151.52, abs=0.01)
+    assert players[1].rating_volatility == pytest.approx(0.05999, abs=1e-5)
+
+
+@pytest.fixture
+def glicko2_periods(settings):
+    settings.RATING_ENGINE = "glicko2"
+    settings.RATING_PERIOD = 3600
+
+
+def finished_game(white, black, ended_at: datetime) -> Game:
+    return Game.objects.create(
+        white_player=white,
+        black_player=black,
+        status=Game.Status.FINISHED,
+        winner=Game.Winner.WHITE,
+        ended_at=ended_at,
+    )
+
+
+def test_games_wait_for_their_rating_period_to_end(glicko2_periods, make_player):
+    white, black = make_player(), make_player()
+    game = finished_game(white, black, PERIOD_START + timedelta(minutes=10))
+
+    schedule_rating_update(game.id)
+    close_rating_periods(now=PERIOD_START + timedelta(minutes=30))
+    game.refresh_from_db()
+    assert not game.elo_processed
+
+    (result,) = close_rating_periods(now=PERIOD_START + timedelta(hours=1, minutes=5))
+    game.refresh_from_db()
+    assert game.elo_processed
+    assert result.game_ids == [game.id]
+    assert set(result.user_ids) == {white.id, black.id}
+
+
+def test_idle_players_deviation_grows_once_per_missed_period(glicko2_periods, make_player):
+    idle = make_player(rating_deviation=100.0, rating_volatility=0.06)
+    white, black = make_player(), make_player()
+    finished_game(white, black, PERIOD_START + timedelta(minutes=10))
+
+    close_rating_periods(now=PERIOD_START + timedelta(minutes=1))
+    results = close_rating_periods(now=PERIOD_START + timedelta(hours=3, minutes=1))
+
+    assert [len(result.game_ids) for result in results] == [1, 0, 0]
+    assert RatingPeriod.objects.count() == 4
+    idle.refresh_from_db()
+    # One step of phi' = sqrt(phi^2 + sigma^2) for each of the four periods.
+    expected = SCALE * ((100.0 / SCALE) ** 2 + 4 * 0.06**2) ** 0.5
+    assert idle.rating_deviation == pytest.approx(expected)
+    assert close_rating_periods(now=PERIOD_START + timedelta(hours=3, minutes=30)) == []
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from games.models import Game, RatingHistory
+from games.services import leaderboard
+from games.services.ratings import apply_pending_results
+
+RATINGS = [1500, 1600, 1500, 1400, 1600, 1500]
+
+
+@pytest.fixture
+def players(make_player):
+    return [make_player(rating=rating) for rating in RATINGS]
+
+
+def ranking(entries) -> list[tuple[int, int]]:
+    return [(entry.rank, entry.user_id) for entry in entries]
+
+
+@pytest.mark.django_db
+def test_ties_share_a_rank_and_are_listed_by_id(players):
+    ids = [player.id for player in players]
+    expected = [(1, ids[1]), (1, ids[4]), (3, ids[0]), (3, ids[2]), (3, ids[5]), (6, ids[3])]
+
+    assert ranking(leaderboard.top(0, 10)) == expected
+    assert ranking(leaderboard.top(3, 2)) == expected[3:5]
+    assert [leaderboard.rank_of(player) for player in players] == [3, 1, 3, 6, 1, 3]
+
+
+@pytest.mark.django_db
+def test_sorted_set_scores_follow_the_database_order(players):
+    by_score = sorted(players, key=lambda player: leaderboard._score(player.id, player.rating), reverse=True)
+
+    assert [entry.user_id for entry in leaderboard.top(0, 10)] == [player.id for player in by_score]
+    for player in players:
+        assert leaderboard._rating(player.id, float(leaderboard._score(player.id, player.rating))) == player.rating
+
+
+@pytest.mark.django_db
+def test_rated_game_is_recorded_in_the_history(players):
+    white, black = players[:2]
+    game = Game.objects.create(
+        white_player=white,
+        black_player=black,
+        status=Game.Status.FINISHED,
+        winner=Game.Winner.WHITE,
+        ended_at=timezone.now(),
+    )
+    apply_pending_results()
+    client = APIClient()
+    client.force_authenticate(black)
+
+    history = client.get(f"/api/users/{white.id}/rating-history/").json()
+
+    white.refresh_from_db()
+    assert [(row["previous_rating"], row["rating"]) for row in history] == [(1500, white.rating)]
+    assert white.rating > 1500
+    assert RatingHistory.objects.get(user=black).last_game_id == game.id
+
+
+@pytest.mark.skipif(not os.environ.get("LEADERBOARD_TEST_REDIS_URL"), reason="needs a Redis server")
+@pytest.mark.django_db
+def test_redis_pages_match_the_database(players, settings, monkeypatch):
+    settings.LEADERBOARD_REDIS_URL = os.environ["LEADERBOARD_TEST_REDIS_URL"]
+    monkeypatch.setattr(leaderboard, "_redis_client", None)
+    expected = [leaderboard.top(offset, 4) for offset in range(len(players))]
+
+    assert leaderboard.available()
+    assert leaderboard.rebuild() == len(players)
+    try:
+        assert [leaderboard.top(offset, 4) for offset in range(len(players))] == expected
+        assert leaderboard.rank_of(players[3]) == 6
+    finally:
+        leaderboard._client().delete(leaderboard.LEADERBOARD_KEY)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from games.models import Game
+from games.services import lobby
+from games.utils.broadcast import LobbyBroadcastCoalescer
+
+
+def snapshot_matches_database():
+    assert lobby.lobby_snapshot() == lobby._payload(lobby._count())
+
+
+@pytest.mark.django_db
+def test_counters_follow_game_changes(make_player, shared_cache, django_capture_on_commit_callbacks):
+    assert lobby.lobby_snapshot()["waiting_games"] == 0
+    with django_capture_on_commit_callbacks(execute=True):
+        games = [Game.objects.create(white_player=make_player(), black_player=make_player()) for _ in range(3)]
+    with django_capture_on_commit_callbacks(execute=True):
+        games[0].status = Game.Status.LIVE
+        games[0].save(update_fields=["status"])
+        games[1].delete()
+
+    snapshot = lobby.lobby_snapshot()
+    assert (snapshot["active_games"], snapshot["waiting_games"]) == (1, 1)
+    snapshot_matches_database()
+
+
+@pytest.mark.django_db
+def test_recent_games_are_updated_in_place(make_player, shared_cache, django_capture_on_commit_callbacks):
+    players = [make_player(), make_player()]
+    with django_capture_on_commit_callbacks(execute=True):
+        games = [Game.objects.create(white_player=players[0], black_player=players[1]) for _ in range(7)]
+    lobby.lobby_snapshot()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        games.append(Game.objects.create(white_player=players[1], black_player=players[0]))
+        games[-2].delete()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        games[-1].status = Game.Status.LIVE
+        games[-1].save(update_fields=["status"])
+
+    cached = lobby.cache.get(lobby.RECENT_GAMES_KEY)
+    assert [entry["id"] for entry in cached] == [games[-1].id, *[game.id for game in reversed(games[:-2])]]
+    assert cached[0]["status"] == Game.Status.LIVE
+    snapshot_matches_database()
+
+
+@pytest.mark.django_db
+def test_per_process_cache_counts_from_the_database(make_player, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        Game.objects.create(white_player=make_player(), black_player=make_player())
+
+    assert lobby.lobby_snapshot()["waiting_games"] == 1
+    assert lobby.cache.get(lobby.WAITING_GAMES_KEY) is None
+
+
+def test_coalescer_sends_deltas_against_the_last_frame(shared_cache):
+    snapshot = {"active_games": 1, "waiting_games": 2, "queue_count": 0, "recent_games": [{"id": 1}]}
+    first, second = LobbyBroadcastCoalescer(0), LobbyBroadcastCoalescer(0)
+
+    assert first._next_payload(snapshot) == {**snapshot, "seq": 1}
+    assert second._next_payload(snapshot) is None
+    assert second._next_payload({**snapshot, "queue_count": 3}) == {"type": "lobby_delta", "queue_count": 3, "seq": 2}
+    moved = {**snapshot, "queue_count": 3, "recent_games": [{"id": 2}, {"id": 1}]}
+    assert first._next_payload(moved) == {**moved, "seq": 3}
+
+
+def test_coalescer_without_a_shared_cache_sends_every_snapshot():
+    snapshot = {"active_games": 0, "waiting_games": 0, "queue_count": 0, "recent_games": []}
+    coalescer = LobbyBroadcastCoalescer(0)
+
+    assert coalescer._next_payload(snapshot) == snapshot
+    assert coalescer._next_payload(snapshot) == snapshot
+
+
+def test_requests_within_an_interval_share_one_send(monkeypatch):
+    sent = []
+    coalescer = LobbyBroadcastCoalescer(0.05)
+    monkeypatch.setattr(LobbyBroadcastCoalescer, "flush", lambda self, run=None: sent.append(self._timer))
+    coalescer._last_emit = time.monotonic()
+
+    for _ in range(5):
+        coalescer.request()
+    timer = coalescer._timer
+    timer.join()
+
+    assert sent == [timer]
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.db import connection, transaction
+from django.utils import timezone as django_timezone
+
+from games.models import Game, MatchmakingTicket
+from games.services import lobby
+from games.services.matchmaking import QueueEntry, find_pairings, match_ticket
+from games.tasks import process_matchmaking_queue
+
+START = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+BLITZ = "300+0"
+
+
+def entry(ticket_id: int, rating: int, waited: timedelta, spread: int = 200, time_control=BLITZ) -> QueueEntry:
+    return QueueEntry(
+        ticket_id=ticket_id,
+        user_id=ticket_id,
+        rating=rating,
+        rating_min=rating - spread,
+        rating_max=rating + spread,
+        time_control=time_control,
+        created_at=START + waited,
+    )
+
+
+def pairwise(entries: list[QueueEntry]) -> list[tuple[int, int]]:
+    """The original quadratic pass: oldest first, each takes the oldest compatible ticket."""
+    queue = sorted(entries, key=lambda item: (item.created_at, item.ticket_id))
+    matched: set[int] = set()
+    pairs = []
+    for position, ticket in enumerate(queue):
+        if ticket.ticket_id in matched:
+            continue
+        for other in queue[position + 1 :]:
+            if other.ticket_id in matched or other.time_control != ticket.time_control:
+                continue
+            if ticket.accepts(other.rating) and other.accepts(ticket.rating):
+                matched |= {ticket.ticket_id, other.ticket_id}
+                pairs.append((ticket.ticket_id, other.ticket_id))
+                break
+    return pairs
+
+
+def pairs_of(entries: list[QueueEntry]) -> list[tuple[int, int]]:
+    return [(pairing.white.ticket_id, pairing.black.ticket_id) for pairing in find_pairings(entries)]
+
+
+def test_oldest_compatible_opponent_is_chosen_over_the_closest_rated():
+    a = entry(1, 1500, timedelta(0))
+    b = entry(2, 1400, timedelta(minutes=4))
+    c = entry(3, 1500, timedelta(minutes=4, seconds=59))
+
+    assert pairs_of([c, b, a]) == [(1, 2)]
+
+
+def test_opponent_whose_window_rejects_the_ticket_is_passed_over():
+    a = entry(1, 1500, timedelta(0), spread=300)
+    narrow = entry(2, 1750, timedelta(seconds=10), spread=100)
+    c = entry(3, 1700, timedelta(seconds=20))
+
+    assert pairs_of([a, narrow, c]) == [(1, 3)]
+
+
+def test_pairings_match_the_pairwise_reference():
+    rng = random.Random(7)
+    for _ in range(200):
+        entries = [
+            QueueEntry(
+                ticket_id=index,
+                user_id=index,
+                rating=(rating := rng.randint(800, 2200)),
+                rating_min=max(0, rating - rng.randint(0, 300)),
+                rating_max=rating + rng.randint(0, 300),
+                time_control=rng.choice([BLITZ, "60+0"]),
+                created_at=START + timedelta(seconds=rng.randint(0, 60)),
+            )
+            for index in range(rng.randint(0, 60))
+        ]
+        assert sorted(pairs_of(entries)) == sorted(pairwise(entries))
+
+
+def queue(player, waited: timedelta = timedelta(0)) -> MatchmakingTicket:
+    ticket = MatchmakingTicket.objects.create(
+        user=player,
+        rating_min=player.rating - 200,
+        rating_max=player.rating + 200,
+        expires_at=django_timezone.now() + timedelta(minutes=5),
+    )
+    MatchmakingTicket.objects.filter(pk=ticket.pk).update(created_at=django_timezone.now() - waited)
+    return ticket
+
+
+@pytest.mark.django_db
+def test_ticket_matched_on_submit_is_not_paired_again(make_player):
+    players = [make_player(rating=1500) for _ in range(3)]
+    queue(players[0], timedelta(seconds=30))
+    submitted = queue(players[1])
+
+    game = match_ticket(submitted.id)
+    queue(players[2])
+    assert process_matchmaking_queue() == []
+
+    assert game is not None
+    assert (game.white_player_id, game.black_player_id) == (players[0].id, players[1].id)
+    assert list(MatchmakingTicket.objects.values_list("user_id", flat=True)) == [players[2].id]
+
+
+@pytest.mark.django_db
+def test_periodic_pass_puts_each_player_in_one_game(make_player):
+    for player in [make_player(rating=1500 + 10 * index) for index in range(9)]:
+        queue(player)
+
+    created = process_matchmaking_queue()
+
+    seats = Counter()
+    for white_id, black_id in Game.objects.filter(id__in=created).values_list("white_player_id", "black_player_id"):
+        seats.update([white_id, black_id])
+    assert len(created) == 4
+    assert set(seats.values()) == {1}
+    assert MatchmakingTicket.objects.count() == 1
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="needs row locks (SKIP LOCKED)")
+@pytest.mark.django_db(transaction=True)
+def test_periodic_pass_skips_tickets_locked_by_match_ticket(make_player):
+    tickets = [queue(make_player(rating=1500)) for _ in range(2)]
+    locked = threading.Event()
+    release = threading.Event()
+
+    def pair_on_submit():
+        # Stands in for match_ticket holding both tickets while it pairs them.
+        try:
+            with transaction.atomic():
+                list(MatchmakingTicket.objects.select_for_update().filter(id__in=[ticket.id for ticket in tickets]))
+                locked.set()
+                release.wait(10)
+        finally:
+            connection.close()
+
+    holder = threading.Thread(target=pair_on_submit)
+    holder.start()
+    try:
+        assert locked.wait(10)
+        assert process_matchmaking_queue() == []
+    finally:
+        release.set()
+        holder.join()
+    assert len(process_matchmaking_queue()) == 1
+
+
+@pytest.mark.django_db
+def test_batch_pass_keeps_the_lobby_counters(make_player, shared_cache, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        for player in [make_player(rating=1500) for _ in range(5)]:
+            queue(player)
+        MatchmakingTicket.objects.filter(user__username="player5").update(expires_at=django_timezone.now())
+    assert lobby.lobby_snapshot()["queue_count"] == 4
+
+    with django_capture_on_commit_callbacks(execute=True):
+        created = process_matchmaking_queue()
+
+    snapshot = lobby.lobby_snapshot()
+    assert len(created) == 2
+    assert (snapshot["queue_count"], snapshot["waiting_games"]) == (0, 2)
+    assert [game["id"] for game in snapshot["recent_games"]] == sorted(created, reverse=True)
+    assert not MatchmakingTicket.objects.exists()
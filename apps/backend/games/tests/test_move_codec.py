@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import random
+
+import chess
+import pytest
+from rest_framework.test import APIClient
+
+from games.models import Game
+from games.services.gameplay import move_payload, submit_move
+from games.services.move_codec import pack_moves, stored_moves, unpack_moves
+
+FOOLS_MATE = ["f2f3", "e7e5", "g2g4", "d8h4"]
+
+
+def test_packing_round_trips_every_move():
+    rng = random.Random(21)
+    ucis = ["a7a8q", "b2b1n", "h7g8r", "c2d1b", "e1g1"]
+    board = chess.Board()
+    for _ in range(200):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(rng.choice(moves))
+    ucis += [move.uci() for move in board.move_stack]
+
+    packed = pack_moves(ucis)
+
+    assert len(packed) == 2 * len(ucis)
+    assert unpack_moves(packed) == ucis
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("mode", ["rows", "finished", "packed"])
+def test_moves_are_numbered_by_ply_in_every_mode(make_player, settings, mode):
+    settings.GAME_MOVE_STORAGE = mode
+    game = Game.objects.create(white_player=make_player(), black_player=make_player(), status=Game.Status.LIVE)
+
+    payloads = [
+        move_payload(submit_move(game.id, player_id, uci))
+        for player_id, uci in zip([game.white_player_id, game.black_player_id] * 2, FOOLS_MATE)
+    ]
+    client = APIClient()
+    client.force_authenticate(game.white_player)
+    listed = client.get(f"/api/games/{game.id}/moves/").json()
+
+    game.refresh_from_db()
+    assert (game.packed_moves is not None) == (mode != "rows")
+    assert stored_moves(game)[0] == FOOLS_MATE
+    assert [payload["move"]["ply"] for payload in payloads] == [1, 2, 3, 4]
+    assert [(move["ply"], move["uci"]) for move in listed] == list(enumerate(FOOLS_MATE, start=1))
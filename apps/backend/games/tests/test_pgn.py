@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import random
+
+import chess
+import chess.pgn
+import pytest
+
+from games.models import Game
+from games.services.chess_engine import GameEngine
+from games.services.gameplay import apply_player_move
+from games.services.pgn import PgnBuilder
+
+BLACK_TO_MOVE = "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 3 2"
+
+
+def exported(starting_fen: str, ucis: list[str], result: str = "*") -> str:
+    game = chess.pgn.Game()
+    if starting_fen != chess.STARTING_FEN:
+        game.setup(chess.Board(starting_fen))
+    node = game
+    for uci in ucis:
+        node = node.add_variation(chess.Move.from_uci(uci))
+    game.headers["Result"] = result
+    return game.accept(chess.pgn.StringExporter(headers=True, variations=False, comments=False))
+
+
+def random_game(rng: random.Random, starting_fen: str) -> list[str]:
+    board = chess.Board(starting_fen)
+    for _ in range(rng.randint(0, 160)):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(rng.choice(moves))
+    return [move.uci() for move in board.move_stack]
+
+
+@pytest.mark.parametrize("starting_fen", [chess.STARTING_FEN, BLACK_TO_MOVE])
+def test_builder_matches_the_python_chess_exporter(starting_fen):
+    rng = random.Random(starting_fen)
+    for _ in range(25):
+        ucis = random_game(rng, starting_fen)
+        builder = PgnBuilder(starting_fen)
+        board = chess.Board(starting_fen)
+        for uci in ucis:
+            move = chess.Move.from_uci(uci)
+            builder.append(board, board.san(move))
+            board.push(move)
+        assert builder.render() == exported(starting_fen, ucis)
+        builder.set_result("1/2-1/2")
+        assert builder.render() == exported(starting_fen, ucis, "1/2-1/2")
+
+
+def test_render_can_be_skipped_until_the_game_ends():
+    engine = GameEngine()
+    assert engine.validate_move("f2f3", render_pgn=False).pgn is None
+    for uci in ["e7e5", "g2g4"]:
+        engine.validate_move(uci, render_pgn=False)
+
+    mate = engine.validate_move("d8h4", render_pgn=False)
+
+    assert mate.pgn == exported(chess.STARTING_FEN, ["f2f3", "e7e5", "g2g4", "d8h4"], "0-1")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("deferred", [False, True])
+def test_stored_pgn_follows_the_moves(make_player, settings, deferred):
+    settings.DEFER_PGN_UNTIL_FINISHED = deferred
+    game = Game.objects.create(white_player=make_player(), black_player=make_player())
+    moves = ["f2f3", "e7e5", "g2g4", "d8h4"]
+
+    for index, uci in enumerate(moves):
+        current = Game.objects.select_related("white_player", "black_player").get(pk=game.pk)
+        apply_player_move(current, current.white_player if index % 2 == 0 else current.black_player, uci)
+        current.refresh_from_db()
+        if index == 1:
+            assert current.pgn == ("" if deferred else exported(chess.STARTING_FEN, moves[:2]))
+
+    game.refresh_from_db()
+    assert game.pgn == exported(chess.STARTING_FEN, moves, "0-1")
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from games.models import Game
+from games.services.move_codec import unpack_moves
+from games.services.pgn_import import import_pgn
+
+User = get_user_model()
+
+PGN = """[Event "Casual"]
+[White "alice"]
+[Black "bob"]
+[WhiteElo "1720"]
+[Result "0-1"]
+
+1. f3 e5 2. g4 Qh4# 0-1
+
+[Event "Casual"]
+[White "bob"]
+[Black "carol"]
+[Result "1-0"]
+
+1. e4 e5 2. Ke3 Ke6 3. Kxe5 1-0
+
+"""
+
+
+def run(text: str = PGN, **kwargs):
+    return import_pgn(io.StringIO(text), **kwargs)
+
+
+@pytest.mark.django_db
+def test_valid_games_are_stored_and_invalid_ones_reported():
+    report = run()
+
+    assert (report.imported, report.failed) == (1, 1)
+    assert report.errors[0]["game"] == 2
+    assert (report.errors[0]["white"], report.errors[0]["black"]) == ("bob", "carol")
+    game = Game.objects.select_related("white_player", "black_player").get()
+    assert (game.status, game.winner, game.elo_processed) == (Game.Status.FINISHED, Game.Winner.BLACK, True)
+    assert unpack_moves(game.packed_moves) == ["f2f3", "e7e5", "g2g4", "d8h4"]
+    assert (game.white_player.username, game.white_player.rating, game.white_player.is_active) == ("alice", 1720, False)
+
+
+@pytest.mark.django_db
+def test_placeholders_are_reused_across_imports():
+    run()
+    run()
+
+    assert Game.objects.count() == 2
+    assert sorted(User.objects.values_list("username", flat=True)) == ["alice", "bob"]
+
+
+@pytest.mark.django_db
+def test_games_are_never_attached_to_an_active_account(make_player):
+    member = make_player()
+    User.objects.filter(pk=member.pk).update(username="alice")
+
+    run()
+
+    game = Game.objects.select_related("white_player").get()
+    assert game.white_player.username == "alice#pgn"
+    assert not game.white_player.is_active
+    assert not Game.objects.filter(white_player_id=member.pk).exists()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import random
+
+import chess
+import chess.polyglot
+import pytest
+
+from games.services.positions import position_keys, signed_key
+
+
+def full_hashes(initial_fen: str, ucis: list[str]) -> list[int]:
+    board = chess.Board(initial_fen)
+    keys = [signed_key(chess.polyglot.zobrist_hash(board))]
+    for uci in ucis:
+        board.push_uci(uci)
+        keys.append(signed_key(chess.polyglot.zobrist_hash(board)))
+    return keys
+
+
+def random_game(rng: random.Random, initial_fen: str, plies: int) -> list[str]:
+    board = chess.Board(initial_fen)
+    ucis = []
+    while len(ucis) < plies and not board.is_game_over():
+        move = rng.choice(list(board.legal_moves))
+        ucis.append(move.uci())
+        board.push(move)
+    return ucis
+
+
+@pytest.mark.parametrize(
+    "ucis",
+    [
+        # Both sides castle short.
+        ["e2e4", "e7e5", "g1f3", "g8f6", "f1c4", "f8c5", "e1g1", "e8g8"],
+        # White takes en passant.
+        ["e2e4", "a7a6", "e4e5", "d7d5", "e5d6"],
+        # Capture-promotion to a knight.
+        ["h2h4", "g7g5", "h4g5", "h7h6", "g5h6", "g8f6", "h6h7", "f6g8", "h7g8n"],
+    ],
+    ids=["castling", "en-passant", "promotion"],
+)
+def test_incremental_keys_match_full_hash_for_special_moves(ucis):
+    assert position_keys(chess.STARTING_FEN, ucis) == full_hashes(chess.STARTING_FEN, ucis)
+
+
+@pytest.mark.parametrize(
+    "initial_fen",
+    [
+        chess.STARTING_FEN,
+        # Black to move with an en passant square set.
+        "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1",
+        # Pawns one step from promotion on both sides.
+        "4k3/1P6/8/8/8/8/6p1/4K3 w - - 0 1",
+    ],
+)
+def test_incremental_keys_match_full_hash_for_random_games(initial_fen):
+    rng = random.Random(initial_fen)
+    for _ in range(50):
+        ucis = random_game(rng, initial_fen, 200)
+        assert position_keys(initial_fen, ucis) == full_hashes(initial_fen, ucis)
@@ -1,66 +1,346 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from django.utils import timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
 
-from ..models import Game, MatchmakingTicket
+from ..models import Game
+from ..services.lobby import lobby_snapshot, queue_count
+from . import fastjson
+from .caching import cache_is_shared
 
+LOBBY_COUNTER_FIELDS = ("active_games", "waiting_games", "queue_count")
+LOBBY_LAST_SENT_KEY = "lobby:last_sent"
+LOBBY_SEND_LOCK_KEY = "lobby:last_sent:lock"
 
-def broadcast_lobby_state() -> None:
-    layer = get_channel_layer()
-    if layer is None:
+logger = logging.getLogger(__name__)
+
+
+class BroadcastOutbox:
+    """Fire-and-forget queue of group sends drained by one background thread.
+
+    ``enqueue`` only appends to an in-process queue, so the request or task
+    that triggered a broadcast never waits on the channel layer. The sender
+    thread keeps its own event loop (and with it the channel layer's Redis
+    connections) and sends whatever has accumulated as one batch of
+    concurrent ``group_send`` calls. Delivery is best effort: failures are
+    logged and dropped, and anything still queued is flushed at interpreter
+    exit.
+    """
+
+    def __init__(self, batch_size: int = 200) -> None:
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._pid: int | None = None
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    def enqueue(self, group: str, message: dict) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                # First use in this process (or in a forked worker, which does
+                # not inherit the parent's sender thread).
+                self._start_sender()
+            self._pending += 1
+        self._queue.put((group, message))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until everything enqueued so far has been sent."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _start_sender(self) -> None:
+        self._pid = os.getpid()
+        self._pending = 0
+        self._queue = queue.SimpleQueue()
+        threading.Thread(target=self._run, args=(self._queue,), name="broadcast-outbox", daemon=True).start()
+
+    def _run(self, pending: queue.SimpleQueue) -> None:
+        loop = asyncio.new_event_loop()
+        layer = get_channel_layer()
+        while True:
+            batch = [pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            if layer is not None:
+                loop.run_until_complete(self._send_batch(layer, batch))
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    @staticmethod
+    async def _send_batch(layer, batch: list[tuple[str, dict]]) -> None:
+        await _send_concurrently(layer, batch)
+
+
+class LobbyBroadcastCoalescer:
+    """Collapses bursts of lobby changes into at most one send per interval.
+
+    ``request()`` only marks the lobby dirty and arms a timer; when the timer
+    fires the current snapshot is compared with the last one sent by any
+    process, kept with its ``seq`` in the shared cache. Unchanged snapshots
+    are dropped, counter-only changes go out as a ``lobby_delta`` and anything
+    touching the recent games list is sent as a full ``lobby_state``. Every
+    frame carries the next ``seq``, so a client that sees a gap can refetch
+    the lobby. Without a shared cache the full snapshot is always sent.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._last_emit = 0.0
+
+    def request(self) -> None:
+        if self.interval <= 0:
+            self.flush()
+            return
+        with self._lock:
+            if self._timer is not None:
+                return
+            delay = max(0.0, self._last_emit + self.interval - time.monotonic())
+            self._timer = threading.Timer(delay, self._flush_from_timer)
+            self._timer.start()
+
+    def flush(self, run=async_to_sync) -> None:
+        with self._lock:
+            self._timer = None
+            self._last_emit = time.monotonic()
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        payload = self._next_payload(lobby_snapshot())
+        if payload is not None:
+            send_group_event("lobby", encoded_event("lobby.broadcast", payload), run=run)
+
+    def _flush_from_timer(self) -> None:
+        # The timer thread owns no event loop, so run the send directly rather
+        # than through async_to_sync's executor, which is already shut down
+        # when a short-lived process (a management command) exits.
+        try:
+            self.flush(run=_run_in_new_loop)
+        finally:
+            connections.close_all()
+
+    def _next_payload(self, snapshot: dict) -> dict | None:
+        if not cache_is_shared():
+            return snapshot
+        if not self._acquire_send_lock():
+            # Whatever the other sender records may not be what clients end up
+            # with, so make the next sender start over from a full snapshot.
+            cache.delete(LOBBY_LAST_SENT_KEY)
+            return snapshot
+        try:
+            last = cache.get(LOBBY_LAST_SENT_KEY)
+            payload = self._diff(last["snapshot"] if last else None, snapshot)
+            if payload is None:
+                return None
+            seq = (last["seq"] if last else 0) + 1
+            cache.set(LOBBY_LAST_SENT_KEY, {"seq": seq, "snapshot": snapshot}, None)
+            return {**payload, "seq": seq}
+        finally:
+            cache.delete(LOBBY_SEND_LOCK_KEY)
+
+    @staticmethod
+    def _acquire_send_lock(attempts: int = 20) -> bool:
+        # Held only for one cache read and write; the timeout frees it if the
+        # holder dies.
+        for _ in range(attempts):
+            if cache.add(LOBBY_SEND_LOCK_KEY, os.getpid(), 5):
+                return True
+            time.sleep(0.01)
+        return False
+
+    @staticmethod
+    def _diff(previous: dict | None, snapshot: dict) -> dict | None:
+        if previous is None or previous["recent_games"] != snapshot["recent_games"]:
+            return snapshot
+        changed = {field: snapshot[field] for field in LOBBY_COUNTER_FIELDS if previous[field] != snapshot[field]}
+        if not changed:
+            return None
+        return {"type": "lobby_delta", **changed}
+
+
+def encoded_event(event_type: str, payload: dict) -> dict:
+    """Group event carrying ``payload`` already encoded as the socket frame.
+
+    Consumers write ``text`` as is, so the payload is serialised once here
+    rather than once per recipient socket.
+    """
+    return {"type": event_type, "text": fastjson.dumps(payload)}
+
+
+def _run_in_new_loop(coroutine_function):
+    def runner(*args, **kwargs):
+        return asyncio.run(coroutine_function(*args, **kwargs))
+
+    return runner
+
+
+_outbox: BroadcastOutbox | None = None
+_outbox_lock = threading.Lock()
+
+
+def get_broadcast_outbox() -> BroadcastOutbox:
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = BroadcastOutbox(getattr(settings, "BROADCAST_BATCH_SIZE", 200))
+                atexit.register(_outbox.flush, 5.0)
+    return _outbox
+
+
+_collecting = threading.local()
+
+
+@contextmanager
+def collect_group_events() -> Iterator[list[tuple[str, dict]]]:
+    """Hold back the group events sent on this thread and hand them to the caller.
+
+    Async consumers run their synchronous work (a move and its ``on_commit``
+    side effects) under this and send the collected ``(group, event)`` pairs
+    with ``agroup_send_many`` on their own event loop, so no send blocks the
+    worker's database thread. If the block raises, whatever was collected is
+    sent the usual way before the exception propagates.
+    """
+    previous = getattr(_collecting, "events", None)
+    collected: list[tuple[str, dict]] = []
+    _collecting.events = collected
+    try:
+        yield collected
+    except BaseException:
+        _collecting.events = previous
+        for group, event in collected:
+            send_group_event(group, event)
+        raise
+    finally:
+        _collecting.events = previous
+
+
+def send_group_event(group: str, event: dict, run=async_to_sync) -> None:
+    send_group_events(group, [event], run=run)
+
+
+def send_group_events(group: str, events: list[dict], run=async_to_sync) -> None:
+    """Send ``events`` to ``group`` from synchronous code.
+
+    With ``BROADCAST_MODE = "outbox"`` (the default) the events are queued for
+    the background sender and this returns immediately; ``"sync"`` blocks on
+    the channel layer as before. Inside ``collect_group_events`` they are
+    handed to the collecting caller instead.
+    """
+    collected = getattr(_collecting, "events", None)
+    if collected is not None:
+        collected.extend((group, event) for event in events)
         return
-    now = timezone.now()
-    recent = list(
-        Game.objects.select_related("white_player", "black_player").order_by("-created_at")[:5]
-    )
-    payload = {
-        "type": "lobby_state",
-        "active_games": Game.objects.filter(status=Game.Status.LIVE).count(),
-        "waiting_games": Game.objects.filter(status=Game.Status.WAITING).count(),
-        "queue_count": MatchmakingTicket.objects.filter(expires_at__gt=now).count(),
-        "recent_games": [
-            {
-                "id": game.id,
-                "white_player": game.white_player.username if game.white_player_id else None,
-                "black_player": game.black_player.username if game.black_player_id else None,
-                "status": game.status,
-                "created_at": game.created_at.isoformat() if game.created_at else None,
-            }
-            for game in recent
-        ],
-    }
-    async_to_sync(layer.group_send)("lobby", {"type": "lobby.broadcast", "payload": payload})
+    if getattr(settings, "BROADCAST_MODE", "outbox") == "outbox":
+        outbox = get_broadcast_outbox()
+        for event in events:
+            outbox.enqueue(group, event)
+        return
+    layer = get_channel_layer()
+    if layer is not None:
+        run(_group_send_many)(layer, group, events)
 
 
-def broadcast_matchmaking_queue() -> None:
+async def agroup_send(group: str, event: dict) -> None:
+    """Async counterpart of ``send_group_event`` for consumers."""
+    await agroup_send_many([(group, event)])
+
+
+async def agroup_send_many(messages: list[tuple[str, dict]]) -> None:
+    """Send ``(group, event)`` pairs concurrently on the caller's event loop.
+
+    Failures are logged and dropped, as with the background sender.
+    """
     layer = get_channel_layer()
-    if layer is None:
-        return
-    count = MatchmakingTicket.objects.filter(expires_at__gt=timezone.now()).count()
-    async_to_sync(layer.group_send)(
+    if layer is not None and messages:
+        await _send_concurrently(layer, messages)
+
+
+async def abroadcast_game_update(game_id: int, payload: dict) -> None:
+    await agroup_send(f"game_{game_id}", encoded_event("game.broadcast", payload))
+
+
+_lobby_coalescer: LobbyBroadcastCoalescer | None = None
+_lobby_coalescer_lock = threading.Lock()
+
+
+def get_lobby_coalescer() -> LobbyBroadcastCoalescer:
+    global _lobby_coalescer
+    if _lobby_coalescer is None:
+        with _lobby_coalescer_lock:
+            if _lobby_coalescer is None:
+                _lobby_coalescer = LobbyBroadcastCoalescer(getattr(settings, "LOBBY_BROADCAST_INTERVAL", 0.25))
+    return _lobby_coalescer
+
+
+def broadcast_lobby_state() -> None:
+    get_lobby_coalescer().request()
+
+
+def broadcast_matchmaking_queue() -> None:
+    send_group_event(
         "matchmaking",
-        {"type": "matchmaking.broadcast", "payload": {"type": "queue_update", "count": count}},
+        encoded_event("matchmaking.broadcast", {"type": "queue_update", "count": queue_count()}),
     )
 
 
-def broadcast_game_update(game_id: int, payload: dict) -> None:
-    layer = get_channel_layer()
-    if layer is None:
-        return
-    async_to_sync(layer.group_send)(f"game_{game_id}", {"type": "game.broadcast", "payload": payload})
+def broadcast_clock_deadline(game_id: int, deadline: float | None) -> None:
+    """Hand a game's next flag deadline (epoch seconds) to the clock watcher."""
+    send_group_event("game_clocks", {"type": "clock.deadline", "game_id": game_id, "deadline": deadline})
 
 
 def broadcast_match_found(game_id: int) -> None:
-    layer = get_channel_layer()
-    if layer is None:
-        return
-    try:
-        game = Game.objects.select_related("white_player", "black_player").get(pk=game_id)
-    except Game.DoesNotExist:
+    broadcast_matches_found([game_id])
+
+
+def broadcast_matches_found(game_ids: list[int]) -> None:
+    """Announce several new games with one query and one batch of sends."""
+    if not game_ids:
         return
-    payload = {
+    games = Game.objects.select_related("white_player", "black_player").filter(pk__in=game_ids).order_by("pk")
+    messages = [encoded_event("matchmaking.broadcast", _match_found_payload(game)) for game in games]
+    if messages:
+        send_group_events("matchmaking", messages)
+
+
+async def _group_send_many(layer, group: str, messages: list[dict]) -> None:
+    for message in messages:
+        await layer.group_send(group, message)
+
+
+async def _send_concurrently(layer, messages: list[tuple[str, dict]]) -> None:
+    # channels_redis has no public way to pipeline group sends; concurrent
+    # calls share its connection pool and overlap their round trips.
+    results = await asyncio.gather(
+        *(layer.group_send(group, message) for group, message in messages),
+        return_exceptions=True,
+    )
+    for (group, _), result in zip(messages, results):
+        if isinstance(result, Exception):
+            logger.warning("Broadcast to %s failed: %r", group, result)
+
+
+def _match_found_payload(game: Game) -> dict:
+    return {
         "type": "matched",
         "game_id": game.id,
         "white": {
@@ -72,4 +352,3 @@ def broadcast_match_found(game_id: int) -> None:
             "username": game.black_player.username if game.black_player_id else None,
         },
     }
-    async_to_sync(layer.group_send)("matchmaking", {"type": "matchmaking.broadcast", "payload": payload})
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from django.conf import settings
+
+# Backends whose entries are private to one process; web and worker
+# processes cannot see each other's writes through them.
+PROCESS_LOCAL_BACKENDS = frozenset(
+    {
+        "django.core.cache.backends.locmem.LocMemCache",
+        "django.core.cache.backends.dummy.DummyCache",
+    }
+)
+
+
+def cache_is_shared(alias: str = "default") -> bool:
+    """Whether every web and worker process sees the same ``alias`` cache."""
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
@@ -0,0 +1,34 @@
+"""JSON encoding used for socket frames and API responses.
+
+``orjson`` is used when it is installed (``pip install shamchess-backend[fast-json]``);
+otherwise everything falls back to the standard library with compact
+separators. Both paths produce equivalent JSON for the payloads we send.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Callable
+
+try:  # pragma: no cover - depends on the optional dependency
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps_bytes(obj: Any, default: Callable[[Any], Any] | None = None) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(obj, default=default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def dumps(obj: Any, default: Callable[[Any], Any] | None = None) -> str:
+    return dumps_bytes(obj, default).decode()
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import weakref
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds a game's reader waits before receiving again after a channel-layer
+# error, doubling per consecutive failure up to the maximum.
+READ_RETRY_MIN = 0.5
+READ_RETRY_MAX = 30.0
+
+
+class SpectatorHub:
+    """Per-process fan-out of game broadcasts to local spectator sockets.
+
+    Instead of adding every spectator's channel to ``game_{id}``, the hub
+    joins the group once per watched game with a channel of its own and
+    relays each ``game.broadcast`` to the sockets connected to this worker
+    through their ``send_game_events``. Redis then delivers one message per
+    worker rather than one per watcher, and the event's pre-encoded frame is
+    written to every socket unchanged.
+
+    With a positive ``batch_interval`` spectator events are held for up to
+    that many seconds and sent as a single ``batch`` frame; players are not
+    routed through the hub and keep immediate delivery.
+    """
+
+    def __init__(self, layer, batch_interval: float = 0.0) -> None:
+        self.layer = layer
+        self.batch_interval = batch_interval
+        self._spectators: dict[int, set] = defaultdict(set)
+        self._channels: dict[int, str] = {}
+        self._readers: dict[int, asyncio.Task] = {}
+        self._pending: dict[int, list[tuple[int | None, str]]] = {}
+        self._flushers: set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, game_id: int, consumer) -> None:
+        """Relay ``game_id``'s events to ``consumer``, an accepted socket."""
+        async with self._lock:
+            self._spectators[game_id].add(consumer)
+            if game_id in self._channels:
+                return
+            channel = await self.layer.new_channel()
+            await self.layer.group_add(f"game_{game_id}", channel)
+            self._channels[game_id] = channel
+            self._readers[game_id] = asyncio.create_task(self._read(game_id, channel))
+
+    async def unsubscribe(self, game_id: int, consumer) -> None:
+        async with self._lock:
+            spectators = self._spectators.get(game_id)
+            if spectators is None:
+                return
+            spectators.discard(consumer)
+            if spectators:
+                return
+            del self._spectators[game_id]
+            self._pending.pop(game_id, None)
+            self._readers.pop(game_id).cancel()
+            await self.layer.group_discard(f"game_{game_id}", self._channels.pop(game_id))
+
+    def close(self) -> None:
+        """Stop every reader; the hub's spectators get nothing more from it."""
+        for task in [*self._readers.values(), *self._flushers]:
+            task.cancel()
+        self._readers.clear()
+        self._channels.clear()
+        self._spectators.clear()
+        self._pending.clear()
+
+    async def _read(self, game_id: int, channel: str) -> None:
+        delay = READ_RETRY_MIN
+        while True:
+            try:
+                message = await self.layer.receive(channel)
+            except Exception as exc:  # noqa: BLE001 - keep serving the game's spectators
+                logger.warning("Spectator reader for game %s failed, retrying in %.1fs: %r", game_id, delay, exc)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, READ_RETRY_MAX)
+                await self._rejoin(game_id, channel)
+                continue
+            delay = READ_RETRY_MIN
+            if message.get("type") != "game.broadcast":
+                continue
+            event = (message.get("seq"), message["text"])
+            if self.batch_interval <= 0:
+                await self._deliver(game_id, [event])
+                continue
+            pending = self._pending.get(game_id)
+            if pending is not None:
+                pending.append(event)
+                continue
+            self._pending[game_id] = [event]
+            flusher = asyncio.create_task(self._flush_later(game_id))
+            self._flushers.add(flusher)
+            flusher.add_done_callback(self._flushers.discard)
+
+    async def _rejoin(self, game_id: int, channel: str) -> None:
+        # The group may have been lost with the channel layer (a Redis
+        # restart); events sent meanwhile are missed and clients resume by seq.
+        try:
+            await self.layer.group_add(f"game_{game_id}", channel)
+        except Exception as exc:  # noqa: BLE001 - retried after the next failed receive
+            logger.warning("Rejoining game_%s for spectators failed: %r", game_id, exc)
+
+    async def _flush_later(self, game_id: int) -> None:
+        await asyncio.sleep(self.batch_interval)
+        events = self._pending.pop(game_id, None)
+        if events:
+            await self._deliver(game_id, events)
+
+    async def _deliver(self, game_id: int, events: list[tuple[int | None, str]]) -> None:
+        spectators = list(self._spectators.get(game_id, ()))
+        if not spectators:
+            return
+        await asyncio.gather(
+            *(consumer.send_game_events(events) for consumer in spectators),
+            return_exceptions=True,
+        )
+
+
+def batch_frame(texts: list[str]) -> str:
+    """One socket frame for already encoded events: the event itself, or a ``batch``."""
+    if len(texts) == 1:
+        return texts[0]
+    # The events are already encoded; splice them into the batch frame.
+    return '{"type":"batch","events":[' + ",".join(texts) + "]}"
+
+
+_hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SpectatorHub]" = weakref.WeakKeyDictionary()
+
+
+def spectator_fanout_enabled() -> bool:
+    return getattr(settings, "SPECTATOR_FANOUT", True)
+
+
+def get_spectator_hub(layer) -> SpectatorHub:
+    """Hub for the running event loop (one per ASGI worker)."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None or hub.layer is not layer:
+        if hub is not None:
+            # The old layer's readers would otherwise run on, orphaned.
+            hub.close()
+        hub = SpectatorHub(layer, getattr(settings, "SPECTATOR_BATCH_INTERVAL", 0.0))
+        _hubs[loop] = hub
+    return hub
@@ -86,14 +86,17 @@ DATABASES = {
 if DATABASES["default"]["ENGINE"].endswith("postgresql"):
     DATABASES["default"].setdefault("ATOMIC_REQUESTS", True)
 
+redis_url = env.str("REDIS_URL", default="redis://localhost:6379/0")
+# Lobby counters and pre-rendered game states must be visible to every web and
+# worker process, so the default is the Redis already used by channels and
+# Celery. With a per-process backend (locmemcache://) the lobby is counted from
+# the database on each read and game states are not cached (games.W001).
 CACHES = {
     "default": env.cache(
         "CACHE_URL",
-        default="locmemcache://",
+        default=redis_url,
     )
 }
-
-redis_url = env.str("REDIS_URL", default="redis://localhost:6379/0")
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -111,10 +114,10 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ),
     "DEFAULT_RENDERER_CLASSES": (
-        "rest_framework.renderers.JSONRenderer",
+        "games.api.renderers.FastJSONRenderer",
     ),
     "DEFAULT_PARSER_CLASSES": (
-        "rest_framework.parsers.JSONParser",
+        "games.api.parsers.FastJSONParser",
     ),
 }
 
@@ -155,9 +158,120 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+# "event" pairs a ticket as soon as it is posted; the beat task below then only
+# sweeps expired tickets and retries those left waiting. "periodic" leaves all
+# pairing to the beat task.
+MATCHMAKING_MODE = env.str("MATCHMAKING_MODE", default="event")
+# Tickets' rating windows widen by STEP points per INTERVAL seconds waited
+# ("linear" or "exponential"), up to CAP points on each side.
+MATCHMAKING_RATING_WINDOW = {
+    "CURVE": env.str("MATCHMAKING_WINDOW_CURVE", default="linear"),
+    "STEP": env.int("MATCHMAKING_WINDOW_STEP", default=50),
+    "INTERVAL": env.float("MATCHMAKING_WINDOW_INTERVAL", default=10.0),
+    "CAP": env.int("MATCHMAKING_WINDOW_CAP", default=400),
+}
 CELERY_BEAT_SCHEDULE = {
     "process-matchmaking-queue": {
         "task": "games.tasks.process_matchmaking_queue",
         "schedule": 5.0,
     },
+    "reconcile-lobby-stats": {
+        "task": "games.tasks.reconcile_lobby_stats",
+        "schedule": 60.0,
+    },
+    "relay-game-events": {
+        "task": "games.tasks.relay_game_events",
+        "schedule": 5.0,
+    },
+    "apply-pending-ratings": {
+        "task": "games.tasks.apply_pending_ratings",
+        "schedule": 60.0,
+    },
+    "close-rating-period": {
+        "task": "games.tasks.close_rating_period",
+        "schedule": 60.0,
+    },
+    "index-game-positions": {
+        "task": "games.tasks.index_game_positions",
+        "schedule": 300.0,
+    },
+    "dispatch-game-analyses": {
+        "task": "games.tasks.dispatch_game_analyses",
+        "schedule": 30.0,
+    },
+}
+
+# Seconds between reloads of every live game's flag deadline by the clock
+# watcher (run_game_clocks), which otherwise learns deadlines from
+# best-effort channel messages; 0 loads them only at startup.
+CLOCK_DEADLINE_RELOAD_INTERVAL = env.float("CLOCK_DEADLINE_RELOAD_INTERVAL", default=60.0)
+LIVE_BOARD_REGISTRY_SIZE = env.int("LIVE_BOARD_REGISTRY_SIZE", default=1024)
+LIVE_BOARD_REGISTRY_TTL = env.int("LIVE_BOARD_REGISTRY_TTL", default=3600)
+# Skip writing Game.pgn on every move; the full PGN is stored once the game ends.
+DEFER_PGN_UNTIL_FINISHED = env.bool("DEFER_PGN_UNTIL_FINISHED", default=False)
+# Where moves are stored: "rows" writes a Move row per ply; "finished" packs a
+# game's moves into Game.packed_moves (two bytes per ply) when it ends and drops
+# the rows; "packed" packs new games from their first move.
+GAME_MOVE_STORAGE = env.str("GAME_MOVE_STORAGE", default="rows")
+# Minimum seconds between lobby snapshots sent from one process (0 sends immediately).
+# With a shared cache, snapshots are diffed against the last one sent by any process.
+LOBBY_BROADCAST_INTERVAL = env.float("LOBBY_BROADCAST_INTERVAL", default=0.25)
+# "outbox" queues channel-layer broadcasts for a background sender so requests
+# never wait on fan-out; "sync" sends them inline.
+BROADCAST_MODE = env.str("BROADCAST_MODE", default="outbox")
+BROADCAST_BATCH_SIZE = env.int("BROADCAST_BATCH_SIZE", default=200)
+# "elo" or "glicko2". Glicko-2 rates all games of a RATING_PERIOD (seconds,
+# aligned to the epoch) together once it ends and grows the deviation of
+# players who did not play; 0 makes every rating batch a period of its own.
+RATING_ENGINE = env.str("RATING_ENGINE", default="elo")
+RATING_PERIOD = env.int("RATING_PERIOD", default=86400)
+GLICKO2_TAU = env.float("GLICKO2_TAU", default=0.5)
+# Seconds to wait after a game ends so games finishing together are rated in
+# one batch (0 rates each game in its own task); at most ELO_BATCH_SIZE per transaction.
+ELO_BATCH_DELAY = env.float("ELO_BATCH_DELAY", default=2.0)
+ELO_BATCH_SIZE = env.int("ELO_BATCH_SIZE", default=1000)
+# Plies of each finished game added to the opening-explorer position index
+# (changing it needs `build_position_index --rebuild`), indexed in batches of
+# POSITION_INDEX_BATCH games POSITION_INDEX_DELAY seconds after games end.
+POSITION_INDEX_DEPTH = env.int("POSITION_INDEX_DEPTH", default=40)
+POSITION_INDEX_BATCH = env.int("POSITION_INDEX_BATCH", default=1000)
+POSITION_INDEX_DELAY = env.float("POSITION_INDEX_DELAY", default=10.0)
+# Processes validating games for uploaded PGN imports. Keep 0 (validate in the
+# task itself) under Celery's prefork pool, whose workers cannot start children.
+PGN_IMPORT_WORKERS = env.int("PGN_IMPORT_WORKERS", default=0)
+# UCI engine used for post-game analysis, e.g. "stockfish" or "stub" (the
+# bundled material-only test engine); empty disables analysis. Each worker
+# process keeps up to ANALYSIS_ENGINE_POOL_SIZE engines running between tasks.
+ANALYSIS_ENGINE_COMMAND = env.str("ANALYSIS_ENGINE_COMMAND", default="")
+ANALYSIS_ENGINE_POOL_SIZE = env.int("ANALYSIS_ENGINE_POOL_SIZE", default=1)
+ANALYSIS_ENGINE_OPTIONS = {
+    "Threads": env.int("ANALYSIS_ENGINE_THREADS", default=1),
+    "Hash": env.int("ANALYSIS_ENGINE_HASH_MB", default=64),
 }
+ANALYSIS_ENGINE_TIMEOUT = env.float("ANALYSIS_ENGINE_TIMEOUT", default=30.0)
+ANALYSIS_DEPTH = env.int("ANALYSIS_DEPTH", default=14)
+# Analyse every game as it finishes (otherwise only on request or backfill).
+ANALYSIS_ON_FINISH = env.bool("ANALYSIS_ON_FINISH", default=True)
+# At most ANALYSIS_QUEUE_LIMIT analysis tasks are queued or running; further
+# games wait in the database, up to ANALYSIS_BACKLOG_LIMIT of them. Tasks
+# in flight for ANALYSIS_STALE_AFTER seconds are assumed lost and retried.
+ANALYSIS_QUEUE_LIMIT = env.int("ANALYSIS_QUEUE_LIMIT", default=16)
+ANALYSIS_BACKLOG_LIMIT = env.int("ANALYSIS_BACKLOG_LIMIT", default=10000)
+ANALYSIS_STALE_AFTER = env.int("ANALYSIS_STALE_AFTER", default=3600)
+# Redis holding the leaderboard sorted set; empty serves the leaderboard from
+# the database's (-rating, id) index instead.
+LEADERBOARD_REDIS_URL = env.str("LEADERBOARD_REDIS_URL", default=redis_url)
+# Game events are published from an outbox table in batches of this size and
+# deleted this many seconds after publication.
+GAME_EVENT_RELAY_BATCH = env.int("GAME_EVENT_RELAY_BATCH", default=500)
+GAME_EVENT_RETENTION = env.int("GAME_EVENT_RETENTION", default=3600)
+# Most missed events replayed to a client reconnecting with ?resume_from=<seq>;
+# larger gaps get a fresh game_state snapshot instead.
+GAME_EVENT_RESUME_LIMIT = env.int("GAME_EVENT_RESUME_LIMIT", default=100)
+# Seconds a pre-rendered game state stays cached; moves update it in place.
+GAME_STATE_CACHE_TTL = env.int("GAME_STATE_CACHE_TTL", default=300)
+# Relay game broadcasts to spectators through one group subscription per worker
+# instead of one per socket; players always join the game group directly.
+SPECTATOR_FANOUT = env.bool("SPECTATOR_FANOUT", default=True)
+# Seconds to batch spectator events into one frame (0 relays each event immediately).
+SPECTATOR_BATCH_INTERVAL = env.float("SPECTATOR_BATCH_INTERVAL", default=0.0)
@@ -0,0 +1,21 @@
+"""Settings for the test suite.
+
+The database still comes from ``DATABASE_URL`` (SQLite by default) so the
+PostgreSQL-only locking tests can run in CI; everything else that would
+need Redis or a worker is replaced by an in-process equivalent.
+"""
+
+from .base import *  # noqa: F401,F403
+
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_BROKER_URL = "memory://"
+CELERY_RESULT_BACKEND = "cache+memory://"
+BROADCAST_MODE = "sync"
+LOBBY_BROADCAST_INTERVAL = 0
+LEADERBOARD_REDIS_URL = ""
+STATICFILES_DIRS = []
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+# The per-process cache above is deliberate here.
+SILENCED_SYSTEM_CHECKS = ["games.W001"]